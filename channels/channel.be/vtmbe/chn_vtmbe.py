@@ -13,6 +13,7 @@ from resources.lib.streams.mpd import Mpd
 from resources.lib.vault import Vault
 from resources.lib.urihandler import UriHandler
 from resources.lib.addonsettings import AddonSettings, LOCAL
+from resources.lib.authentication.tokencache import TokenCache
 from resources.lib.streams.m3u8 import M3u8
 from resources.lib.regexer import Regexer
 from resources.lib.xbmcwrapper import XbmcWrapper
@@ -694,10 +695,9 @@ class Channel(chn_class.Channel):
         json = JsonHelper(data)
         json_items = json.get_value("response", "items")
         count = json.get_value("response", "total")
-        for i in range(100, count, 100):
-            url = "%s&from=%s" % (self.mainListUri, i)
-            Logger.debug("Retrieving more items from: %s", url)
-            more_data = UriHandler.open(url)
+        urls = ["%s&from=%s" % (self.mainListUri, i) for i in range(100, count, 100)]
+        Logger.debug("Retrieving more items from: %s", urls)
+        for more_data in UriHandler.open_many(urls):
             more_json = JsonHelper(more_data)
             more_items = more_json.get_value("response", "items")
             if more_items:
@@ -1337,6 +1337,17 @@ class Channel(chn_class.Channel):
             Logger.warning("Cannot log on")
             return None
 
+        return TokenCache.instance().get_token(
+            self.__sso, self.__userId, self.__fetch_token, lifetime=300)
+
+    def __fetch_token(self):
+        """ Requests a new playback token for the logged on user
+
+        :return: The token data and its expiry time (if known)
+        :rtype: tuple[str|None,float|None]
+
+        """
+
         # Q2:  https://user.medialaan.io/user/v1/gigya/request_token?uid=897b786c46e3462eac81549453680c0d&signature=SM7b5ciP09Z0gbcaCoZ%2B7r4b3uk%3D&timestamp=1484691251&apikey=q2-html5-NNSMRSQSwGMDAjWKexV4e5Vm6eSPtupk&database=q2-sso&_=1484691247493
         # VTM: https://user.medialaan.io/user/v1/gigya/request_token?uid=897b786c46e3462eac81549453680c0d&signature=Ak10FWFpuF2cSXfmGnNIBsJV4ss%3D&timestamp=1481233821&apikey=vtm-b7sJGrKwMJj0VhdZvqLDFvgkJF5NLjNY&database=vtm-sso
 
@@ -1348,7 +1359,8 @@ class Channel(chn_class.Channel):
             self.__sso)
         data = UriHandler.open(url, no_cache=True)
         json_data = JsonHelper(data)
-        return json_data.get_value("response")
+        token = json_data.get_value("response")
+        return token, TokenCache.get_jwt_expiry(token)
 
     def __extract_session_data(self, logon_data, signature_settings):
         logon_json = JsonHelper(logon_data)
@@ -7,6 +7,7 @@ import re
 from resources.lib import chn_class
 from resources.lib import contenttype
 from resources.lib import mediatype
+from resources.lib.authentication.tokencache import TokenCache
 from resources.lib.logger import Logger
 from resources.lib.regexer import Regexer
 from resources.lib.helpers import subtitlehelper
@@ -925,15 +926,26 @@ class Channel(chn_class.Channel):
             return data, items
 
         # We will just try to download all items.
-        for _ in range(0, self.__max_page_count - 1):
-            page_data = UriHandler.open(next_url, additional_headers=self.parentItem.HttpHeaders)
-            page_json = JsonHelper(page_data)
-            page_items = page_json.get_value("items")
-            if page_items:
-                data.json["items"] += page_items
-            next_url = page_json.get_value("_links", "next", "href")
-            if not next_url:
-                break
+        page_urls = self.__get_api_page_urls(next_url, data.get_value("total"))
+        if page_urls:
+            # The pages are numbered, so we can fetch them all at once.
+            Logger.debug("Retrieving %s pages in parallel", len(page_urls))
+            for page_data in UriHandler.open_many(page_urls, additional_headers=self.parentItem.HttpHeaders):
+                page_json = JsonHelper(page_data)
+                page_items = page_json.get_value("items")
+                if page_items:
+                    data.json["items"] += page_items
+                next_url = page_json.get_value("_links", "next", "href")
+        else:
+            for _ in range(0, self.__max_page_count - 1):
+                page_data = UriHandler.open(next_url, additional_headers=self.parentItem.HttpHeaders)
+                page_json = JsonHelper(page_data)
+                page_items = page_json.get_value("items")
+                if page_items:
+                    data.json["items"] += page_items
+                next_url = page_json.get_value("_links", "next", "href")
+                if not next_url:
+                    break
 
         if next_url:
             next_title = LanguageHelper.get_localized_string(LanguageHelper.MorePages)
@@ -945,6 +957,36 @@ class Channel(chn_class.Channel):
 
         return data, items
 
+    def __get_api_page_urls(self, next_url, total):
+        """ Determines the URLs of the pages that follow, based on the `page` and `pageSize` of
+        the next URL and the total number of items.
+
+        :param str next_url:    The URL of the next page.
+        :param int total:       The total number of items.
+
+        :return: The URLs of the pages to fetch (at most `max_page_count - 1`) or an empty list
+                 if they could not be determined.
+        :rtype: list[str]
+
+        """
+
+        page_match = re.search(r"[?&]page=(\d+)", next_url)
+        page_size_match = re.search(r"[?&]pageSize=(\d+)", next_url)
+        if not page_match or not page_size_match or not total:
+            return []
+
+        page_size = int(page_size_match.group(1))
+        if not page_size:
+            return []
+
+        first_page = int(page_match.group(1))
+        page_count = (total + page_size - 1) // page_size
+        last_page = min(page_count, first_page + self.__max_page_count - 2)
+        return [
+            "{}{}{}".format(next_url[:page_match.start(1)], page, next_url[page_match.end(1):])
+            for page in range(first_page, last_page + 1)
+        ]
+
     def create_api_video_item(self, result_set, for_epg=False):
         """ Creates a MediaItem of type 'video' using the result_set from the API calls:
 
@@ -1587,14 +1629,31 @@ class Channel(chn_class.Channel):
         :rtype: tuple[str|None,str|None]
         """
 
+        # The token is only valid in combination with its cookie.
+        if UriHandler.get_cookie("XSRF-TOKEN", "www.npostart.nl") is None:
+            TokenCache.instance().invalidate("npostart.nl:xsrf")
+
+        return TokenCache.instance().get_token(
+            "npostart.nl:xsrf", None, self.__fetch_xsrf_token, lifetime=600)
+
+    def __fetch_xsrf_token(self):
+        """ Retrieves a new XSRF token
+
+        :return: XSRF Token and its expiry time
+        :rtype: tuple[str|None,float|None]
+        """
+
         # get a token (why?), cookies and an xsrf token
         UriHandler.open("https://www.npostart.nl/api/token",
                         no_cache=True,
                         additional_headers={"X-Requested-With": "XMLHttpRequest"})
 
-        xsrf_token = UriHandler.get_cookie("XSRF-TOKEN", "www.npostart.nl").value
-        xsrf_token = HtmlEntityHelper.url_decode(xsrf_token)
-        return xsrf_token
+        cookie = UriHandler.get_cookie("XSRF-TOKEN", "www.npostart.nl")
+        if cookie is None:
+            return None, None
+
+        xsrf_token = HtmlEntityHelper.url_decode(cookie.value)
+        return xsrf_token, TokenCache.get_expiry(cookie.expires)
 
     def __get_name_for_api_video(self, result_set, for_epg):
         """ Determines the name of the video item given the episode name, franchise name and
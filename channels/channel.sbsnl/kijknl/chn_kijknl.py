@@ -6,6 +6,7 @@ import pytz
 from resources.lib import chn_class
 from resources.lib import contenttype
 from resources.lib import mediatype
+from resources.lib.authentication.tokencache import TokenCache
 from resources.lib.helpers.htmlentityhelper import HtmlEntityHelper
 from resources.lib.helpers.languagehelper import LanguageHelper
 from resources.lib.helpers.subtitlehelper import SubtitleHelper
@@ -389,8 +390,9 @@ class Channel(chn_class.Channel):
         Logger.debug("Updating streams using BrightCove data.")
 
         mpd_manifest_url = "https:{0}".format(mpd_info["mediaLocator"])
-        mpd_data = UriHandler.open(mpd_manifest_url)
-        subtitles = Regexer.do_regex(r'<BaseURL>([^<]+\.vtt)</BaseURL>', mpd_data)
+        manifest = Mpd.get_manifest(mpd_manifest_url)
+        subtitles = [r.base_url for r in manifest.get_representations()
+                     if r.base_url and r.base_url.endswith(".vtt")]
 
         if subtitles:
             Logger.debug("Found subtitle: %s", subtitles[0])
@@ -400,13 +402,14 @@ class Channel(chn_class.Channel):
         if use_adaptive_with_encryption:
             # We can use the adaptive add-on with encryption
             Logger.info("Using MPD InputStreamAddon")
-            license_url = Regexer.do_regex('licenseUrl="([^"]+)"', mpd_data)[0]
+            license_url = manifest.get_license_url()
             token = "Bearer {0}".format(mpd_info["playToken"])
             key_headers = {"Authorization": token}
             license_key = Mpd.get_license_key(license_url, key_headers=key_headers)
 
             stream = item.add_stream(mpd_manifest_url, 0)
             Mpd.set_input_stream_addon_input(stream, license_key=license_key)
+            stream.Bitrates = manifest.get_bitrates("video")
             item.complete = True
         else:
             XbmcWrapper.show_dialog(
@@ -813,10 +816,8 @@ class Channel(chn_class.Channel):
 
                 # fetch the authentication token:
                 # url = self.__get_api_persisted_url("drmToken", "634c83ae7588a877e2bb67d078dda618cfcfc70ac073aef5e134e622686c0bb6", variables={})
-                url = self.__get_api_query_url("drmToken", "{token,expiration}")
-                token_data = UriHandler.open(url, no_cache=True)
-                token_json = JsonHelper(token_data)
-                token = token_json.get_value("data", "drmToken", "token")
+                token = TokenCache.instance().get_token(
+                    "kijk.nl:drm", None, self.__fetch_drm_token, lifetime=300)
 
                 # we need to POST to this url using this wrapper:
                 key_url = drm["widevine"]["url"]
@@ -848,6 +849,21 @@ class Channel(chn_class.Channel):
         item.isDrmProtected = False
         return item
 
+    def __fetch_drm_token(self):
+        """ Fetches a new DRM token from the API.
+
+        :return: The token and its expiry time.
+        :rtype: tuple[str|None,float|None]
+
+        """
+
+        url = self.__get_api_query_url("drmToken", "{token,expiration}")
+        token_data = UriHandler.open(url, no_cache=True)
+        token_json = JsonHelper(token_data)
+        token = token_json.get_value("data", "drmToken", "token")
+        expires = token_json.get_value("data", "drmToken", "expiration", fallback=None)
+        return token, TokenCache.get_expiry(expires)
+
     # noinspection PyUnusedLocal
     def __get_artwork(self, item, image_data, mode=("thumb", "poster")):
         """ Generates a full thumbnail url based on the "id" and "changed" values in a thumbnail
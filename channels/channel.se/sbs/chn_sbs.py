@@ -257,11 +257,9 @@ class Channel(chn_class.Channel):
         # extract the images
         self.__update_image_lookup(json)
 
-        for p in range(2, pages + 1, 1):
-            url = url_format.format(p)
-            Logger.debug("Loading: %s", url)
-
-            data = UriHandler.open(url)
+        urls = [url_format.format(p) for p in range(2, pages + 1, 1)]
+        Logger.debug("Loading: %s", urls)
+        for data in UriHandler.open_many(urls):
             json = JsonHelper(data)
             programs += json.get_value("data") or []
 
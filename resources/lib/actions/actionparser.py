@@ -3,6 +3,7 @@
 import random
 
 from resources.lib.retroconfig import Config
+from resources.lib.addonsettings import AddonSettings
 from resources.lib.logger import Logger
 from resources.lib.pickler import Pickler
 from resources.lib.actions import keyword
@@ -78,7 +79,8 @@ class ActionParser(object):
         self.pluginName = addon_name
 
         # We need a picker for this instance
-        self.pickler = Pickler(Config.profileDir)
+        codec, level = AddonSettings.get_pickle_store_compression()
+        self.pickler = Pickler(Config.profileDir, codec, level)
 
         # Field for property
         self.__media_item = None
@@ -38,7 +38,10 @@ class CleanAction(AddonAction):
 
         Logger.info("Cleaning: Cache objects in cache folder")
         env_ctrl = EnvController(Logger.instance())
-        env_ctrl.cache_clean_up(Config.cacheDir, 0)
+        cache_store = UriHandler.instance().cacheStore
+        env_ctrl.cache_clean_up(Config.cacheDir, 0,
+                                exclude=cache_store.FILE_MASK if cache_store else None)
+        UriHandler.clean_up_cache(0)
 
     def __init__(self, parameter_parser):
         """ Cleans the cache and cookies
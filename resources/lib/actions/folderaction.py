@@ -120,7 +120,9 @@ class FolderAction(AddonAction):
             watcher.lap("items send to Kodi")
 
             if ok and parent_guid is not None:
-                self.parameter_parser.pickler.store_media_items(parent_guid, selected_item, media_items)
+                # Store them in the background, so Kodi can show the list in the mean time.
+                self.parameter_parser.pickler.store_media_items(
+                    parent_guid, selected_item, media_items, background=True)
 
             watcher.stop()
 
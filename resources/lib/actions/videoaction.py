@@ -17,6 +17,13 @@ from resources.lib.mediaitem import MediaItem
 
 
 class VideoAction(AddonAction):
+    # The time a prefetched item stays valid. The player and DRM tokens in its streams are
+    # cached for only 5 minutes (see the TokenCache lifetimes), so it must expire before they
+    # do. After that, the item is resolved again when it is played. To still be valid when the
+    # next item starts, it is prefetched shortly before the end of the current item.
+    __resolved_item_ttl = 4 * 60
+    __prefetch_time_remaining = 2 * 60
+
     def __init__(self, parameter_parser, channel):
         """ Starts the videoitem using a playlist.
 
@@ -45,7 +52,13 @@ class VideoAction(AddonAction):
             media_item = self.__media_item
 
             if not media_item.complete:
-                media_item = self.__channel.process_video_item(media_item)
+                resolved_item = self.parameter_parser.pickler.de_pickle_resolved_media_item(
+                    self.parameter_parser.pickle_hash)
+                if resolved_item is not None and resolved_item.has_streams():
+                    Logger.info("Using prefetched streams for: %s", resolved_item)
+                    media_item = resolved_item
+                else:
+                    media_item = self.__channel.process_video_item(media_item)
 
             # Any warning to show
             self.__show_warnings(media_item)
@@ -95,11 +108,20 @@ class VideoAction(AddonAction):
             kodi_player = player.Player(show_subs=show_subs, subs=available_subs)
             kodi_player.waitForPlayBack(url=start_url, time_out=30)
 
-            if AddonSettings.use_up_next() and not media_item.isLive:
+            use_up_next = AddonSettings.use_up_next()
+            prefetch = AddonSettings.prefetch_next_episode()
+            store_id, next_item = None, None
+            if (use_up_next or prefetch) and not media_item.isLive:
+                store_id, next_item = self.__get_next_item(media_item)
+
+            if next_item is not None and use_up_next:
                 # Wrap in setting for Next Up
-                self.__call_upnext(media_item)
+                self.__notify_up_next(media_item, next_item, store_id)
 
             xbmcplugin.endOfDirectory(self.handle, True)
+
+            if next_item is not None and prefetch:
+                self.__prefetch(next_item, store_id, kodi_player, start_url)
         except:
             XbmcWrapper.show_notification(
                 LanguageHelper.get_localized_string(LanguageHelper.ErrorId),
@@ -133,13 +155,20 @@ class VideoAction(AddonAction):
                 message = LanguageHelper.get_localized_string(LanguageHelper.PaidText)
                 XbmcWrapper.show_dialog(title, message)
 
-    def __call_upnext(self, media_item):
-        """ Calls UpNext to send information on the next episode.
+    def __get_next_item(self, media_item):
+        """ Finds the next episode to play, based on the siblings of the current item.
 
         :param MediaItem media_item: the current itme.
 
+        :return: The store_id of the parent and the next item (or None if there is none).
+        :rtype: tuple[str|None,MediaItem|None]
+
         """
 
+        pickle_hash = self.parameter_parser.pickle_hash
+        if not pickle_hash or not self.parameter_parser.pickler.is_pickle_store_id(pickle_hash):
+            return None, None
+
         store_id, siblings = self.parameter_parser.pickler.de_pickle_child_items(
             self.parameter_parser.pickle_hash)
         siblings = [s for s in siblings.values() if s.is_playable]
@@ -152,11 +181,43 @@ class VideoAction(AddonAction):
         Logger.debug("Found current item at index %s of %d: %s\n%s", current_idx,
                      len(siblings), media_item, media_item.get_upnext_sort_key())
         if current_idx + 1 >= len(siblings):
-            return
+            return store_id, None
 
         next_item = siblings[current_idx + 1]
         Logger.debug("Found next item: %s\n%s", next_item, next_item.get_upnext_sort_key())
-        self.__notify_up_next(media_item, next_item, store_id)
+        return store_id, next_item
+
+    def __prefetch(self, next_item, store_id, kodi_player, url):
+        """ Resolves the streams, license key and subtitles of the next item and stores it for a
+        limited time, so playing it does not need to resolve it again.
+
+        The streams and tokens are only valid for a few minutes, so this waits until the current
+        item almost finished playing. If playback stops before that, nothing is prefetched.
+
+        :param MediaItem next_item:     The next item.
+        :param str store_id:            The store_id of the parent.
+        :param player.Player kodi_player: The player that plays the current item.
+        :param str url:                 The url of the current item.
+
+        """
+
+        if next_item.complete or next_item.isLive:
+            return
+
+        if not kodi_player.waitForRemainingTime(VideoAction.__prefetch_time_remaining, url=url):
+            return
+
+        try:
+            Logger.info("Prefetching streams for next item: %s", next_item)
+            resolved_item = self.__channel.process_video_item(next_item)
+            if not resolved_item.complete or not resolved_item.has_streams():
+                Logger.warning("Prefetching returned no streams for: %s", next_item)
+                return
+
+            self.parameter_parser.pickler.store_resolved_media_item(
+                "{}--{}".format(store_id, next_item.guid), resolved_item, VideoAction.__resolved_item_ttl)
+        except:
+            Logger.error("Error prefetching streams for: %s", next_item, exc_info=True)
 
     def __notify_up_next(self, current_item, next_item, store_id):
         """ Send a notification to Up Next
@@ -32,7 +32,8 @@ def run_addon():
         log_file = Logger.create_logger(os.path.join(Config.profileDir, Config.logFileNameAddon),
                                         Config.appName,
                                         append=append_log_file,
-                                        dual_logger=lambda x, y=4: xbmc.log(x, y))
+                                        dual_logger=lambda x, y=4: xbmc.log(x, y),
+                                        background=True)
 
         from resources.lib.urihandler import UriHandler
         from resources.lib.addonsettings import AddonSettings
@@ -43,13 +44,21 @@ def run_addon():
 
         use_caching = AddonSettings.cache_http_responses()
         cache_dir = None
+        cache_max_size = None
+        cache_stale_while_revalidate = cache_stale_if_error = 0
         if use_caching:
             cache_dir = Config.cacheDir
+            cache_max_size = AddonSettings.http_cache_size()
+            cache_stale_while_revalidate = AddonSettings.http_cache_stale_while_revalidate()
+            cache_stale_if_error = AddonSettings.http_cache_stale_if_error()
 
         ignore_ssl_errors = AddonSettings.ignore_ssl_errors()
         UriHandler.create_uri_handler(cache_dir=cache_dir,
                                       cookie_jar=os.path.join(Config.profileDir, "cookiejar.dat"),
-                                      ignore_ssl_errors=ignore_ssl_errors)
+                                      ignore_ssl_errors=ignore_ssl_errors,
+                                      cache_max_size=cache_max_size,
+                                      cache_stale_while_revalidate=cache_stale_while_revalidate,
+                                      cache_stale_if_error=cache_stale_if_error)
 
         # start texture handler
         TextureHandler.set_texture_handler(Config, Logger.instance(), UriHandler.instance())
@@ -57,7 +66,19 @@ def run_addon():
         # run the plugin
         from resources.lib import plugin
         p = plugin.Plugin(sys.argv[0], sys.argv[2], sys.argv[1])
-        p.run()
+        try:
+            p.run()
+        finally:
+            # store the changed local settings, even if the plugin failed
+            AddonSettings.commit()
+            # finish storing the listing in the background
+            p.pickler.flush()
+            # persist the changed cookies once per invocation
+            UriHandler.instance().flush()
+            # forget the Vault key, unless the user wants it remembered (if the Vault was used)
+            if "resources.lib.vault" in sys.modules:
+                from resources.lib.vault import Vault
+                Vault.lock(expired_only=True)
 
         # make sure we leave no references behind
         AddonSettings.clear_cached_addon_settings_object()
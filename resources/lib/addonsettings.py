@@ -3,6 +3,7 @@ import json
 import os
 import io
 import uuid
+import hashlib
 import shutil
 import threading
 
@@ -11,7 +12,8 @@ import xbmc
 from resources.lib.logger import Logger                               # this has not further references
 from resources.lib.retroconfig import Config                          # this has not further references
 from resources.lib.helpers.htmlentityhelper import HtmlEntityHelper   # Only has Logger as reference
-from resources.lib.settings import localsettings, kodisettings, settingsstore
+from resources.lib.helpers import fileutils
+from resources.lib.settings import localsettings, kodisettings, settingsstore, settingssnapshot
 
 # Theoretically we could add a remote settings store too!
 KODI = "kodi"
@@ -35,6 +37,15 @@ class AddonSettings(object):
     __setting_stores = {}
     __settings_lock = threading.Lock()
 
+    # The global Kodi settings that are used while creating listings. They are read only once
+    # into a snapshot, as most of them are retrieved for every item.
+    __snapshot = None
+    __SNAPSHOT_SETTINGS = [
+        "show_cloaked_items", "hide_fanart", "use_thumbs_as_fanart", "hide_drm", "hide_premium",
+        "hide_types", "geo_region", "folder_prefix", "folders_as_video", "empty_folder",
+        "list_limit"
+    ]
+
     __language_strings = {}
     __language_current = None
 
@@ -73,6 +84,25 @@ class AddonSettings(object):
             AddonSettings.__setting_stores[store_location] = store
             return store
 
+    @staticmethod
+    def snapshot():
+        """ Returns a read-only snapshot of the global Kodi settings that are used while creating
+        listings. It is created once and is reset when the Kodi settings are changed or cleared.
+
+        :return: The snapshot of the Kodi settings.
+        :rtype:  settingssnapshot.SettingsSnapshot
+
+        """
+
+        snapshot = AddonSettings.__snapshot
+        if snapshot is not None:
+            return snapshot
+
+        snapshot = settingssnapshot.SettingsSnapshot(
+            Logger.instance(), AddonSettings.store(KODI), AddonSettings.__SNAPSHOT_SETTINGS)
+        AddonSettings.__snapshot = snapshot
+        return snapshot
+
     @staticmethod
     def __refresh(store_location):
         """ Removes the instance of the settings store causing a reload.
@@ -82,10 +112,15 @@ class AddonSettings(object):
 
         """
 
+        if store_location == KODI:
+            AddonSettings.__snapshot = None
+
         store = AddonSettings.__setting_stores.pop(store_location, None)
         if store is None:
             return
 
+        store.commit()
+
         # this really only works if no reference to the <store> object is kept somewhere.
         del store
 
@@ -99,11 +134,20 @@ class AddonSettings(object):
         """ Clears the cached add-on settings. This will force a reload for the next INSTANCE
         of an AddonSettings class. """
 
+        AddonSettings.commit()
+        AddonSettings.__snapshot = None
         for store_type in (KODI, LOCAL):
             store = AddonSettings.__setting_stores.pop(store_type, None)
             if store:
                 del store
 
+    @staticmethod
+    def commit():
+        """ Persists the pending changes of all settings stores that are in use. """
+
+        for store in list(AddonSettings.__setting_stores.values()):
+            store.commit()
+
     #endregion
 
     #region Kodi version stuff
@@ -193,6 +237,8 @@ class AddonSettings(object):
         """
 
         AddonSettings.store(store).set_setting(setting_id, value)
+        if store == KODI:
+            AddonSettings.__snapshot = None
         return value
 
     @staticmethod
@@ -245,7 +291,7 @@ class AddonSettings(object):
 
         """
 
-        return AddonSettings.store(KODI).get_boolean_setting("show_cloaked_items")
+        return AddonSettings.snapshot().get_boolean_setting("show_cloaked_items")
 
     @staticmethod
     def show_categories():
@@ -289,7 +335,7 @@ class AddonSettings(object):
 
         """
 
-        return AddonSettings.store(KODI).get_boolean_setting("hide_fanart")
+        return AddonSettings.snapshot().get_boolean_setting("hide_fanart")
 
     @staticmethod
     def use_thumbs_as_fanart():
@@ -300,7 +346,7 @@ class AddonSettings(object):
 
         """
 
-        return AddonSettings.store(KODI).get_boolean_setting("use_thumbs_as_fanart", False)
+        return AddonSettings.snapshot().get_boolean_setting("use_thumbs_as_fanart", False)
 
     @staticmethod
     def hide_drm_items():
@@ -311,7 +357,7 @@ class AddonSettings(object):
 
         """
 
-        return AddonSettings.store(KODI).get_boolean_setting("hide_drm")
+        return AddonSettings.snapshot().get_boolean_setting("hide_drm")
 
     @staticmethod
     def hide_premium_items():
@@ -322,7 +368,7 @@ class AddonSettings(object):
 
         """
 
-        return AddonSettings.store(KODI).get_boolean_setting("hide_premium")
+        return AddonSettings.snapshot().get_boolean_setting("hide_premium")
 
     @staticmethod
     def hide_restricted_folders():
@@ -334,7 +380,7 @@ class AddonSettings(object):
         """
 
         values = [True, False]
-        value = AddonSettings.store(KODI).get_integer_setting("hide_types", default=0)
+        value = AddonSettings.snapshot().get_integer_setting("hide_types", default=0)
         return values[value]
 
     @staticmethod
@@ -368,7 +414,7 @@ class AddonSettings(object):
         # 30074    |30306|30309|30308|30307|30303|30304|30301|30305|30302|30310
         # Disabled |be   |de   |ee   |en-gb|lt   |lv   |nl   |no   |se   |dk
         values = [None, "be", "de", "ee", "en-gb", "lt", "lv", "nl", "no", "se", "dk"]
-        value_index = AddonSettings.store(KODI).get_integer_setting("geo_region", default=0)
+        value_index = AddonSettings.snapshot().get_integer_setting("geo_region", default=0)
         current_geographical_region = values[value_index]
 
         if value_only:
@@ -462,6 +508,19 @@ class AddonSettings(object):
             AddonSettings.store(LOCAL).set_setting(AddonSettings.__CLIENT_ID, client_id)
         return client_id
 
+    @staticmethod
+    def get_vault_key_cache_duration():
+        """ Retrieves after how long the decrypted Vault key should be removed from memory.
+
+        :return: The number of seconds the key may be kept. 0 means it is kept until the
+                 Python interpreter of the add-on is stopped.
+        :rtype: int
+
+        """
+
+        minutes = AddonSettings.store(KODI).get_integer_setting("vault_key_cache", default=0)
+        return minutes * 60
+
     @staticmethod
     def get_adaptive_mode(channel):
         """ Get the channel behaviour for the InputStream Adaptive for the channel.
@@ -572,6 +631,16 @@ class AddonSettings(object):
         Logger.debug("Up Next: installed=%s, use=%s", installed, use)
         return installed and use
 
+    @staticmethod
+    def prefetch_next_episode():
+        """ Should the next episode be resolved while the current one is playing?
+
+        :rtype: bool
+        :return: To prefetch the next episode or not.
+        """
+
+        return AddonSettings.store(KODI).get_boolean_setting("prefetch_next_episode", default=False)
+
     @staticmethod
     def update_user_agent():
         """ Creates a user agent for this instance of XOT
@@ -689,6 +758,64 @@ class AddonSettings(object):
 
         return AddonSettings.store(KODI).get_boolean_setting("http_cache", default=True)
 
+    @staticmethod
+    def http_cache_size():
+        """ Returns the maximum size of the HTTP cache in bytes.
+
+        :return: The maximum number of bytes the HTTP cache may use.
+        :rtype: int
+
+        """
+
+        size_in_mb = AddonSettings.store(KODI).get_integer_setting("http_cache_size", default=100)
+        return size_in_mb * 1024 * 1024
+
+    @staticmethod
+    def http_cache_stale_while_revalidate():
+        """ Returns for how long an expired HTTP response may be served while it is refreshed in
+        the background, if the server did not specify it.
+
+        :return: The number of seconds. 0 means expired responses are never served.
+        :rtype: int
+
+        """
+
+        return AddonSettings.store(KODI).get_integer_setting("http_cache_stale_while_revalidate", default=60)
+
+    @staticmethod
+    def http_cache_stale_if_error():
+        """ Returns for how long an expired HTTP response may be served if the server cannot be
+        reached or returns an error, if the server did not specify it.
+
+        :return: The number of seconds. 0 means expired responses are never served.
+        :rtype: int
+
+        """
+
+        hours = AddonSettings.store(KODI).get_integer_setting("http_cache_stale_if_error", default=24)
+        return hours * 3600
+
+    @staticmethod
+    def get_pickle_store_compression():
+        """ Retrieves the compression that is used for storing listings in the PickleStore.
+
+        0 = Fast  (zlib, level 1)
+        1 = Small (zlib, level 9)
+        2 = None
+
+        :return: The codec and compression level.
+        :rtype: tuple[str|None,int]
+
+        """
+
+        setting = AddonSettings.store(KODI).get_integer_setting("pickle_compression", default=0)
+        if setting == 1:
+            return "zlib", 9
+        elif setting == 2:
+            return None, 0
+        else:
+            return "zlib", 1
+
     @staticmethod
     def ignore_ssl_errors():
         """ Returns True if SSL errors should be ignored from Python
@@ -756,7 +883,7 @@ class AddonSettings(object):
 
         """
 
-        setting = AddonSettings.store(KODI).get_setting("folder_prefix", default="")
+        setting = AddonSettings.snapshot().get_setting("folder_prefix", default="")
         return setting
 
     @staticmethod
@@ -769,7 +896,7 @@ class AddonSettings(object):
 
         """
 
-        return AddonSettings.store(KODI).get_boolean_setting("folders_as_video", default=False)
+        return AddonSettings.snapshot().get_boolean_setting("folders_as_video", default=False)
 
     @staticmethod
     def get_empty_list_behaviour():
@@ -784,8 +911,7 @@ class AddonSettings(object):
 
         """
 
-        setting = AddonSettings.store(KODI).\
-            get_integer_setting("empty_folder", default=2)
+        setting = AddonSettings.snapshot().get_integer_setting("empty_folder", default=2)
 
         if setting == 0:
             return "error"
@@ -814,7 +940,7 @@ class AddonSettings(object):
 
         """
 
-        limit = AddonSettings.store(KODI).get_integer_setting("list_limit", default=5)
+        limit = AddonSettings.snapshot().get_integer_setting("list_limit", default=5)
         return [-1, 10, 50, 75, 100, 150, 200, 1000][limit]
 
     @staticmethod
@@ -992,12 +1118,45 @@ class AddonSettings(object):
         with io.open(filename_template, "r", encoding="utf-8") as fp:
             contents = fp.read()
 
-        new_contents = AddonSettings.__update_add_on_settings_with_country_settings(contents, channels)
-        new_contents, settings_offset_for_visibility, channels_with_settings = \
-            AddonSettings.__update_add_on_settings_with_channel_settings(new_contents, channels)
+        # Hash the input of each of the generated sections, so we only need to regenerate the
+        # sections with changed input. If nothing changed, the settings.xml is still up to date.
+        filename = os.path.join(config.rootDir, "resources", "settings.xml")
+        channels_with_settings = [c for c in channels if c.settings]
+        section_hashes = {
+            "template": AddonSettings.__get_hash([contents, str(config.version)]),
+            "country": AddonSettings.__get_hash(sorted(set(c.language or "" for c in channels))),
+            "settings": AddonSettings.__get_hash(
+                [(c.moduleName, c.guid, c.safe_name, sorted(c.settings, key=lambda a: a["order"]))
+                 for c in channels_with_settings]),
+            "selection": AddonSettings.__get_hash([c.safe_name for c in channels_with_settings])
+        }
+
+        sections_file = os.path.join(config.profileDir, "settingssections.json")
+        sections = AddonSettings.__load_settings_sections(sections_file)
+        changed_sections = [section for section, section_hash in section_hashes.items()
+                            if sections.get(section, {}).get("hash") != section_hash]
+        if not changed_sections and os.path.isfile(filename):
+            Logger.info("Settings.xml is up-to-date. Skipping generation.")
+            return
 
+        Logger.debug("Regenerating settings.xml sections: %s", ", ".join(sorted(changed_sections)))
+        for section in changed_sections:
+            if section == "country":
+                xml = AddonSettings.__get_country_settings_xml(channels)
+            elif section == "settings":
+                xml = AddonSettings.__get_channel_settings_xml(channels)
+            elif section == "selection":
+                xml = AddonSettings.__get_channel_selection_xml(channels_with_settings)
+            else:
+                xml = None
+            sections[section] = {"hash": section_hashes[section], "xml": xml}
+
+        new_contents = AddonSettings.__update_add_on_settings_with_country_settings(
+            contents, sections["country"]["xml"])
+        new_contents = AddonSettings.__update_add_on_settings_with_channel_settings(
+            new_contents, sections["settings"]["xml"])
         new_contents = AddonSettings.__update_add_on_settings_with_channel_selection(
-            new_contents, channels_with_settings)
+            new_contents, sections["selection"]["xml"])
 
         # Now fill the templates, we only import here due to performance penalties of the
         # large number of imports.
@@ -1005,8 +1164,15 @@ class AddonSettings(object):
         th = TemplateHelper(Logger.instance(), template=new_contents)
         new_contents = th.transform()
 
+        # Only replace the settings.xml if it actually changed.
+        if os.path.isfile(filename):
+            with io.open(filename, "r", encoding="utf-8") as fp:
+                if fp.read() == new_contents:
+                    Logger.info("Settings.xml did not change.")
+                    AddonSettings.__save_settings_sections(sections_file, sections)
+                    return
+
         # Finally we insert the new XML into the old one
-        filename = os.path.join(config.rootDir, "resources", "settings.xml")
         filename_temp = os.path.join(config.rootDir, "resources", "settings.tmp.xml")
         try:
             # Backup the user profile settings.xml because sometimes it gets reset. Because in some
@@ -1056,25 +1222,69 @@ class AddonSettings(object):
             return
 
         Logger.info("Settings.xml updated successfully. Reloading settings.")
+        AddonSettings.__save_settings_sections(sections_file, sections)
         AddonSettings.__refresh(KODI)
         return
 
     @staticmethod
-    def __update_add_on_settings_with_channel_selection(contents, channels):
-        """ Adds the settings part that allows the selection of the channel for which the channel settings should
-        be displayed.
+    def __get_hash(value):
+        """ Creates a hash of the JSON representation of a value.
 
-        :param str  contents: The current settings
-        :param list[Any] channels: The available channels
+        :param any value:   The value to hash.
 
-        :return: updated contents
+        :return: The hexadecimal SHA1 hash.
         :rtype: str
 
         """
 
-        if "<!-- start of active channels -->" not in contents:
-            Logger.error("No '<!-- start of active channels -->' found in settings.xml. Stopping updating.")
-            return
+        return hashlib.sha1(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def __load_settings_sections(sections_file):
+        """ Loads the generated settings.xml sections, together with the hashes of their input.
+
+        :param str sections_file:   The file with the sections.
+
+        :return: The sections with their hash and XML.
+        :rtype: dict[str,dict[str,str]]
+
+        """
+
+        if not os.path.isfile(sections_file):
+            return {}
+
+        try:
+            with io.open(sections_file, mode="rb") as fp:
+                return json.loads(fp.read().decode("utf-8"))
+        except:
+            Logger.error("Error loading settings.xml sections from %s", sections_file, exc_info=True)
+            return {}
+
+    @staticmethod
+    def __save_settings_sections(sections_file, sections):
+        """ Stores the generated settings.xml sections, together with the hashes of their input.
+
+        :param str sections_file:                   The file to store the sections in.
+        :param dict[str,dict[str,str]] sections:    The sections with their hash and XML.
+
+        """
+
+        try:
+            fileutils.atomic_write(sections_file, json.dumps(sections))
+        except:
+            Logger.error("Error storing settings.xml sections in %s", sections_file, exc_info=True)
+
+    @staticmethod
+    def __get_channel_selection_xml(channels):
+        """ Creates the settings part that allows the selection of the channel for which the
+        channel settings should be displayed.
+
+        :param list[Any] channels: The channels with settings
+
+        :return: The XML for the channel selection
+        :rtype: str
+
+        """
 
         # Create new XML
         channel_selection_xml = '        <!-- start of active channels -->\n' \
@@ -1082,6 +1292,24 @@ class AddonSettings(object):
         channel_safe_names = "|".join([c.safe_name for c in channels])
         channel_selection_xml = "%s%s" % (channel_selection_xml, channel_safe_names)
         channel_selection_xml = '%s" />' % (channel_selection_xml.rstrip("|"),)
+        return channel_selection_xml
+
+    @staticmethod
+    def __update_add_on_settings_with_channel_selection(contents, channel_selection_xml):
+        """ Adds the settings part that allows the selection of the channel for which the channel settings should
+        be displayed.
+
+        :param str contents:                The current settings
+        :param str channel_selection_xml:   The XML for the channel selection
+
+        :return: updated contents
+        :rtype: str
+
+        """
+
+        if "<!-- start of active channels -->" not in contents:
+            Logger.error("No '<!-- start of active channels -->' found in settings.xml. Stopping updating.")
+            return
 
         # replace the correct parts
         begin = contents[:contents.find('<!-- start of active channels -->')].strip()
@@ -1090,25 +1318,19 @@ class AddonSettings(object):
         return contents
 
     @staticmethod
-    def __update_add_on_settings_with_channel_settings(contents, channels):  # NOSONAR
-        """ Adds the channel specific settings
+    def __get_channel_settings_xml(channels):  # NOSONAR
+        """ Creates the channel specific settings
 
-        This method first aggregates the settings and then adds them.
+        This method first aggregates the settings and then creates the XML.
 
-        :param str contents: The current settings
         :param list[any] channels: The available channels
 
-        :return: updated contents and the offset in visibility
+        :return: The XML for the channel settings
         :rtype: str
 
         """
 
-        if "<!-- begin of channel settings -->" not in contents:
-            Logger.error("No '<!-- begin of channel settings -->' found in settings.xml. Stopping updating.")
-            return
-
         settings = dict()
-        channels_with_settings = []
 
         # There are 2 settings between the selector list and the channel settings in the settings_template.xml
         setting_offset_for_visibility = 2
@@ -1162,9 +1384,6 @@ class AddonSettings(object):
                         'visible="', 'visible="eq(-{0},%s)|' % (channel.safe_name,))
                     settings[channel.moduleName][xml_index] = (setting_tuple[0], setting)
 
-            # Add it to channels with settings
-            channels_with_settings.append(channel)
-
         xml_content = '\n        <!-- begin of channel settings -->\n'
         # Sort them to make the result more consistent
         # noinspection PyUnresolvedReferences
@@ -1175,29 +1394,41 @@ class AddonSettings(object):
                 setting_offset_for_visibility += 1
                 xml_content = "%s        %s\n" % (xml_content, setting.format(setting_offset_for_visibility))
 
+        Logger.trace("Generated channel settings:\n%s", xml_content)
+        return xml_content
+
+    @staticmethod
+    def __update_add_on_settings_with_channel_settings(contents, xml_content):
+        """ Adds the channel specific settings
+
+        :param str contents:        The current settings
+        :param str xml_content:     The XML for the channel settings
+
+        :return: updated contents
+        :rtype: str
+
+        """
+
+        if "<!-- begin of channel settings -->" not in contents:
+            Logger.error("No '<!-- begin of channel settings -->' found in settings.xml. Stopping updating.")
+            return
+
         begin = contents[:contents.find('<!-- begin of channel settings -->')].strip()
         end = contents[contents.find('<!-- end of channel settings -->'):]
-
-        Logger.trace("Generated channel settings:\n%s", xml_content)
         contents = "%s\n%s\n        %s" % (begin, xml_content.rstrip(), end)
-        return contents, setting_offset_for_visibility, channels_with_settings
+        return contents
 
     @staticmethod
-    def __update_add_on_settings_with_country_settings(contents, channels):
-        """ Adds the channel showing/hiding to the settings.xml
+    def __get_country_settings_xml(channels):
+        """ Creates the channel showing/hiding settings
 
-        :param str|unicode contents:    The current settings
         :param list[any] channels:      The available channels
 
-        :return: updated contents and the offset in visibility
+        :return: The XML for the channel showing/hiding
         :rtype: str
 
         """
 
-        if "<!-- start of channel selection -->" not in contents:
-            Logger.error("No '<!-- start of channel selection -->' found in settings.xml. Stopping updating.")
-            return
-
         # First we create a new bit of settings file.
         channel_xml = '        <!-- start of channel selection -->\n'
 
@@ -1217,6 +1448,23 @@ class AddonSettings(object):
         for language in language_lookup_sorted_keys:
             channel_xml = '%s        <setting id="%s" type="bool" label="%s" subsetting="false" default="true" />\n' \
                          % (channel_xml, language_lookup[language][0], language_lookup[language][1])
+        return channel_xml
+
+    @staticmethod
+    def __update_add_on_settings_with_country_settings(contents, channel_xml):
+        """ Adds the channel showing/hiding to the settings.xml
+
+        :param str|unicode contents:    The current settings
+        :param str channel_xml:         The XML for the channel showing/hiding
+
+        :return: updated contents
+        :rtype: str
+
+        """
+
+        if "<!-- start of channel selection -->" not in contents:
+            Logger.error("No '<!-- start of channel selection -->' found in settings.xml. Stopping updating.")
+            return
 
         begin = contents[:contents.find('<!-- start of channel selection -->')].strip()
         end = contents[contents.find('<!-- end of channel selection -->'):].strip()
@@ -1276,6 +1524,7 @@ class AddonSettings(object):
         value = pattern % (value, "ListLimit", AddonSettings.get_list_limit())
         value = pattern % (value, "Loglevel", AddonSettings.get_log_level())
         value = pattern % (value, "Ignore SSL Errors", AddonSettings.ignore_ssl_errors())
+        value = pattern % (value, "PickleStore Compression", AddonSettings.get_pickle_store_compression())
         value = pattern % (value, "Geo Location", AddonSettings.hide_geo_locked_items_for_location(None, value_only=True))
         value = pattern % (value, "Filter Folders", AddonSettings.hide_restricted_folders())
         value = pattern % (value, "DRM/Paid Warning", AddonSettings.show_drm_paid_warning())
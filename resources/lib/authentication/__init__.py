@@ -1,3 +1,4 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-__all__ = ["authenticator", "authenticationhandler", "authenticationresult", "rtlxlhandler"]
+__all__ = ["authenticator", "authenticationhandler", "authenticationresult", "rtlxlhandler",
+           "tokencache"]
@@ -5,6 +5,7 @@ import random
 
 from resources.lib.authentication.authenticationhandler import AuthenticationHandler
 from resources.lib.authentication.authenticationresult import AuthenticationResult
+from resources.lib.authentication.tokencache import TokenCache
 from resources.lib.addonsettings import AddonSettings, LOCAL
 from resources.lib.helpers.htmlentityhelper import HtmlEntityHelper
 from resources.lib.helpers.jsonhelper import JsonHelper
@@ -129,10 +130,8 @@ class RtlXlHandler(AuthenticationHandler):
 
         """
 
-        token_data = UriHandler.open("https://api.rtl.nl/rtlxl/token/api/2/token", no_cache=True)
-        token_json = JsonHelper(token_data)
-        token = token_json.get_value("accessToken")
-        return token
+        return TokenCache.instance().get_token(
+            self._realm, self.__user_id, self.__fetch_authentication_token, lifetime=300)
 
     def log_off(self, username):
         """ Check if the user with the given name is currently authenticated.
@@ -146,9 +145,23 @@ class RtlXlHandler(AuthenticationHandler):
 
         # clean older data
         UriHandler.delete_cookie(domain=".sso.rtl.nl")
+        TokenCache.instance().invalidate(self._realm)
         AddonSettings.set_setting(self.__setting_signature, "", store=LOCAL)
         return True
 
+    def __fetch_authentication_token(self):
+        """ Fetches a new authentication token for the current login.
+
+        :return: The token value and its expiry time (if known).
+        :rtype: tuple[str|None,float|None]
+
+        """
+
+        token_data = UriHandler.open("https://api.rtl.nl/rtlxl/token/api/2/token", no_cache=True)
+        token_json = JsonHelper(token_data)
+        token = token_json.get_value("accessToken")
+        return token, TokenCache.get_jwt_expiry(token)
+
     def __extract_session_data(self, logon_data):
         """
 
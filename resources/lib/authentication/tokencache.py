@@ -0,0 +1,294 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import base64
+import calendar
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+
+from resources.lib.logger import Logger
+from resources.lib.helpers import fileutils
+
+
+class TokenCache(object):
+    FILE_NAME = "tokens.json"
+
+    __instance = None
+    __instance_lock = threading.Lock()
+    __iso_regex = re.compile(r"^(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:\.\d+)?"
+                             r"(?:(Z)|([+-])(\d{2}):?(\d{2}))?$")
+
+    def __init__(self, path, refresh_margin=60):
+        """ A cache for short lived (authentication, player or DRM) tokens that is shared by all
+        channels and that is persisted across plugin invocations.
+
+        Tokens are stored by their `realm` (the service that issued them) and an `identity` (the
+        user or credentials they were issued for). The identity is only stored as a hash. Tokens
+        are refreshed `refresh_margin` seconds before they expire, so a token that is handed out
+        is still valid by the time it is actually used. Only a single thread at a time fetches a
+        token for a realm and identity, the others wait for that token.
+
+        :param str path:            The full path of the JSON file that holds the tokens.
+        :param int refresh_margin:  The number of seconds before the expiry time at which tokens
+                                    are refreshed.
+
+        """
+
+        self.path = path
+        self.refresh_margin = refresh_margin
+
+        self.__tokens = {}
+        self.__modified = None
+        self.__lock = threading.Lock()
+        self.__key_locks = {}
+
+    @staticmethod
+    def instance():
+        """ Returns the TokenCache that stores its tokens in the profile folder.
+
+        :return: The shared TokenCache instance
+        :rtype: TokenCache
+
+        """
+
+        with TokenCache.__instance_lock:
+            if TokenCache.__instance is None:
+                from resources.lib.retroconfig import Config
+                TokenCache.__instance = TokenCache(
+                    os.path.join(Config.profileDir, TokenCache.FILE_NAME))
+            return TokenCache.__instance
+
+    def get_token(self, realm, identity, fetch, lifetime=None):
+        """ Returns a valid token for the realm and identity, fetching a new one if needed.
+
+        The `fetch` method should return a tuple with the token and the time (seconds since epoch)
+        at which it expires. If that time is None, the token is valid for `lifetime` seconds. If
+        both are None, the token is returned but not cached.
+
+        If fetching fails for a token that is about to expire (but still valid), the current
+        token is returned.
+
+        :param str realm:                                       The realm of the token.
+        :param str|None identity:                               The identity of the token.
+        :param () -> tuple[any,float|int|None] fetch:           Method to fetch a new token.
+        :param int|None lifetime:                               The default lifetime in seconds.
+
+        :return: The token or None if no token could be fetched.
+        :rtype: any
+
+        """
+
+        key = self.__get_key(realm, identity)
+        with self.__get_key_lock(key):
+            entry = self.__get_entry(key)
+            now = time.time()
+            if entry and entry["expires"] - self.refresh_margin > now:
+                Logger.debug("Using cached token for '%s' (valid for %ds)",
+                             realm, entry["expires"] - now)
+                return entry["token"]
+
+            if entry and entry["expires"] > now:
+                Logger.debug("Refreshing token for '%s' that expires in %ds",
+                             realm, entry["expires"] - now)
+            else:
+                Logger.debug("Fetching new token for '%s'", realm)
+
+            try:
+                token, expires = fetch()
+            except Exception:
+                if entry and entry["expires"] > now:
+                    Logger.warning("Error refreshing token for '%s', using current one",
+                                   realm, exc_info=True)
+                    return entry["token"]
+                raise
+
+            if token is None:
+                if entry and entry["expires"] > now:
+                    return entry["token"]
+                return None
+
+            if expires is None and lifetime is not None:
+                expires = time.time() + lifetime
+            if expires is None:
+                Logger.debug("Not caching token for '%s' without an expiry time", realm)
+                return token
+
+            self.__set_entry(key, {"token": token, "expires": float(expires)})
+            return token
+
+    def invalidate(self, realm, identity=None):
+        """ Removes the tokens of a realm. If an identity is specified only its token is removed.
+
+        :param str realm:               The realm of the token(s).
+        :param str|None identity:       The identity of the token.
+
+        """
+
+        with self.__lock:
+            self.__load()
+            if identity is None:
+                prefix = "{0}|".format(realm)
+                keys = [k for k in self.__tokens if k.startswith(prefix)]
+            else:
+                keys = [k for k in (self.__get_key(realm, identity), ) if k in self.__tokens]
+
+            if not keys:
+                return
+
+            for key in keys:
+                del self.__tokens[key]
+            Logger.debug("Removed %d token(s) for '%s'", len(keys), realm)
+            self.__save()
+
+    @staticmethod
+    def get_expiry(value):
+        """ Converts an expiry value as returned by an API into seconds since epoch.
+
+        Supported are: seconds since epoch, milliseconds since epoch and ISO 8601 date-times in
+        UTC or with an UTC offset.
+
+        :param int|float|str|None value:    The value to convert.
+
+        :return: The expiry time in seconds since epoch or None if it could not be determined.
+        :rtype: float|None
+
+        """
+
+        if value is None:
+            return None
+
+        if isinstance(value, (int, float)) or (hasattr(value, "isdigit") and value.isdigit()):
+            value = float(value)
+            # Anything beyond the year 5138 is in milliseconds.
+            return value / 1000.0 if value > 1e11 else value
+
+        match = TokenCache.__iso_regex.match(value)
+        if not match:
+            Logger.warning("Unknown token expiry format: %s", value)
+            return None
+
+        parts = match.groups()
+        expires = calendar.timegm(tuple(int(p) for p in parts[:6]) + (0, 0, 0))
+        if parts[7]:
+            offset = int(parts[8]) * 3600 + int(parts[9]) * 60
+            expires += -offset if parts[7] == "+" else offset
+        return float(expires)
+
+    @staticmethod
+    def get_jwt_expiry(token):
+        """ Returns the expiry time (the `exp` claim) of a JSON Web Token.
+
+        :param str token:   The JSON Web Token.
+
+        :return: The expiry time in seconds since epoch or None if it is not a JWT or it does not
+                 expire.
+        :rtype: float|None
+
+        """
+
+        parts = (token or "").split(".")
+        if len(parts) != 3:
+            return None
+
+        payload = parts[1] + "=" * (-len(parts[1]) % 4)
+        try:
+            claims = json.loads(base64.urlsafe_b64decode(str(payload)).decode("utf-8"))
+        except (ValueError, TypeError):
+            return None
+
+        if not isinstance(claims, dict):
+            return None
+        return TokenCache.get_expiry(claims.get("exp"))
+
+    def __get_entry(self, key):
+        """ Returns the cache entry for a key.
+
+        :param str key: The key of the token.
+
+        :rtype: dict[str,any]|None
+
+        """
+
+        with self.__lock:
+            self.__load()
+            return self.__tokens.get(key)
+
+    def __set_entry(self, key, entry):
+        """ Stores an entry and persists all tokens to disk.
+
+        :param str key:                 The key of the token.
+        :param dict[str,any] entry:     The entry.
+
+        """
+
+        with self.__lock:
+            self.__load()
+            self.__tokens[key] = entry
+            self.__save()
+
+    def __get_key_lock(self, key):
+        """ Returns the lock that is used while fetching the token for the given key.
+
+        :param str key: The key of the token.
+
+        :rtype: threading.Lock
+
+        """
+
+        with self.__lock:
+            lock = self.__key_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self.__key_locks[key] = lock
+            return lock
+
+    def __load(self):
+        """ (Re)loads the tokens if the file was modified by another plugin invocation. """
+
+        try:
+            modified = os.path.getmtime(self.path)
+        except OSError:
+            return
+
+        if modified == self.__modified:
+            return
+
+        try:
+            with io.open(self.path, "r", encoding="utf-8") as fp:
+                tokens = json.load(fp)
+        except (IOError, OSError, ValueError):
+            Logger.error("Error loading tokens from %s", self.path, exc_info=True)
+            tokens = {}
+
+        self.__tokens = tokens if isinstance(tokens, dict) else {}
+        self.__modified = modified
+
+    def __save(self):
+        """ Writes all tokens that have not yet expired to disk. """
+
+        now = time.time()
+        self.__tokens = dict((k, v) for k, v in self.__tokens.items() if v["expires"] > now)
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        fileutils.atomic_write(self.path, json.dumps(self.__tokens, separators=(",", ":")))
+        self.__modified = os.path.getmtime(self.path)
+
+    def __get_key(self, realm, identity):
+        """ Creates the key for a token. The identity is hashed, as it might be a secret itself.
+
+        :param str realm:               The realm of the token.
+        :param str|None identity:       The identity of the token.
+
+        :rtype: str
+
+        """
+
+        identity = (identity or "").encode("utf-8") if not isinstance(identity, bytes) else identity
+        return "{0}|{1}".format(realm, hashlib.sha1(identity).hexdigest())
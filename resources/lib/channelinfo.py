@@ -232,18 +232,44 @@ class ChannelInfo(object):
             Logger.debug("Fetching ChannelInfo from ChannelInfo Cache for '%s'", path)
             return ChannelInfo.__channel_cache[path]
 
-        channel_infos = []
+        return ChannelInfo.from_dict(path, ChannelInfo.read_json(path))
+
+    @staticmethod
+    def read_json(path):
+        """ Reads the json meta data file of a channel set.
+
+        :param str path: The path of the json file.
+
+        :return: The content of the json file.
+        :rtype: dict
+
+        """
 
         with io.open(path, mode="r", encoding="utf-8") as json_file:
             json_data = json_file.read()
 
-        json = JsonHelper(json_data, logger=Logger.instance())
-        channels = json.get_value("channels")  # type: dict
+        return JsonHelper(json_data, logger=Logger.instance()).json
 
-        if "settings" in json.json:
-            settings = json.get_value("settings")
-        else:
-            settings = []
+    @staticmethod
+    def from_dict(path, json_data):
+        """ Generates a list of ChannelInfo objects from the content of a json meta data file.
+
+        :param str path:                The path of the json file.
+        :param dict json_data:          The content of the json file.
+
+        :return: The channel info objects within the json data.
+        :rtype: list[ChannelInfo]
+
+        """
+
+        if path in ChannelInfo.__channel_cache:
+            Logger.debug("Fetching ChannelInfo from ChannelInfo Cache for '%s'", path)
+            return ChannelInfo.__channel_cache[path]
+
+        channel_infos = []
+
+        channels = json_data["channels"]  # type: dict
+        settings = json_data.get("settings", [])
         Logger.debug("Found %s channels and %s settings in %s", len(channels), len(settings), path)
 
         for channel in channels:
@@ -17,7 +17,7 @@ from resources.lib.xbmcwrapper import XbmcWrapper
 from resources.lib.retroconfig import Config
 from resources.lib.logger import Logger
 from resources.lib.urihandler import UriHandler
-from resources.lib.parserdata import ParserData
+from resources.lib.parserdata import ParserData, ParserDataIndex
 from resources.lib.textures import TextureHandler
 
 from resources.lib.helpers.htmlentityhelper import HtmlEntityHelper
@@ -95,6 +95,7 @@ class Channel:
         # self.dataHandlers = dict()
         # self.updateHandlers = dict()
         self.dataParsers = dict()
+        self.__dataParserIndex = None   # : dispatch index for the dataParsers, build on first use
 
         self.episodeItemRegex = ''      # : used for the ParseMainList
         self.episodeItemJson = None     # : used for the ParseMainList
@@ -240,18 +241,23 @@ class Channel:
         # The the other handlers
         Logger.trace("Processing %s Normal DataParsers", len(data_parsers))
         handler_json = None
+        log_debug = Logger.is_enabled_for(Logger.LVL_DEBUG)
+        log_trace = Logger.is_enabled_for(Logger.LVL_TRACE)
         for data_parser in data_parsers:
-            Logger.debug("[DataParsers] Processing %s", data_parser)
+            if log_debug:
+                Logger.debug("[DataParsers] Processing %s", data_parser)
 
             # Check for preprocessors
             if data_parser.PreProcessor:
-                Logger.debug("[DataParsers] Processing DataParser.PreProcessor")
+                if log_debug:
+                    Logger.debug("[DataParsers] Processing DataParser.PreProcessor")
                 (handler_data, pre_items) = data_parser.PreProcessor(data)
                 items += pre_items
             else:
                 handler_data = data
 
-            Logger.debug("[DataParsers] Processing DataParser.Parser")
+            if log_debug:
+                Logger.debug("[DataParsers] Processing DataParser.Parser")
             if data_parser.Parser is None or (data_parser.Parser == "" and not data_parser.IsJson):
                 if data_parser.Creator:
                     Logger.warning("No <parser> found for %s. Skipping.", data_parser.Creator)
@@ -260,13 +266,15 @@ class Channel:
             if data_parser.IsJson:
                 if handler_json is None:
                     # Cache the json requests to improve performance
-                    Logger.trace("Caching JSON results for Dataparsing")
+                    if log_trace:
+                        Logger.trace("Caching JSON results for Dataparsing")
                     if isinstance(handler_data, JsonHelper):
                         handler_json = handler_data
                     else:
                         handler_json = JsonHelper(handler_data, Logger.instance())
 
-                Logger.trace(data_parser.Parser)
+                if log_trace:
+                    Logger.trace(data_parser.Parser)
                 parser_results = handler_json.json
                 for parser in data_parser.Parser:
                     # Find the right elements
@@ -298,7 +306,8 @@ class Channel:
                 else:
                     parser_results = Regexer.do_regex(data_parser.Parser, handler_data)
 
-            Logger.debug("[DataParsers] Processing DataParser.Creator for %s items", len(parser_results))
+            if log_debug:
+                Logger.debug("[DataParsers] Processing DataParser.Creator for %s items", len(parser_results))
             for parser_result in parser_results:
                 handler_result = data_parser.Creator(parser_result)
                 if handler_result is not None:
@@ -308,12 +317,14 @@ class Channel:
                         items.append(handler_result)
 
             if data_parser.PostProcessor:
-                Logger.debug("[DataParsers] Processing DataParser.PostProcessor")
+                if log_debug:
+                    Logger.debug("[DataParsers] Processing DataParser.PostProcessor")
                 if data_parser.IsJson:
                     items = data_parser.PostProcessor(handler_json, items)
                 else:
                     items = data_parser.PostProcessor(handler_data, items)
-                Logger.trace("Post-processing returned %d items", len(items))
+                if log_trace:
+                    Logger.trace("Post-processing returned %d items", len(items))
 
         # The post processors
         num_post_procs = len(generic_post_procs)
@@ -923,6 +934,9 @@ class Channel:
             self.dataParsers[url].append(data)
         else:
             self.dataParsers[url] = [data]
+
+        # The index needs to be rebuild
+        self.__dataParserIndex = None
         return
 
     def _get_setting(self, setting_id, value_for_none=None):
@@ -1004,17 +1018,12 @@ class Channel:
             else:
                 Logger.warning("no DataParser was found keyword [%s]. Continuing with other options.", url)
         else:
-            # make sure we sort by keylength and then start with the longest one.
-            keys = sorted(self.dataParsers.keys(), key=len, reverse=True)
-            # watch.lap("DataParsers sorted")
-
-            # filter them in order
-            for key in keys:
-                # for each key we see if we have filtered results
-                data_parsers = [d for d in self.dataParsers[key] if d.matches(url)]
-                if data_parsers:
-                    Logger.trace("Found %s direct DataParsers matches", len(data_parsers))
-                    break
+            # The index returns the matches of the longest key with matching DataParsers.
+            if self.__dataParserIndex is None:
+                self.__dataParserIndex = ParserDataIndex(self.dataParsers)
+            data_parsers = self.__dataParserIndex.get_data_parsers(url)
+            if data_parsers:
+                Logger.trace("Found %s direct DataParsers matches", len(data_parsers))
             # watch.lap("DataParsers filtered")
 
         if not data_parsers:
@@ -6,107 +6,382 @@ import requests.utils
 from requests.adapters import HTTPAdapter, DEFAULT_POOLSIZE, DEFAULT_RETRIES, DEFAULT_POOLBLOCK
 from requests.structures import CaseInsensitiveDict
 
-import json
 import hashlib
+import threading
 
-from .streamcache import StreamCache
+from .cachestore import CacheStore
 from resources.lib.logger import Logger
 
 
 class CacheHTTPAdapter(HTTPAdapter):
+    # The chunk size that is used to read the bodies of responses that will be cached.
+    CHUNK_SIZE = 256 * 1024
 
     def __init__(self, cache_store, force_cache_duration,
                  pool_connections=DEFAULT_POOLSIZE, pool_maxsize=DEFAULT_POOLSIZE,
-                 max_retries=DEFAULT_RETRIES, pool_block=DEFAULT_POOLBLOCK):
+                 max_retries=DEFAULT_RETRIES, pool_block=DEFAULT_POOLBLOCK,
+                 stale_while_revalidate=0, stale_if_error=24 * 3600):
         """ Creates a Caching HTTP Adapter for the Requests module.
 
-        :param StreamCache cache_store:         The Cache store to use.
+        :param CacheStore cache_store:          The Cache store to use.
         :param int|None force_cache_duration:   Should a forced cache duration be used?
 
         :param int pool_connections:            Size of connection pool.
         :param int pool_maxsize:                Maximum number of active connections.
         :param int max_retries:                 Maximum number of retries.
         :param bool pool_block:                 Use the default pool?
+        :param int stale_while_revalidate:      The number of seconds an expired response may be
+                                                served while it is revalidated in the background,
+                                                if the server did not specify it.
+        :param int stale_if_error:              The number of seconds an expired response may be
+                                                served if the server cannot be reached or returns
+                                                an error, if the server did not specify it.
 
         """
 
-        self.cache_store = cache_store                      # type: StreamCache
-        self.force_cache_duration = force_cache_duration    # type: int
+        self.cache_store = cache_store                      # type: CacheStore
+        self.default_cache_duration = force_cache_duration  # type: int
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+
+        # The adapter is shared by all requests of a session, so the per-request options are
+        # stored per thread.
+        self.__request_options = threading.local()
+
+        # The background revalidations (cache key -> thread)
+        self.__revalidations = {}
+        self.__revalidations_lock = threading.Lock()
 
         super(CacheHTTPAdapter, self).__init__(pool_connections, pool_maxsize, max_retries,
                                                pool_block)
 
+    @property
+    def force_cache_duration(self):
+        """ The forced cache duration for requests from the current thread.
+
+        :rtype: int|None
+
+        """
+
+        return getattr(self.__request_options, "force_cache_duration", self.default_cache_duration)
+
+    @property
+    def no_cache(self):
+        """ Indication whether caching is disabled for requests from the current thread.
+
+        :rtype: bool
+
+        """
+
+        return getattr(self.__request_options, "no_cache", False)
+
+    def set_request_options(self, no_cache=False, force_cache_duration=None):
+        """ Sets the cache options for the next requests from the current thread.
+
+        :param bool no_cache:                   Should the cache be bypassed completely.
+        :param int|None force_cache_duration:   Should a forced cache duration be used?
+
+        """
+
+        self.__request_options.no_cache = no_cache
+        self.__request_options.force_cache_duration = force_cache_duration
+
+    def wait_for_revalidations(self, timeout=None):
+        """ Waits for the running background revalidations to finish.
+
+        :param float|None timeout:  The maximum number of seconds to wait per revalidation.
+
+        """
+
+        with self.__revalidations_lock:
+            threads = list(self.__revalidations.values())
+
+        for thread in threads:
+            thread.join(timeout)
+
     def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if self.no_cache:
+            return super(CacheHTTPAdapter, self).send(request, stream, timeout, verify, cert, proxies)
+
+        key = self.__get_cache_key(request)
+        meta = None
         try:
             if request.method == "GET":
-                response = self.__get_cached_response(request)
+                meta = self.cache_store.get_meta(key)
+                response = self.__get_cached_response(request, key, meta, stream)
+                if response is None and meta is not None and self.__is_stale_while_revalidate(meta):
+                    response = self.__get_stale_response(request, key, meta, stream)
+                    if response:
+                        self.__revalidate_in_background(request, key, meta, timeout, verify, cert, proxies)
+
                 if response:
                     self.cache_store.cacheHits += 1
                     return response
+
+                self.cache_store.cacheMisses += 1
+                if meta is not None:
+                    self.__add_conditional_headers(request, meta)
         except:
             Logger.error("Error retrieving cache for %s", request.url, exc_info=True)
 
         # Actually send a request
         Logger.debug("Retrieving data from: %s", request.url)
-        response = super(CacheHTTPAdapter, self).send(request, stream, timeout, verify, cert, proxies)
+        try:
+            response = super(CacheHTTPAdapter, self).send(request, stream, timeout, verify, cert, proxies)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            stale_response = self.__get_stale_if_error_response(request, key, meta, stream)
+            if stale_response is None:
+                raise
+            Logger.warning("Error retrieving %s. Using the stale cached response.", request.url, exc_info=True)
+            return stale_response
+
+        if response.status_code >= 500:
+            stale_response = self.__get_stale_if_error_response(request, key, meta, stream)
+            if stale_response is not None:
+                Logger.warning("Server error %s for %s. Using the stale cached response.",
+                               response.status_code, request.url)
+                response.close()
+                return stale_response
+
+        return self.__process_response(request, key, response, stream)
+
+    def __process_response(self, req, key, response, stream=False):
+        """ Stores a cacheable response or, in case of a 304, renews the cached response and
+        returns that one.
+
+        :param requests.PreparedRequest req:    The request.
+        :param str key:                         The cache key.
+        :param requests.Response response:      The response from the server.
+        :param bool stream:                     Should the cached body be streamed?
+
+        :return: The response to use.
+        :rtype: requests.Response
+
+        """
 
         try:
             # Cache it if it was a cacheable response
             cache_data = self.__extract_cache_data(response.headers)
             if self.__should_cache(response, cache_data):
-                self.__store_response(request, response, cache_data)
+                self.__store_response(req, response, cache_data)
 
             if response.status_code == 304:
                 Logger.debug("304 Response found. Prolonging the %s", response.url)
-                self.cache_store.cacheHits += 1
-                response = self.__get_cached_response(request, no_check=True)
+                self.cache_store.touch(key)
+                cached_response = self.__get_stale_response(req, key, self.cache_store.get_meta(key), stream)
+                if cached_response:
+                    self.cache_store.cacheHits += 1
+                    response = cached_response
         except:
-            Logger.error("Error storing cache for %s", request.url, exc_info=True)
+            Logger.error("Error storing cache for %s", req.url, exc_info=True)
 
         return response
 
-    def __get_cached_response(self, req, no_check=False):
-        body_key, meta_key = self.__get_cache_keys(req)
-        if not self.cache_store.has_cache_key(meta_key) or not \
-                self.cache_store.has_cache_key(body_key):
+    def __get_cached_response(self, req, key, meta, stream=False):
+        """ Returns the cached response if it is still fresh.
+
+        :param requests.PreparedRequest req:    The request.
+        :param str key:                         The cache key.
+        :param dict[str,any]|None meta:         The meta data of the cache entry.
+        :param bool stream:                     Should the cached body be streamed?
+
+        :return: A response or None if there was no fresh cache entry.
+        :rtype: requests.Response|None
+
+        """
+
+        if meta is None:
             Logger.debug("No-Cache-Hit: %s", req.url)
             return None
 
-        with self.cache_store.get(meta_key) as fd:
-            meta = json.load(fd)
-        headers = CaseInsensitiveDict(data=meta["headers"])
-        cache_data = meta.get("cache_data")
+        if self.cache_store.is_expired(meta, self.__get_max_age(meta)):
+            Logger.debug("Expired Cache-Hit: %s", req.url)
+            return None
+
+        resp = self.__get_stale_response(req, key, meta, stream)
+        if resp is None:
+            Logger.debug("No-Cache-Hit: %s", req.url)
+            return None
+
+        Logger.debug("Cache-Hit: %s", req.url)
+        return resp
+
+    def __get_stale_response(self, req, key, meta, stream=False):
+        """ Creates a response for a cache entry without checking whether it is still fresh.
+
+        If the body is not streamed, it is read in a single call and the file-like object from
+        the cache store is closed. Otherwise it will be read (and closed) by requests itself.
+
+        :param requests.PreparedRequest req:    The request.
+        :param str key:                         The cache key.
+        :param dict[str,any]|None meta:         The meta data of the cache entry.
+        :param bool stream:                     Should the cached body be streamed?
+
+        :return: A response or None if the entry was not present.
+        :rtype: requests.Response|None
+
+        """
+
+        if meta is None:
+            return None
+
+        body = self.cache_store.get_body(key)
+        if body is None:
+            return None
 
         resp = requests.Response()
         resp.url = meta.get("url", req.url)
-        resp.raw = self.cache_store.get(body_key)
+        resp.raw = body
         resp.status_code = meta["status"]
         resp.reason = meta.get("reason")
-        resp.headers = headers
+        resp.headers = CaseInsensitiveDict(data=meta["headers"])
         resp.encoding = meta["encoding"]
         resp.request = req
 
-        if no_check:
-            return resp
+        if not stream:
+            # Read it at once, instead of letting requests copy it in small chunks.
+            try:
+                resp._content = body.read()
+            finally:
+                body.close()
+            resp._content_consumed = True
+        return resp
+
+    def __get_stale_if_error_response(self, req, key, meta, stream=False):
+        """ Returns the cached response when the server could not be reached and the entry is
+        still within its `stale-if-error` period.
+
+        :param requests.PreparedRequest req:    The request.
+        :param str key:                         The cache key.
+        :param dict[str,any]|None meta:         The meta data of the cache entry.
+        :param bool stream:                     Should the cached body be streamed?
+
+        :return: A response or None if no stale response may be used.
+        :rtype: requests.Response|None
+
+        """
+
+        if meta is None:
+            return None
+
+        window = self.__get_stale_window(meta.get("cache_data"), "stale-if-error", self.stale_if_error)
+        if not window or self.cache_store.is_expired(meta, self.__get_max_age(meta) + window):
+            return None
+
+        response = self.__get_stale_response(req, key, meta, stream)
+        if response:
+            # The lookup was counted as a miss, but the cache served it after all.
+            self.cache_store.cacheMisses -= 1
+            self.cache_store.cacheHits += 1
+        return response
+
+    def __is_stale_while_revalidate(self, meta):
+        """ Checks whether an expired entry is still within its `stale-while-revalidate` period.
+
+        :param dict[str,any] meta:  The meta data of the cache entry.
+
+        :rtype: bool
+
+        """
+
+        if self.force_cache_duration is not None:
+            # A forced cache duration means that the caller wants fresh data.
+            return False
 
-        # Determine the maximum age and then check if the cache if valid or not.
+        window = self.__get_stale_window(
+            meta.get("cache_data"), "stale-while-revalidate", self.stale_while_revalidate)
+        return bool(window) and not self.cache_store.is_expired(meta, self.__get_max_age(meta) + window)
+
+    def __revalidate_in_background(self, request, key, meta, timeout, verify, cert, proxies):
+        """ Starts a background thread that revalidates (or refreshes) a stale cache entry.
+
+        :param requests.PreparedRequest request:    The original request.
+        :param str key:                             The cache key.
+        :param dict[str,any] meta:                  The meta data of the cache entry.
+
+        """
+
+        with self.__revalidations_lock:
+            if key in self.__revalidations and self.__revalidations[key].is_alive():
+                Logger.debug("Already revalidating %s", request.url)
+                return
+
+            revalidate_request = request.copy()
+            self.__add_conditional_headers(revalidate_request, meta)
+            thread = threading.Thread(
+                target=self.__revalidate, name="Revalidate-{0}".format(key),
+                args=(revalidate_request, key, timeout, verify, cert, proxies))
+            thread.daemon = True
+            self.__revalidations[key] = thread
+
+        Logger.debug("Serving stale %s while revalidating it in the background", request.url)
+        thread.start()
+
+    def __revalidate(self, request, key, timeout, verify, cert, proxies):
+        try:
+            response = super(CacheHTTPAdapter, self).send(request, False, timeout, verify, cert, proxies)
+            self.__process_response(request, key, response)
+            response.close()
+            Logger.debug("Revalidated %s in the background: %s", request.url, response.status_code)
+        except:
+            Logger.warning("Error revalidating %s in the background", request.url, exc_info=True)
+        finally:
+            with self.__revalidations_lock:
+                self.__revalidations.pop(key, None)
+
+    def __get_max_age(self, meta):
+        """ Determine the number of seconds a cache entry is considered fresh.
+
+        :param dict[str,any] meta:  The meta data of the cache entry.
+
+        :rtype: int
+
+        """
+
+        cache_data = meta.get("cache_data")
         Logger.trace("Cache-Data: %s", cache_data)
-        valid_in_seconds = 3600
         if self.force_cache_duration is not None:
-            valid_in_seconds = self.force_cache_duration
+            return self.force_cache_duration
         elif 'max-age' in cache_data:
-            valid_in_seconds = cache_data['max-age']
-
-        if self.cache_store.is_expired(meta_key, valid_in_seconds):
-            if self.__must_revalidate(cache_data):
-                Logger.debug("Stale-Cache hit found. Revalidating")
-                req.headers["If-None-Match"] = headers["etag"]
-            else:
-                Logger.debug("Expired Cache-Hit: %s", req.url)
-            return None
+            return cache_data['max-age']
+        return 3600
 
-        Logger.debug("Cache-Hit: %s", req.url)
-        return resp
+    def __get_stale_window(self, cache_data, directive, default):
+        """ Returns the number of seconds a stale entry may be served for the given directive.
+
+        :param dict[str,any] cache_data:    The cache data of the entry.
+        :param str directive:               The `stale-while-revalidate` or `stale-if-error`.
+        :param int default:                 The window to use if the server did not specify one.
+
+        :rtype: int
+
+        """
+
+        if "must-revalidate" in cache_data or "proxy-revalidate" in cache_data or \
+                "no-cache" in cache_data:
+            return 0
+
+        window = cache_data.get(directive)
+        if window is None or isinstance(window, bool):
+            return default
+        return window
+
+    def __add_conditional_headers(self, req, meta):
+        """ Adds the `If-None-Match` and `If-Modified-Since` headers for revalidation of a
+        cached response.
+
+        :param requests.PreparedRequest req:    The request to add the headers to.
+        :param dict[str,any] meta:              The meta data of the cache entry.
+
+        """
+
+        headers = CaseInsensitiveDict(data=meta["headers"])
+        if "etag" in headers:
+            Logger.debug("Stale-Cache hit found. Revalidating using the etag")
+            req.headers["If-None-Match"] = headers["etag"]
+        if "last-modified" in headers:
+            Logger.debug("Stale-Cache hit found. Revalidating using the last-modified date")
+            req.headers["If-Modified-Since"] = headers["last-modified"]
 
     def __extract_cache_data(self, headers):
         """ Extracts cache data from the `cache-control` headers.
@@ -217,30 +492,14 @@ class CacheHTTPAdapter(HTTPAdapter):
 
     def __store_response(self, req, res, cache_data):
         Logger.debug("Storing cache for: %s", res.url)
-        body_key, meta_key = self.__get_cache_keys(req)
-
-        # Store the body as a binary file and reset the raw and _content_consumed attributes
-        # of the response so we can reuse it again
-        with self.cache_store.set(body_key) as fp:
-            for chunk in res.iter_content(chunk_size=128):
-                fp.write(chunk)
-
-        # we need to restore some original response protected members and the raw content. The
-        # latter is an urllib3 response, but we can use an BytesIO as long as we add some required
-        # stuff such as _original_response.
-        original_response = None
-        if hasattr(res.raw, '_original_response'):
-            original_response = res.raw._original_response
-
-        # set the raw content so we can use it again
-        res.raw = self.cache_store.get(body_key)
-        res._content_consumed = False
-        if original_response:
-            res.raw._original_response = original_response
-
-        # store all headers and cache-data and store it in a json file
-        data = {
-            "body": body_key,
+        key = self.__get_cache_key(req)
+
+        # Store the body, headers and cache-data as a single cache entry. The body is read in
+        # large chunks and kept as the content of the response, so it can be used directly and
+        # does not need to be read back from the cache.
+        body = b"".join(res.iter_content(chunk_size=CacheHTTPAdapter.CHUNK_SIZE))
+        res._content = body
+        meta = {
             "url": res.url,
             "headers": dict(
                 (k, v) for k, v in res.headers.items()
@@ -250,45 +509,11 @@ class CacheHTTPAdapter(HTTPAdapter):
             "encoding": res.encoding,
             "cache_data": cache_data
         }
-        with self.cache_store.set(meta_key) as fp:
-            json_str = json.dumps(data, indent=2)
-            fp.write(json_str.encode())
-        Logger.trace(data)
-
+        self.cache_store.set(key, meta, body)
+        Logger.trace(meta)
         return
 
-    def __must_revalidate(self, cache_data):
-        """ Checks if a cached response should be revalidated
-
-        Arguments:
-        meta_data : dict - the response to check.
-
-        If True is returned the response has a must-revalidate cache parameters
-        and an ETAG.
-
-        """
-
-        # No cache data present, so no need to revalidate the thing.
-        if not cache_data:
-            Logger.trace("No cache data found for a cached request. No "
-                         "need to revalidate as it's either expired or not.")
-            return False
-
-        # Only revalidate if we were told and if we have an etag
-        # if "must-revalidate" in cache_data or "proxy-revalidate" in cache_data:
-        #     if "etag" in cache_data:
-        #         return True
-
-        # always revalidate a etag as many sites don't provide the ....-revalidate option.
-        if "etag" in cache_data:
-            return True
-
-        return False
-
-    def __get_cache_keys(self, req):
+    def __get_cache_key(self, req):
         hash_tool = hashlib.md5()
         hash_tool.update(req.url.encode())
-        key = hash_tool.hexdigest()
-        body_file = "{0}.body".format(key)
-        meta_file = "{0}.meta".format(key)
-        return body_file, meta_file
+        return hash_tool.hexdigest()
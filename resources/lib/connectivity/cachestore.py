@@ -0,0 +1,175 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import time
+
+
+class CacheStore(object):
+    # The file mask of files the store manages itself and that should not be cleaned up externally.
+    FILE_MASK = None
+
+    def __init__(self, cache_path, max_size=None):
+        """ Base class for the stores that are used by the CacheHTTPAdapter.
+
+        A store keeps a single entry per cache key. Each entry consists of a meta data dictionary
+        and a binary body. The meta data contains at least these keys:
+
+        * url        - the (redirected) url of the response
+        * status     - the HTTP status code
+        * reason     - the HTTP reason phrase
+        * encoding   - the encoding of the response
+        * headers    - a dictionary with the response headers
+        * cache_data - the parsed cache-control and etag data
+        * stored_at  - the time (seconds since epoch) the entry was stored or renewed
+
+        If a `max_size` is specified, the least recently used entries are evicted once the total
+        size of the bodies exceeds it.
+
+        :param str cache_path:      The path in which the store keeps its data.
+        :param int|None max_size:   The maximum total size of the bodies in bytes.
+
+        """
+
+        self.cacheHits = 0
+        self.cacheMisses = 0
+        self.cachePath = cache_path
+        self.maxSize = max_size
+
+    def get_meta(self, key):
+        """ Retrieves the meta data of a cache entry.
+
+        :param str key:     The cache key.
+
+        :return: The meta data or None if there was no entry for the key.
+        :rtype: dict[str,any]|None
+
+        """
+
+        raise NotImplementedError
+
+    def get_body(self, key):
+        """ Retrieves the body of a cache entry as a read-only file-like object and marks the
+        entry as recently used. The object might be backed by the store (a memory mapped file for
+        instance), so the caller should close it once it was read.
+
+        :param str key:     The cache key.
+
+        :return: The body or None if there was no entry for the key.
+        :rtype: io.BytesIO|mmap.mmap|None
+
+        """
+
+        raise NotImplementedError
+
+    def set(self, key, meta, body):
+        """ Stores (or replaces) a cache entry.
+
+        :param str key:                 The cache key.
+        :param dict[str,any] meta:      The meta data. The `stored_at` is set by the store.
+        :param bytes body:              The binary body.
+
+        """
+
+        raise NotImplementedError
+
+    def touch(self, key):
+        """ Renews the `stored_at` time of an entry, after it was revalidated.
+
+        :param str key:     The cache key.
+
+        """
+
+        raise NotImplementedError
+
+    def remove(self, key):
+        """ Removes an entry from the cache.
+
+        :param str key:     The cache key.
+
+        """
+
+        raise NotImplementedError
+
+    def clean_up(self, max_age):
+        """ Removes all entries that were stored more than `max_age` seconds ago.
+
+        :param int max_age:     The maximum age in seconds.
+
+        :return: The number of removed entries.
+        :rtype: int
+
+        """
+
+        raise NotImplementedError
+
+    def get_entry_count(self):
+        """ The number of entries in the cache.
+
+        :rtype: int
+
+        """
+
+        raise NotImplementedError
+
+    def get_size(self):
+        """ The total size of all the bodies in the cache in bytes.
+
+        :rtype: int
+
+        """
+
+        raise NotImplementedError
+
+    def get_statistics(self):
+        """ Returns a summary of the cache usage, suitable for logging.
+
+        :rtype: str
+
+        """
+
+        return "{0} hits, {1} misses, {2} entries, {3:.1f} of {4} MB used".format(
+            self.cacheHits, self.cacheMisses, self.get_entry_count(),
+            self.get_size() / 1024.0 / 1024.0,
+            "unlimited" if self.maxSize is None else self.maxSize // (1024 * 1024))
+
+    def has_cache_key(self, key):
+        """ Returns if a key is present (expired or not) in the cache.
+
+        :param str key:     The cache key.
+
+        :rtype: bool
+
+        """
+
+        return self.get_meta(key) is not None
+
+    def is_expired(self, meta, seconds=3600):
+        """ Checks whether an entry is expired, based on its meta data only.
+
+        :param dict[str,any] meta:  The meta data of the entry.
+        :param int seconds:         The number of seconds the entry is valid.
+
+        :rtype: bool
+
+        """
+
+        return meta.get("stored_at", 0) + seconds < time.time()
+
+    def _get_eviction_target(self, size):
+        """ Returns the number of bytes that should be freed given the current size. To prevent
+        evicting on every new entry, entries are evicted until 90% of the maximum size is used.
+
+        :param int size:    The current total size in bytes.
+
+        :return: The number of bytes to free (0 if nothing needs to be evicted).
+        :rtype: int
+
+        """
+
+        if self.maxSize is None or size <= self.maxSize:
+            return 0
+        return size - int(self.maxSize * 0.9)
+
+    def close(self):
+        """ Releases all resources held by the store. """
+
+        pass
@@ -0,0 +1,131 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import time
+
+from resources.lib.backtothefuture import PY2
+if PY2:
+    # noinspection PyCompatibility,PyUnresolvedReferences
+    from cookielib import MozillaCookieJar
+else:
+    # noinspection PyCompatibility
+    from http.cookiejar import MozillaCookieJar
+
+from resources.lib.helpers import fileutils
+from resources.lib.logger import Logger
+
+
+class DeferredCookieJar(MozillaCookieJar):
+    def __init__(self, filename, save_interval=None):
+        """ A MozillaCookieJar that only writes to disk if the cookies have actually changed.
+
+        Changes are tracked and only persisted on an explicit `flush()` (typically at the end of
+        the plugin invocation) or, if a `save_interval` was specified, by `save_if_due()` once
+        that interval has passed since the last write.
+
+        :param str filename:                The path of the cookie jar file.
+        :param int|None save_interval:      The minimal number of seconds between two writes that
+                                            are triggered by `save_if_due()`. None means only
+                                            write on `flush()`.
+
+        """
+
+        MozillaCookieJar.__init__(self, filename)
+        self.save_interval = save_interval
+        self.changed = False
+        self.__last_save = time.time()
+
+    def set_cookie(self, cookie):
+        """ Sets a cookie and marks the jar as changed if it was a new or modified cookie.
+
+        :param cookielib.Cookie cookie: The cookie to set.
+
+        """
+
+        # noinspection PyUnresolvedReferences
+        current = self._cookies.get(cookie.domain, {}).get(cookie.path, {}).get(cookie.name)
+        if current is None or current.value != cookie.value or \
+                current.expires != cookie.expires or current.secure != cookie.secure:
+            self.changed = True
+
+        MozillaCookieJar.set_cookie(self, cookie)
+
+    def clear(self, domain=None, path=None, name=None):
+        MozillaCookieJar.clear(self, domain, path, name)
+        self.changed = True
+
+    def clear_session_cookies(self):
+        count = len(self)
+        MozillaCookieJar.clear_session_cookies(self)
+        self.changed = self.changed or count != len(self)
+
+    def clear_expired_cookies(self):
+        count = len(self)
+        MozillaCookieJar.clear_expired_cookies(self)
+        self.changed = self.changed or count != len(self)
+
+    def load(self, filename=None, ignore_discard=False, ignore_expires=False):
+        MozillaCookieJar.load(self, filename, ignore_discard, ignore_expires)
+        # What was just loaded is what is on disk.
+        self.changed = False
+
+    def save(self, filename=None, ignore_discard=False, ignore_expires=False):
+        """ Saves the cookies atomically: they are written to a temporary file which then
+        replaces the actual cookie jar file. So a crash can never leave a half written jar.
+
+        :param str filename:            The filename to save to (defaults to the jar file).
+        :param bool ignore_discard:     Also save cookies that should be discarded.
+        :param bool ignore_expires:     Also save expired cookies.
+
+        """
+
+        filename = filename or self.filename
+        temp_filename = fileutils.get_temp_path(filename)
+
+        # Requests can run in parallel, so make sure only a single thread at a time writes.
+        # noinspection PyUnresolvedReferences
+        with self._cookies_lock:
+            try:
+                MozillaCookieJar.save(self, temp_filename, ignore_discard, ignore_expires)
+                fileutils.replace(temp_filename, filename)
+            except:
+                if os.path.isfile(temp_filename):
+                    os.remove(temp_filename)
+                raise
+
+            self.changed = False
+            self.__last_save = time.time()
+
+    def save_if_due(self):
+        """ Saves the changed cookies if the save interval has passed since the last write.
+
+        :return: Indication whether the jar was written.
+        :rtype: bool
+
+        """
+
+        if not self.changed or self.save_interval is None:
+            return False
+
+        if time.time() - self.__last_save < self.save_interval:
+            return False
+
+        Logger.debug("Saving changed cookies after %ss", self.save_interval)
+        self.save()
+        return True
+
+    def flush(self):
+        """ Writes the cookie jar if any of the cookies changed since the last write.
+
+        :return: Indication whether the jar was written.
+        :rtype: bool
+
+        """
+
+        if not self.changed:
+            Logger.trace("No changed cookies to save")
+            return False
+
+        Logger.debug("Saving changed cookies to %s", self.filename)
+        self.save()
+        return True
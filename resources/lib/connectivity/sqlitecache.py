@@ -0,0 +1,197 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import io
+
+from resources.lib.connectivity.cachestore import CacheStore
+from resources.lib.logger import Logger
+
+
+class SqliteCache(CacheStore):
+    FILE_NAME = "httpcache.db"
+    FILE_MASK = "httpcache.db*"
+    SCHEMA_VERSION = 2
+
+    def __init__(self, cache_path, max_size=None):
+        """ A cache store that keeps all entries in a single SQLite database in WAL mode.
+
+        The meta data of the entries is stored in indexed columns, so checking if an entry is
+        still fresh does not need any file system calls or JSON parsing of the body meta data.
+
+        :param str cache_path:      The path in which the `www` cache folder is created.
+        :param int|None max_size:   The maximum total size of the bodies in bytes.
+
+        """
+
+        super(SqliteCache, self).__init__(os.path.join(cache_path, "www"), max_size)
+        if not os.path.isdir(self.cachePath):
+            os.makedirs(self.cachePath)
+
+        self.databasePath = os.path.join(self.cachePath, SqliteCache.FILE_NAME)
+        self.__lock = threading.RLock()
+
+        try:
+            self.__connection = self.__open()
+        except sqlite3.DatabaseError:
+            Logger.error("Error opening the HTTP cache database (It got corrupted). Recreating it.",
+                         exc_info=True)
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.isfile(self.databasePath + suffix):
+                    os.remove(self.databasePath + suffix)
+            self.__connection = self.__open()
+
+    def get_meta(self, key):
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT url, status, reason, encoding, headers, cache_data, stored_at "
+                "FROM responses WHERE key = ?", (key, )).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            "url": row[0],
+            "status": row[1],
+            "reason": row[2],
+            "encoding": row[3],
+            "headers": json.loads(row[4]),
+            "cache_data": json.loads(row[5]),
+            "stored_at": row[6]
+        }
+
+    def get_body(self, key):
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT body FROM responses WHERE key = ?", (key, )).fetchone()
+            if row is None:
+                return None
+
+            self.__connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        # SQLite blobs cannot be memory mapped, but the BytesIO shares the buffer of the blob
+        # that was returned, so this does not create any additional copy of the body.
+        body = row[0] if isinstance(row[0], bytes) else bytes(row[0])
+        return io.BytesIO(body)
+
+    def set(self, key, meta, body):
+        if self.maxSize is not None and len(body) > self.maxSize:
+            Logger.debug("Not caching %s bytes as it exceeds the cache size", len(body))
+            self.remove(key)
+            return
+
+        now = time.time()
+        with self.__lock:
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, url, status, reason, encoding, headers, cache_data, stored_at, accessed_at, "
+                "size, body) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, meta.get("url"), meta["status"], meta.get("reason"), meta.get("encoding"),
+                 json.dumps(meta.get("headers", {})), json.dumps(meta.get("cache_data", {})),
+                 now, now, len(body), sqlite3.Binary(body)))
+
+            if self.maxSize is not None:
+                self.__evict()
+
+    def touch(self, key):
+        with self.__lock:
+            self.__connection.execute(
+                "UPDATE responses SET stored_at = ? WHERE key = ?", (time.time(), key))
+
+    def remove(self, key):
+        with self.__lock:
+            self.__connection.execute("DELETE FROM responses WHERE key = ?", (key, ))
+
+    def clean_up(self, max_age):
+        with self.__lock:
+            cursor = self.__connection.execute(
+                "DELETE FROM responses WHERE stored_at < ?", (time.time() - max_age, ))
+            removed = cursor.rowcount
+            if removed:
+                # Give the freed pages back to the file system.
+                self.__connection.execute("PRAGMA incremental_vacuum")
+                self.__connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        Logger.info("Removed %s entries from %s", removed, self)
+        return removed
+
+    def get_entry_count(self):
+        with self.__lock:
+            return self.__connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get_size(self):
+        with self.__lock:
+            return self.__connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+    def __evict(self):
+        """ Removes the least recently used entries if the cache exceeds its maximum size. """
+
+        to_free = self._get_eviction_target(self.get_size())
+        if not to_free:
+            return
+
+        keys = []
+        freed = 0
+        for key, size in self.__connection.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if freed >= to_free:
+                break
+            keys.append((key, ))
+            freed += size
+
+        self.__connection.execute("BEGIN")
+        self.__connection.executemany("DELETE FROM responses WHERE key = ?", keys)
+        self.__connection.execute("COMMIT")
+        Logger.debug("Evicted %s entries (%s bytes) from %s", len(keys), freed, self)
+
+    def __open(self):
+        """ Opens the database, enables the WAL journal and creates the schema if needed.
+
+        :return: The connection to the database.
+        :rtype: sqlite3.Connection
+
+        """
+
+        # Autocommit mode: every statement is a transaction of its own. The connection is shared
+        # between threads, so all access goes through the lock.
+        connection = sqlite3.connect(self.databasePath, timeout=10,
+                                     isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != SqliteCache.SCHEMA_VERSION:
+            Logger.info("Creating HTTP cache schema version %s (was %s)",
+                        SqliteCache.SCHEMA_VERSION, version)
+            # Only has effect on new databases, which is fine
+            connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            connection.execute("DROP TABLE IF EXISTS responses")
+            connection.execute(
+                "CREATE TABLE responses ("
+                "key TEXT PRIMARY KEY, "
+                "url TEXT, "
+                "status INTEGER NOT NULL, "
+                "reason TEXT, "
+                "encoding TEXT, "
+                "headers TEXT NOT NULL, "
+                "cache_data TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "body BLOB NOT NULL)")
+            connection.execute("CREATE INDEX responses_stored_at ON responses (stored_at)")
+            # Covers both the size totals and the least recently used order.
+            connection.execute("CREATE INDEX responses_lru ON responses (accessed_at, size)")
+            connection.execute("PRAGMA user_version = {0}".format(SqliteCache.SCHEMA_VERSION))
+        return connection
+
+    def __str__(self):
+        return "SQLite Cache store [{0}]".format(self.databasePath)
@@ -2,9 +2,13 @@
 
 import os
 import io
-import datetime
+import json
+import mmap
+import time
 import threading
 
+from resources.lib.connectivity.cachestore import CacheStore
+
 # lock object to use.
 cacheLock = threading.RLock()
 
@@ -35,49 +39,142 @@ def locked_read_write(origfunc):
     return execute_locked
 
 
-class StreamCache(object):
-    def __init__(self, cache_path):
-        self.cacheHits = 0
-        self.cachePath = os.path.join(cache_path, "www")
+class StreamCache(CacheStore):
+    def __init__(self, cache_path, max_size=None):
+        """ A file based cache store that stores a `.body` and a `.meta` file per entry.
+
+        It is the fallback for platforms without SQLite support. The modification time of the
+        `.body` file is used as the last access time of the entry.
+
+        :param str cache_path:      The path in which the `www` cache folder is created.
+        :param int|None max_size:   The maximum total size of the bodies in bytes.
+
+        """
+
+        super(StreamCache, self).__init__(os.path.join(cache_path, "www"), max_size)
         if not os.path.isdir(self.cachePath):
             os.makedirs(self.cachePath)
 
     @locked_read_write
-    def set(self, key):
-        file_name = os.path.join(self.cachePath, key)
-        fp = io.open(file_name, mode="w+b")
-        return fp
+    def get_meta(self, key):
+        file_name = self.__get_file_name(key, "meta")
+        if not os.path.isfile(file_name):
+            return None
 
-    @locked_read_write
-    def get(self, key):
-        file_name = os.path.join(self.cachePath, key)
         with io.open(file_name, mode="rb") as fp:
-            return io.BytesIO(fp.read())
+            meta = json.loads(fp.read().decode())
 
-    def is_expired(self, key, seconds=3600):
-        file_name = os.path.join(self.cachePath, key)
+        if "stored_at" not in meta:
+            # Entries from older versions do not have a `stored_at`.
+            meta["stored_at"] = os.path.getmtime(file_name)
+        return meta
+
+    @locked_read_write
+    def get_body(self, key):
+        file_name = self.__get_file_name(key, "body")
         if not os.path.isfile(file_name):
-            return False
+            return None
+
+        # mark it as recently used
+        os.utime(file_name, None)
+        with io.open(file_name, mode="rb") as fp:
+            if not os.fstat(fp.fileno()).st_size:
+                # Empty files cannot be mapped.
+                return io.BytesIO()
 
-        store_time = datetime.datetime.fromtimestamp(os.path.getmtime(file_name))
-        valid_until = store_time + datetime.timedelta(seconds=seconds)
-        if valid_until < datetime.datetime.now():
-            return True
+            # Map the file read-only instead of copying it into memory. The mapping stays valid
+            # after the file itself was closed.
+            return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
 
-        return False
+    @locked_read_write
+    def set(self, key, meta, body):
+        if self.maxSize is not None and len(body) > self.maxSize:
+            self.remove(key)
+            return
 
-    def has_cache_key(self, key):
-        """ Returns if a key is present (expired or not) in the cache.
+        with io.open(self.__get_file_name(key, "body"), mode="wb") as fp:
+            # Write it in a single call, without any intermediate copies.
+            fp.write(body)
 
-        Arguments:
-        key     : String  - The key to use to check the cache values
+        meta = dict(meta)
+        meta["stored_at"] = time.time()
+        with io.open(self.__get_file_name(key, "meta"), mode="wb") as fp:
+            fp.write(json.dumps(meta).encode())
 
-        Returns True or False
+        if self.maxSize is not None:
+            self.__evict()
+
+    @locked_read_write
+    def touch(self, key):
+        meta = self.get_meta(key)
+        if meta is None:
+            return
+
+        meta["stored_at"] = time.time()
+        with io.open(self.__get_file_name(key, "meta"), mode="wb") as fp:
+            fp.write(json.dumps(meta).encode())
+
+    @locked_read_write
+    def remove(self, key):
+        for extension in ("meta", "body"):
+            file_name = self.__get_file_name(key, extension)
+            if os.path.isfile(file_name):
+                os.remove(file_name)
+
+    @locked_read_write
+    def clean_up(self, max_age):
+        removed = 0
+        for file_name in os.listdir(self.cachePath):
+            key, extension = os.path.splitext(file_name)
+            if extension != ".meta":
+                continue
+
+            meta = self.get_meta(key)
+            if meta is not None and self.is_expired(meta, max_age):
+                self.remove(key)
+                removed += 1
+        return removed
+
+    def get_entry_count(self):
+        return len([f for f in os.listdir(self.cachePath) if f.endswith(".meta")])
+
+    def get_size(self):
+        return sum(size for _, _, size in self.__get_bodies())
+
+    def __evict(self):
+        """ Removes the least recently used entries if the cache exceeds its maximum size. """
+
+        bodies = self.__get_bodies()
+        to_free = self._get_eviction_target(sum(size for _, _, size in bodies))
+        if not to_free:
+            return
+
+        freed = 0
+        for _, key, size in sorted(bodies):
+            if freed >= to_free:
+                break
+            self.remove(key)
+            freed += size
+
+    def __get_bodies(self):
+        """ Lists the last access time, key and size of all bodies in the cache.
+
+        :rtype: list[tuple[float,str,int]]
 
         """
 
-        file_name = os.path.join(self.cachePath, key)
-        return os.path.isfile(file_name)
+        bodies = []
+        for file_name in os.listdir(self.cachePath):
+            key, extension = os.path.splitext(file_name)
+            if extension != ".body":
+                continue
+
+            stat = os.stat(os.path.join(self.cachePath, file_name))
+            bodies.append((stat.st_mtime, key, stat.st_size))
+        return bodies
+
+    def __get_file_name(self, key, extension):
+        return os.path.join(self.cachePath, "{0}.{1}".format(key, extension))
 
     def __str__(self):
         return "Cache store [{0}]".format(self.cachePath)
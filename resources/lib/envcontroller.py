@@ -234,7 +234,7 @@ class EnvController:
         return True
 
     @staticmethod
-    def cache_clean_up(path, cache_time, mask="*.*"):
+    def cache_clean_up(path, cache_time, mask="*.*", exclude=None):
         """Cleans up the XOT cache folder.
 
         Check the cache files create timestamp and compares it with the current datetime extended
@@ -244,6 +244,7 @@ class EnvController:
         :param str path:        The cache path to clean.
         :param int cache_time:  The minimum (in seconds) of files that will be deleted.
         :param str mask:        The file mask to consider when cleaning the cache.
+        :param str exclude:     The file mask of files that should never be removed.
 
         """
 
@@ -269,6 +270,9 @@ class EnvController:
                     current_dir = root
 
                 for basename in files:
+                    if exclude and fnmatch.fnmatch(basename, exclude):
+                        continue
+
                     if fnmatch.fnmatch(basename, mask):
                         filename = os.path.join(root, basename)
                         Logger.trace("Inspecting: %s", filename)
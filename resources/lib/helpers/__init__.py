@@ -1,4 +1,4 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 __all__ = ["encodinghelper", "htmlentityhelper", "stopwatch", "xmlhelper", "jsonhelper", "htmlhelper",
            "channelimporter", "jsonhelper", "datehelper", "taghelperbase", "languagehelper",
-           "sessionhelper", "logsender", "templatehelper"]
+           "sessionhelper", "logsender", "templatehelper", "fileutils"]
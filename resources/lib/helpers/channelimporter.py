@@ -2,6 +2,8 @@
 
 import sys
 import os
+import io
+import json
 import datetime
 import time
 
@@ -12,6 +14,7 @@ if PY3:
 from resources.lib.addonsettings import AddonSettings
 from resources.lib.xbmcwrapper import XbmcWrapper
 from resources.lib.helpers.languagehelper import LanguageHelper
+from resources.lib.helpers import fileutils
 from resources.lib.retroconfig import Config
 from resources.lib.channelinfo import ChannelInfo
 from resources.lib.logger import Logger
@@ -56,9 +59,14 @@ class ChannelIndex(object):
         """
 
         self.__INTERNAL_CHANNEL_PATH = "channels"
+        self.__CHANNEL_INDEX = os.path.join(Config.profileDir, "channelindex.json")
+        self.__CHANNEL_INDEX_VERSION = 1
 
         # initialise the collections
         self.__allChannels = []  # list of all available channels, used for deduplications
+        self.__channelIndex = None  # the persisted index of the channel sets
+        self.__channelIndexChanged = False
+        self.__unindexedSets = {}  # the json data of channel sets that are not indexed yet
 
         self.validAt = datetime.datetime.now()
         self.id = int(time.time())
@@ -93,9 +101,11 @@ class ChannelIndex(object):
         # determine the channel folder
         channel_path = os.path.join(Config.rootDir, self.__INTERNAL_CHANNEL_PATH)
         channel_pack, channel_set = channel_id.rsplit(".", 1)
-        channel_set_info_path = os.path.join(channel_path, channel_pack, channel_set, "chn_{}.json".format(channel_set))
+        channel_set_path = os.path.join(channel_path, channel_pack, channel_set)
+        channel_set_info_path = os.path.join(channel_set_path, "chn_{}.json".format(channel_set))
 
-        channel_infos = ChannelInfo.from_json(channel_set_info_path)
+        channel_infos, is_indexed = self.__get_indexed_channel_infos(
+            channel_id, channel_set_path, channel_set_info_path)
         if channel_code is None:
             channel_infos = [ci for ci in channel_infos if ci.channelCode is None]
         else:
@@ -109,7 +119,7 @@ class ChannelIndex(object):
             Logger.debug("Found single channel in the channel index: %s.", channel_infos[0])
 
         channel_info = channel_infos[0]
-        if self.__is_channel_set_updated(channel_info):
+        if not is_indexed and self.__is_channel_set_updated(channel_info):
             Logger.warning("Found updated channel_set: %s.", channel_set_info_path)
 
             # new we should init all channels by loading them all, just to be sure that all is ok
@@ -117,6 +127,11 @@ class ChannelIndex(object):
             self.get_channels()
             return self.get_channel(channel_id, channel_code)
 
+        if not is_indexed:
+            # The channel set is up-to-date, so it can be indexed.
+            self.__add_to_channel_index(channel_id, channel_set_path, channel_set_info_path)
+            self.__save_channel_index()
+
         if channel_info.ignore:
             Logger.warning("Channel %s is ignored in channel set", channel_info)
             return None
@@ -151,6 +166,9 @@ class ChannelIndex(object):
         channels_updated = False
         country_visibility = {}
 
+        channel_index = self.__get_channel_index()
+        indexed_sets = {}
+
         channel_path = os.path.join(Config.rootDir, self.__INTERNAL_CHANNEL_PATH)
         for channel_pack in os.listdir(channel_path):
             if not channel_pack.startswith("channel."):
@@ -161,11 +179,13 @@ class ChannelIndex(object):
                 if not os.path.isdir(channel_set_path):
                     continue
 
+                channel_set_id = "{}.{}".format(channel_pack, channel_set)
                 channel_set_info_path = os.path.join(channel_set_path, "chn_{}.json".format(channel_set))
-                channel_infos = ChannelInfo.from_json(channel_set_info_path)
+                channel_infos, is_indexed = self.__get_indexed_channel_infos(
+                    channel_set_id, channel_set_path, channel_set_info_path)
 
                 # Check if the channel was updated
-                if self.__is_channel_set_updated(channel_infos[0]):
+                if not is_indexed and self.__is_channel_set_updated(channel_infos[0]):
                     if not channels_updated:
                         # this was the first update found (otherwise channelsUpdated was True) show a message:
                         title = LanguageHelper.get_localized_string(LanguageHelper.InitChannelTitle)
@@ -180,6 +200,10 @@ class ChannelIndex(object):
                     for channel_info in channel_infos:
                         self.__initialise_channel(channel_info)
 
+                if not is_indexed:
+                    self.__add_to_channel_index(channel_set_id, channel_set_path, channel_set_info_path)
+                indexed_sets[channel_set_id] = channel_index["sets"][channel_set_id]
+
                 # Check the channel validity
                 for channel_info in channel_infos:
                     if not self.__channel_is_correct(channel_info):
@@ -202,6 +226,10 @@ class ChannelIndex(object):
 
                     Logger.debug("Found channel: %s", channel_info)
 
+        # Only keep the channel sets that still exist.
+        channel_index["sets"] = indexed_sets
+        self.__save_channel_index()
+
         if channels_updated:
             Logger.info("New or updated channels found. Updating add-on configuration for all channels and user agent.")
             AddonSettings.update_add_on_settings_with_channels(valid_channels, Config)
@@ -239,6 +267,111 @@ class ChannelIndex(object):
         Logger.debug("Found these categories: %s", ", ".join(categories))
         return categories
 
+    def __get_indexed_channel_infos(self, channel_set_id, channel_set_path, channel_set_info_path):
+        """ Retrieves the ChannelInfo objects of a channel set, from the channel index if its
+        entry is still valid. Otherwise they are read from the channel set's json file and the
+        index is updated.
+
+        An entry is valid as long as the modification times of the channel set folder and its
+        json file did not change. Valid entries belong to channel sets that were already
+        initialised, so they don't need to be checked for updates anymore.
+
+        :param str channel_set_id:          The id of the channel set (channel.<pack>.<set>).
+        :param str channel_set_path:        The path of the channel set.
+        :param str channel_set_info_path:   The path of the channel set's json file.
+
+        :return: The ChannelInfo objects and whether they came from a valid index entry.
+        :rtype: tuple[list[ChannelInfo],bool]
+
+        """
+
+        channel_index = self.__get_channel_index()
+        mtimes = self.__get_modification_times(channel_set_path, channel_set_info_path)
+
+        entry = channel_index["sets"].get(channel_set_id)
+        if entry is not None and entry["mtimes"] == mtimes:
+            return ChannelInfo.from_dict(channel_set_info_path, entry["data"]), True
+
+        json_data = ChannelInfo.read_json(channel_set_info_path)
+        self.__unindexedSets[channel_set_id] = json_data
+        return ChannelInfo.from_dict(channel_set_info_path, json_data), False
+
+    def __add_to_channel_index(self, channel_set_id, channel_set_path, channel_set_info_path):
+        """ Adds a channel set that was read by `__get_indexed_channel_infos` to the channel
+        index. Should only be done once the channel set is initialised.
+
+        :param str channel_set_id:          The id of the channel set (channel.<pack>.<set>).
+        :param str channel_set_path:        The path of the channel set.
+        :param str channel_set_info_path:   The path of the channel set's json file.
+
+        """
+
+        Logger.debug("Indexing channel set: %s", channel_set_id)
+        # Initialising might have changed the modification times, so fetch them again.
+        self.__get_channel_index()["sets"][channel_set_id] = {
+            "mtimes": self.__get_modification_times(channel_set_path, channel_set_info_path),
+            "data": self.__unindexedSets.pop(channel_set_id)
+        }
+        self.__channelIndexChanged = True
+
+    def __get_modification_times(self, channel_set_path, channel_set_info_path):
+        """ Returns the modification times that determine whether a channel set index entry is
+        still valid.
+
+        :param str channel_set_path:        The path of the channel set.
+        :param str channel_set_info_path:   The path of the channel set's json file.
+
+        :rtype: list[float]
+
+        """
+
+        return [os.path.getmtime(channel_set_path), os.path.getmtime(channel_set_info_path)]
+
+    def __get_channel_index(self):
+        """ Loads the persisted channel index. It is only used if it was created by the same
+        version of the add-on.
+
+        :return: The channel index with the indexed channel sets in `sets`.
+        :rtype: dict
+
+        """
+
+        if self.__channelIndex is not None:
+            return self.__channelIndex
+
+        self.__channelIndexChanged = False
+        version = str(Config.version)
+        try:
+            with io.open(self.__CHANNEL_INDEX, mode="r", encoding="utf-8") as fp:
+                channel_index = json.load(fp)
+
+            if channel_index.get("version") == version and \
+                    channel_index.get("index_version") == self.__CHANNEL_INDEX_VERSION:
+                self.__channelIndex = channel_index
+                return channel_index
+            Logger.info("Channel index was created for another version. Rebuilding it.")
+        except (IOError, OSError):
+            Logger.info("No channel index found. Building it.")
+        except ValueError:
+            Logger.warning("Error loading the channel index. Rebuilding it.", exc_info=True)
+
+        self.__channelIndex = {
+            "version": version,
+            "index_version": self.__CHANNEL_INDEX_VERSION,
+            "sets": {}
+        }
+        return self.__channelIndex
+
+    def __save_channel_index(self):
+        """ Stores the channel index, if it was changed. """
+
+        if not self.__channelIndexChanged:
+            return
+
+        Logger.debug("Saving the channel index to: %s", self.__CHANNEL_INDEX)
+        fileutils.atomic_write(self.__CHANNEL_INDEX, json.dumps(self.__channelIndex))
+        self.__channelIndexChanged = False
+
     def __is_channel_set_updated(self, channel_info):
         """ Checks whether a channel set was updated.
 
@@ -0,0 +1,81 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import binascii
+import io
+import os
+from contextlib import contextmanager
+
+from resources.lib.backtothefuture import PY2
+
+
+def get_temp_path(path):
+    """ Returns a unique temporary path next to a file. Each process (and thread) gets its own
+    name, so concurrent writers of the same file never write to the same temporary file.
+
+    :param str path:    The path of the file that will be written.
+
+    :return: The temporary path, in the same folder so it can be renamed to the path.
+    :rtype: str
+
+    """
+
+    return "{0}.{1}.tmp".format(path, binascii.hexlify(os.urandom(6)).decode("ascii"))
+
+
+def replace(source, target):
+    """ Replaces the target file with the source file in a single step.
+
+    :param str source:  The (temporary) file to move.
+    :param str target:  The file to replace.
+
+    """
+
+    if PY2:
+        # Python 2 has no os.replace and os.rename does not overwrite on Windows.
+        if os.path.isfile(target):
+            os.remove(target)
+        os.rename(source, target)
+    else:
+        # noinspection PyUnresolvedReferences
+        os.replace(source, target)
+
+
+@contextmanager
+def atomic_open(path, mode="wb", encoding=None):
+    """ Opens a temporary file for writing that replaces the file at `path` once it was
+    completely written. If writing fails, the temporary file is removed and the original file
+    is left as it was. So a crash can never leave a half written file.
+
+        with atomic_open(path, "w", encoding="utf-8") as fp:
+            fp.write(content)
+
+    :param str path:            The path of the file to write.
+    :param str mode:            The mode to open the file with.
+    :param str|None encoding:   The encoding for text modes.
+
+    """
+
+    temp_path = get_temp_path(path)
+    try:
+        with io.open(temp_path, mode, encoding=encoding) as fp:
+            yield fp
+        replace(temp_path, path)
+    except:
+        if os.path.isfile(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def atomic_write(path, data):
+    """ Writes data to a file atomically, see `atomic_open`.
+
+    :param str path:            The path of the file to write.
+    :param bytes|str data:      The content. Text is written as UTF-8.
+
+    """
+
+    if not isinstance(data, bytes):
+        data = data.encode("utf-8")
+
+    with atomic_open(path, "wb") as fp:
+        fp.write(data)
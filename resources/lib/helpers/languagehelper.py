@@ -135,6 +135,7 @@ class LanguageHelper(object):
     VaultReset = 30092
     VaultHowToTitle = 30089
     VaultHowToText = 30054
+    VaultSlowKeyDerivation = 30617
 
     LogPostSetting = 30598
     LogPostLogUrl = 30599
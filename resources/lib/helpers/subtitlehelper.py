@@ -3,14 +3,16 @@
 import time
 import io
 import os
+import re
 
-from resources.lib.regexer import Regexer
 from resources.lib.retroconfig import Config
 from resources.lib.logger import Logger
 from resources.lib.urihandler import UriHandler
 from resources.lib.helpers.jsonhelper import JsonHelper
 from resources.lib.helpers.htmlentityhelper import HtmlEntityHelper
 from resources.lib.helpers.encodinghelper import EncodingHelper
+from resources.lib.helpers import fileutils
+from resources.lib.streams.hlsparser import HlsParser
 
 
 class SubtitleHelper(object):
@@ -36,6 +38,25 @@ class SubtitleHelper(object):
         "</37>": "</font>",
     }
 
+    # The maximum number of HLS subtitle segments that are downloaded simultaneously.
+    __max_segment_downloads = 4
+
+    # The regexes are compiled once, with the same flags the Regexer uses.
+    __json_regex = re.compile(r'"startMillis":(\d+),"endMillis":(\d+),"text":"(.+?)(?=["] *,)',
+                              re.DOTALL + re.IGNORECASE)
+    __dc_regex = re.compile((r'<subtitle[^>]+spotnumber="(\d+)" timein="(\d+:\d+:\d+):(\d+)" '
+                             r'timeout="(\d+:\d+:\d+):(\d+)"[^>]+>|<text[^>]+>([^<]+)</text>').replace('"', '["\']'),
+                            re.DOTALL + re.IGNORECASE)
+    __ttml_regex = re.compile(r'<p[^>]+begin="([^"]+)\.(\d+)"[^>]+end="([^"]+)\.(\d+)"[^>]*>([\w\W]+?)</p>',
+                              re.DOTALL + re.IGNORECASE)
+    __sami_regex = re.compile(r'<sync start="(\d+)"><p[^>]+>([^<]+)</p></sync>\W+<sync start="(\d+)">',
+                              re.DOTALL + re.IGNORECASE)
+    __sami_regex2 = re.compile(r'<sync start=(\d+)>\W+<p[^>]+>([^\n]+)\W+<sync start=(\d+)>',
+                               re.DOTALL + re.IGNORECASE)
+    __timestamp_map_regex = re.compile(r'X-TIMESTAMP-MAP=(?=[^\n]*MPEGTS:(\d+))?(?=[^\n]*LOCAL:([\d:.]+))?',
+                                       re.IGNORECASE)
+    __guid_regex = re.compile(r"^[0-9a-f]{8}-?([0-9a-f]{4}-?){3}[0-9a-f]{12}", re.DOTALL + re.IGNORECASE)
+
     def __init__(self):
         """Create a class instance. This is not allowed, due to only static
         methods.
@@ -69,10 +90,10 @@ class SubtitleHelper(object):
             Logger.debug("No SRT extension present, appending it.")
             file_name = "%s.srt" % (file_name,)
 
-        srt = ""
+        cue = ""
+        local_complete_path = os.path.join(Config.cacheDir, file_name)
+        temp_path = fileutils.get_temp_path(local_complete_path)
         try:
-            local_complete_path = os.path.join(Config.cacheDir, file_name)
-
             # no need to download it again!
             if os.path.exists(local_complete_path):
                 Logger.debug("Found existing subtitle: %s", local_complete_path)
@@ -106,25 +127,33 @@ class SubtitleHelper(object):
                 Logger.info("Discovered subtitle format 'webvtt' instead of '%s'", format)
                 format = "webvtt"
 
-            # Actually transform the subtitle
-            srt = SubtitleHelper.__transform(raw, sub_format=format, url=url)
-
             if replace:
                 Logger.debug("Replacing SRT data: %s", replace)
-                for needle in replace:
-                    srt = srt.replace(needle, replace[needle])
 
-            if not srt or not srt.strip():
+            # Actually transform the subtitle and write the cues as they are converted. They
+            # are written to a temporary file, so only complete subtitles are cached.
+            has_content = False
+            with io.open(temp_path, 'w', encoding="utf-8") as f:
+                for cue in SubtitleHelper.__transform(raw, sub_format=format, url=url):
+                    if replace:
+                        for needle in replace:
+                            cue = cue.replace(needle, replace[needle])
+                    has_content = has_content or bool(cue.strip())
+                    f.write(cue)
+
+            if not has_content:
                 Logger.error("Transformed data was empty!")
+                os.remove(temp_path)
                 return ""
 
-            with io.open(local_complete_path, 'w', encoding="utf-8") as f:
-                f.write(srt)
+            fileutils.replace(temp_path, local_complete_path)
 
             Logger.info("Saved SRT as %s", local_complete_path)
             return local_complete_path
         except:
-            Logger.error("Error handling Subtitle file: [%s]", srt, exc_info=True)
+            Logger.error("Error handling Subtitle file: [%s]", cue, exc_info=True)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
             return ""
 
     @staticmethod
@@ -135,7 +164,7 @@ class SubtitleHelper(object):
         jsonSubtitle : string - Json Subtitle subtitle format
 
         Returns:
-        SRT formatted subtitle:
+        A generator with the SRT formatted subtitle cues:
 
         Example:
             {"startMillis":80,"endMillis":4170,"text":"Ett Kanal 5:\nAlla gonblick i \"100 jdare!!!\"?","posX":0.5,"posY":0.9,"colorR":220,"colorG":220,"colorB":220}
@@ -150,14 +179,9 @@ class SubtitleHelper(object):
 
         """
 
-        regex = r'"startMillis":(\d+),"endMillis":(\d+),"text":"(.+?)(?=["] *,)'
-        subs = Regexer.do_regex(regex, json_subtitle)
-
-        # Init some stuff
-        srt = ""
         i = 1
-
-        for sub in subs:
+        for match in SubtitleHelper.__json_regex.finditer(json_subtitle):
+            sub = match.groups("")
             try:
                 start = SubtitleHelper.__convert_to_time(sub[0])
                 end = SubtitleHelper.__convert_to_time(sub[1])
@@ -165,13 +189,11 @@ class SubtitleHelper(object):
                 text = sub[2].replace('\"', '"')
                 text = JsonHelper.convert_special_chars(text)
                 text = HtmlEntityHelper.convert_html_entities(text)
-                srt = "%s\n%s\n%s --> %s\n%s\n" % (srt, i, start, end, text.strip())
+                yield "\n%s\n%s --> %s\n%s\n" % (i, start, end, text.strip())
                 i += 1
             except:
                 Logger.error("Error parsing subtitle: %s", sub, exc_info=True)
 
-        return srt
-
     @staticmethod
     def __convert_dc_subtitle_to_srt(dc_subtitle):
         """Converts DC Subtitle format into SRT format:
@@ -180,7 +202,7 @@ class SubtitleHelper(object):
         dcSubtitle : string - DC Subtitle subtitle format
 
         Returns:
-        SRT formatted subtitle:
+        A generator with the SRT formatted subtitle cues:
 
         Example:
             <Subtitle SpotNumber="1" TimeIn="00:00:01:220" TimeOut="00:00:04:001" FadeUpTime="20" FadeDownTime="20">
@@ -209,35 +231,28 @@ class SubtitleHelper(object):
 
         """
 
-        parse_regex = r'<subtitle[^>]+spotnumber="(\d+)" timein="(\d+:\d+:\d+):(\d+)" ' \
-                      r'timeout="(\d+:\d+:\d+):(\d+)"[^>]+>|<text[^>]+>([^<]+)</text>'
-        parse_regex = parse_regex.replace('"', '["\']')
-        subs = Regexer.do_regex(parse_regex, dc_subtitle)
-
-        srt = ""
         i = 1
-        text = ""
+        text = []
         start = ""
         end = ""
 
-        for sub in subs:
-            #Logger.Trace(sub)
+        for match in SubtitleHelper.__dc_regex.finditer(dc_subtitle):
+            sub = match.groups("")
             try:
                 if sub[0]:
                     # new start of a sub
                     if text and start and end:
                         # if we have a complete old one, save it
-                        text = HtmlEntityHelper.convert_html_entities(text)
-                        srt = "%s\n%s\n%s --> %s\n%s\n" % (srt, i, start, end, text.strip())
+                        cue_text = HtmlEntityHelper.convert_html_entities("".join(text))
+                        yield "\n%s\n%s --> %s\n%s\n" % (i, start, end, cue_text.strip())
                         i += 1
                     start = "%s,%03d" % (sub[1], int(sub[2]))
                     end = "%s,%03d" % (sub[3], int(sub[4]))
-                    text = ""
+                    text = []
                 else:
-                    text = "%s\n%s" % (text, sub[5].replace("<br />", "\n"))
+                    text.append("\n%s" % (sub[5].replace("<br />", "\n"), ))
             except:
                 Logger.error("Error parsing subtitle: %s", sub, exc_info=True)
-        return srt
 
     @staticmethod
     def __convert_web_vtt_to_srt(webvvt):
@@ -247,7 +262,7 @@ class SubtitleHelper(object):
         ttml : string - TTML (Timed Text Markup Language) subtitle format
 
         Returns:
-        SRT formatted subtitle:
+        A generator with the SRT formatted subtitle cues:
 
         Example:
             1
@@ -257,7 +272,7 @@ class SubtitleHelper(object):
         """
 
         count = 0
-        result = ""
+        cue = []
         for line in webvvt.split("\n"):
             line = line.strip()
             if line.endswith("WEBVTT") or line.startswith("X-TIMESTAMP"):
@@ -266,24 +281,30 @@ class SubtitleHelper(object):
                 continue
 
             if " --> " in line:
+                # a new cue starts, so the previous one is complete
+                if cue:
+                    yield "".join(cue)
+                    cue = []
+
                 count += 1
                 start, end = line.split(" --> ")
-                result = "%s\n\n%s" % (result, count)
+                cue.append("\n\n%s" % (count, ))
                 if start.count(":") == 1:
-                    result = "%s\n00:%s --> 00:%s" % (result, start.replace(".", ","), end.replace(".", ","))
+                    cue.append("\n00:%s --> 00:%s" % (start.replace(".", ","), end.replace(".", ",")))
                 else:
-                    result = "%s\n%s --> %s" % (result, start.replace(".", ","), end.replace(".", ","))
+                    cue.append("\n%s --> %s" % (start.replace(".", ","), end.replace(".", ",")))
             elif line == str(count + 1):
                 # we apparently have built-in numbering using WebVTT cue-numbering
                 continue
-            elif Regexer.do_regex("^[0-9a-f]{8}-?([0-9a-f]{4}-?){3}[0-9a-f]{12}", line):
+            elif SubtitleHelper.__guid_regex.match(line):
                 continue
             elif line.isnumeric() and len(line) > 4:
                 continue
             else:
-                result = "%s\n%s" % (result, HtmlEntityHelper.convert_html_entities(line))
+                cue.append("\n%s" % (HtmlEntityHelper.convert_html_entities(line), ))
 
-        return result
+        if cue:
+            yield "".join(cue)
 
     @staticmethod
     def __convert_ttml_to_srt(ttml):
@@ -293,7 +314,7 @@ class SubtitleHelper(object):
         ttml : string - TTML (Timed Text Markup Language) subtitle format
 
         Returns:
-        SRT formatted subtitle:
+        A generator with the SRT formatted subtitle cues:
 
         Example:
             1
@@ -302,13 +323,9 @@ class SubtitleHelper(object):
 
         """
 
-        pars_regex = r'<p[^>]+begin="([^"]+)\.(\d+)"[^>]+end="([^"]+)\.(\d+)"[^>]*>([\w\W]+?)</p>'
-        subs = Regexer.do_regex(pars_regex, ttml)
-
-        srt = ""
         i = 1
-
-        for sub in subs:
+        for match in SubtitleHelper.__ttml_regex.finditer(ttml):
+            sub = match.groups("")
             try:
                 start = "%s,%03d" % (sub[0], int(sub[1]))
                 end = "%s,%03d" % (sub[2], int(sub[3]))
@@ -317,13 +334,11 @@ class SubtitleHelper(object):
                 text = text.replace("\r\n", "")
                 text = text.replace("\n\n", "")
                 text = text.replace("\t", "")
-                srt = "%s\n%s\n%s --> %s\n%s\n" % (srt, i, start, end, text.strip())
+                yield "\n%s\n%s --> %s\n%s\n" % (i, start, end, text.strip())
                 i += 1
             except:
                 Logger.error("Error parsing subtitle: %s", sub[1], exc_info=True)
 
-        return srt
-
     @staticmethod
     def __convert_sami_to_srt(sami):
         """Converts sami format into SRT format:
@@ -332,7 +347,7 @@ class SubtitleHelper(object):
         sami : string - SAMI subtitle format
 
         Returns:
-        SRT formatted subtitle:
+        A generator with the SRT formatted subtitle cues:
 
         Example:
             1
@@ -340,74 +355,196 @@ class SubtitleHelper(object):
             text
 
         """
-        pars_regex = r'<sync start="(\d+)"><p[^>]+>([^<]+)</p></sync>\W+<sync start="(\d+)">'
-        subs = Regexer.do_regex(pars_regex, sami)
+        i = 1
+        for pars_regex in (SubtitleHelper.__sami_regex, SubtitleHelper.__sami_regex2):
+            for match in pars_regex.finditer(sami):
+                sub = match.groups("")
+                try:
+                    start = SubtitleHelper.__convert_to_time(sub[0])
+                    end = SubtitleHelper.__convert_to_time(sub[2])
+                    text = sub[1]
+                    text = HtmlEntityHelper.convert_html_entities(text)
+                    yield "\n%s\n%s --> %s\n%s\n" % (i, start, end, text)
+                    i += 1
+                except:
+                    Logger.error("Error parsing subtitle: %s", sub[1], exc_info=True)
+
+            # only use the second format if the first one did not match
+            if i > 1:
+                break
+
+    @staticmethod
+    def __convert_m3u8_srt_to_subtitle_to_srt(raw, url):
+        """ Converts a HLS subtitle (media) playlist with WebVTT segments into SRT format. All
+        segments are downloaded in parallel and then merged in the order of the playlist.
 
-        if len(subs) == 0:
-            pars_regex2 = r'<sync start=(\d+)>\W+<p[^>]+>([^\n]+)\W+<sync start=(\d+)>'
-            subs = Regexer.do_regex(pars_regex2, sami)
+        :param str raw: The HLS subtitle playlist.
+        :param str url: The URL of the playlist.
+
+        :return: A generator with the SRT formatted subtitle cues.
+        :rtype: iterator[str]
+
+        """
+
+        segment_urls = SubtitleHelper.__get_segment_urls(raw, url)
+        if not segment_urls:
+            Logger.warning("No WebVTT segments found in subtitle playlist: %s", url)
+            return
+
+        Logger.debug("Downloading %d WebVTT subtitle segments", len(segment_urls))
+        segments = UriHandler.open_many(
+            segment_urls, max_workers=SubtitleHelper.__max_segment_downloads)
+
+        for segment_url, segment in zip(segment_urls, segments):
+            if not segment:
+                Logger.warning("Empty or missing WebVTT subtitle segment: %s", segment_url)
+
+        for cue in SubtitleHelper.__merge_web_vtt_segments(segments):
+            yield cue
+
+    @staticmethod
+    def __get_segment_urls(raw, url):
+        """ Retrieves the absolute URLs of the WebVTT segments in a HLS subtitle playlist.
+
+        :param str raw: The HLS subtitle playlist.
+        :param str url: The URL of the playlist (used for relative segment URLs).
+
+        :return: The URLs of the segments, in the order of the playlist.
+        :rtype: list[str]
+
+        """
+
+        return [segment.uri for segment in HlsParser.parse(raw, url).segments]
+
+    @staticmethod
+    def __merge_web_vtt_segments(segments):
+        """ Merges WebVTT segments into a single SRT subtitle.
+
+        The cue times of each segment are corrected using its X-TIMESTAMP-MAP header, relative
+        to that of the first segment. Cues that span a segment boundary are present in both
+        segments, so cues that were already seen are skipped.
+
+        :param list[str|bytes] segments: The WebVTT segments in order (empty ones are skipped).
+
+        :return: A generator with the SRT formatted subtitle cues.
+        :rtype: iterator[str]
+
+        """
 
-        srt = ""
         i = 1
+        base_offset = None
+        seen = set()
+        for segment in segments:
+            if not segment:
+                continue
 
-        for sub in subs:
-            try:
-                start = SubtitleHelper.__convert_to_time(sub[0])
-                end = SubtitleHelper.__convert_to_time(sub[2])
-                text = sub[1]
-                text = HtmlEntityHelper.convert_html_entities(text)
-                srt = "%s\n%s\n%s --> %s\n%s\n" % (srt, i, start, end, text)
+            if isinstance(segment, bytes):
+                segment = SubtitleHelper.__decode(segment)
+
+            # The offset (in milliseconds) of the segment on the MPEG-TS timeline.
+            offset = 0
+            timestamp_map = SubtitleHelper.__timestamp_map_regex.search(segment)
+            if timestamp_map:
+                mpeg_ts, local = timestamp_map.groups()
+                segment_offset = int(mpeg_ts or 0) // 90 - \
+                    SubtitleHelper.__get_milliseconds(local or "0")
+                if base_offset is None:
+                    base_offset = segment_offset
+                offset = segment_offset - base_offset
+
+            for start, end, text in SubtitleHelper.__get_web_vtt_cues(segment):
+                cue = (start + offset, end + offset, text)
+                if cue in seen:
+                    continue
+                seen.add(cue)
+
+                yield "\n%s\n%s --> %s\n%s\n" % (
+                    i, SubtitleHelper.__get_srt_time(cue[0]), SubtitleHelper.__get_srt_time(cue[1]),
+                    text)
                 i += 1
-            except:
-                Logger.error("Error parsing subtitle: %s", sub[1], exc_info=True)
 
-        # re-encode to be able to write it
-        return srt
+    @staticmethod
+    def __get_web_vtt_cues(webvtt):
+        """ Retrieves the cues from a WebVTT subtitle. Cue identifiers, cue settings and the
+        header, NOTE and STYLE blocks are ignored.
+
+        :param str webvtt: The WebVTT subtitle.
+
+        :return: A generator with the start and end (in milliseconds) and the text of the cues.
+        :rtype: iterator[tuple[int,int,str]]
+
+        """
+
+        times = None
+        text = []
+        for line in webvtt.split("\n"):
+            line = line.strip()
+            if not line:
+                # a blank line ends the block
+                if times and text:
+                    yield times[0], times[1], "\n".join(text)
+                times = None
+                text = []
+            elif times:
+                text.append(HtmlEntityHelper.convert_html_entities(line))
+            elif " --> " in line:
+                start, end = line.split(" --> ", 1)
+                # the end time could be followed by the cue settings
+                times = (SubtitleHelper.__get_milliseconds(start),
+                         SubtitleHelper.__get_milliseconds(end.split()[0]))
+
+        if times and text:
+            yield times[0], times[1], "\n".join(text)
 
     @staticmethod
-    def __convert_m3u8_srt_to_subtitle_to_srt(raw, url):
-        # Find the VTT line in the subtitle
-        lines = raw.split("\n")
-        sub_url = None
-        for line in lines:
-            if ".vtt" in line:
-                sub_url = line
-                break
+    def __get_milliseconds(timestamp):
+        """ Converts a WebVTT timestamp (00:04:53.920 or 04:53.920) into milliseconds.
 
-        if not sub_url:
-            return ""
+        :param str timestamp: The WebVTT timestamp.
 
-        if not sub_url.startswith("http"):
-            sub_url = "%s/%s" % (url.rsplit("/", 1)[0], sub_url)
+        :return: The number of milliseconds.
+        :rtype: int
 
-        # Now we know the subtitle, it would be wise to just use the existing converters to just
-        # convert the data, but now now
-        result = ""
-        m3u8_sub = UriHandler.open(sub_url)
+        """
 
-        if isinstance(m3u8_sub, bytes):
-            # Decode the data as it should be str
-            try:
-                m3u8_sub = m3u8_sub.decode()
-            except:
-                Logger.warning("Converting input to UTF-8 using 'unicode_escape'")
-                m3u8_sub = m3u8_sub.decode('unicode_escape')
+        seconds = 0.0
+        for part in timestamp.replace(",", ".").split(":"):
+            seconds = seconds * 60 + float(part)
+        return int(round(seconds * 1000))
 
-        for line in m3u8_sub.split("\n"):
-            line = line.strip()
-            if line.endswith("WEBVTT") or line.startswith("X-TIMESTAMP"):
-                continue
+    @staticmethod
+    def __get_srt_time(milliseconds):
+        """ Converts milliseconds into a SRT timestamp (00:04:53,920).
 
-            if " --> " in line:
-                start, end = line.split(" --> ")
-                if start.count(":") == 1:
-                    result = "%s\n00:%s --> 00:%s" % (result, start.replace(".", ","), end.replace(".", ","))
-                else:
-                    result = "%s\n%s --> %s" % (result, start.replace(".", ","), end.replace(".", ","))
-            else:
-                result = "%s\n%s" % (result, line)
+        :param int milliseconds: The number of milliseconds.
+
+        :return: The SRT timestamp.
+        :rtype: str
+
+        """
 
-        return result
+        milliseconds = max(0, milliseconds)
+        seconds, milliseconds = divmod(milliseconds, 1000)
+        minutes, seconds = divmod(seconds, 60)
+        hours, minutes = divmod(minutes, 60)
+        return "%02d:%02d:%02d,%03d" % (hours, minutes, seconds, milliseconds)
+
+    @staticmethod
+    def __decode(data):
+        """ Decodes binary subtitle data.
+
+        :param bytes data: The binary subtitle data.
+
+        :return: The decoded subtitle data.
+        :rtype: str
+
+        """
+
+        try:
+            return data.decode()
+        except:
+            Logger.warning("Converting input to UTF-8 using 'unicode_escape'")
+            return data.decode('unicode_escape')
 
     @staticmethod
     def __convert_to_time(timestamp):
@@ -433,6 +570,8 @@ class SubtitleHelper(object):
         @param str raw:         The raw subtitle data
         @param str sub_format:  Defines the source format. Defaults to Sami.
 
+        @return: A generator with the SRT data per cue.
+
         """
 
         Logger.debug("Converting subtitle from '%s' to 'srt' (%s)", sub_format, url)
@@ -440,7 +579,7 @@ class SubtitleHelper(object):
         if sub_format.lower() == 'sami':
             srt = SubtitleHelper.__convert_sami_to_srt(raw)
         elif sub_format.lower() == 'srt':
-            srt = raw
+            srt = iter([raw])
         elif sub_format.lower() == 'webvtt':
             srt = SubtitleHelper.__convert_web_vtt_to_srt(
                 raw)  # With Krypton and Leia VTT is supported natively
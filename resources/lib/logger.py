@@ -3,9 +3,9 @@
 import os
 import io
 import sys
+import threading
 import traceback
 import time
-import datetime
 
 from resources.lib.backtothefuture import PY2
 
@@ -23,6 +23,9 @@ class Logger:
     # the actual logger
     __logger = None
 
+    # the source file names by code object, or None for frames that should be skipped
+    __caller_files = {}
+
     @staticmethod
     def instance():
         """ return the logger instance
@@ -45,9 +48,24 @@ class Logger:
 
         return Logger.__logger is not None
 
+    @staticmethod
+    def is_enabled_for(level):
+        """ Indicates whether messages with the given level are logged. Use this to prevent
+        building expensive log messages that are not logged anyway.
+
+        :param int level:   The log level to check.
+
+        :returns: whether or not messages of the log level are logged.
+        :rtype: bool
+
+        """
+
+        logger = Logger.__logger
+        return logger is not None and level >= logger.minLogLevel
+
     @staticmethod
     def create_logger(log_file_name, application_name, min_log_level=10,
-                      append=False, dual_logger=None):
+                      append=False, dual_logger=None, background=False):
         """ Initialises the Logger instance and opens it for writing
 
         :param str|None log_file_name:      Path of the log file to write to.
@@ -56,6 +74,8 @@ class Logger:
         :param bool append:                 If set to True, the current log file is not deleted.
                                             Default value is False.
         :param function|None dual_logger:   A function that is used for dual logging.
+        :param bool background:             Write the log records in batches from a background
+                                            thread.
 
         :return: The new Logger instance
         :rtype: Logger
@@ -64,7 +84,7 @@ class Logger:
 
         if Logger.__logger is None:
             Logger.__logger = Logger(log_file_name, application_name, min_log_level, append,
-                                     dual_logger)
+                                     dual_logger, background)
             # Logger.__logger.dualLog("CREATING LOGGER: {0}".format(Logger.__logger.id))
         else:
             Logger.warning("Cannot create a second logger instance!")
@@ -72,7 +92,7 @@ class Logger:
         return Logger.__logger
 
     def __init__(self, log_file_name, application_name, min_log_level=10,
-                 append=False, dual_logger=None):
+                 append=False, dual_logger=None, background=False):
         """ Initialises the Logger instance and opens it for writing.
 
         :param str|None log_file_name:      Path of the log file to write to.
@@ -81,6 +101,8 @@ class Logger:
         :param bool append:                 If set to True, the current log file is not deleted.
                                             Default value is False.
         :param function|None dual_logger:   A function that is used for dual logging.
+        :param bool background:             Write the log records in batches from a background
+                                            thread.
 
         """
 
@@ -98,6 +120,8 @@ class Logger:
 
         self.id = int(time.time())
         self.timeFormat = "%Y%m%d %H:%M:%S"
+        self.__timestamp_second = None
+        self.__timestamp = None
         self.logFormat = '%s - [%-8s] - %-20s - %-4d - %s\n'
 
         self.logLevelNames = {
@@ -109,11 +133,21 @@ class Logger:
             Logger.LVL_TRACE: 'TRACE'
         }
 
+        # the records that still need to be written by the background writer
+        self.writeInterval = 0.5
+        self.__background = background
+        self.__pending = []
+        self.__pending_condition = threading.Condition()
+        self.__writer = None
+        self.__writing = False
+        self.__stopping = False
+
         if not append:
             self.clean_up_log()
 
         # now open the file
         self.__open_log()
+        self.__start_writer()
 
         # print to the Kodi logfile to tell the user the actual logfile path
         if self.dualLog:
@@ -134,8 +168,12 @@ class Logger:
 
         """
 
+        logger = Logger.__logger
+        if Logger.LVL_TRACE < logger.minLogLevel:
+            return
+
         # noinspection PyArgumentList
-        Logger.__logger.__write(msg, level=Logger.LVL_TRACE, *args, **kwargs)
+        logger.__write(msg, level=Logger.LVL_TRACE, *args, **kwargs)
         return
 
     @staticmethod
@@ -151,8 +189,12 @@ class Logger:
 
         """
 
+        logger = Logger.__logger
+        if Logger.LVL_DEBUG < logger.minLogLevel:
+            return
+
         # noinspection PyArgumentList
-        Logger.__logger.__write(msg, level=Logger.LVL_DEBUG, *args, **kwargs)
+        logger.__write(msg, level=Logger.LVL_DEBUG, *args, **kwargs)
         return
 
     @staticmethod
@@ -168,8 +210,12 @@ class Logger:
 
         """
 
+        logger = Logger.__logger
+        if Logger.LVL_INFO < logger.minLogLevel:
+            return
+
         # noinspection PyArgumentList
-        Logger.__logger.__write(msg, level=Logger.LVL_INFO, *args, **kwargs)
+        logger.__write(msg, level=Logger.LVL_INFO, *args, **kwargs)
         return
 
     @staticmethod
@@ -185,8 +231,12 @@ class Logger:
 
         """
 
+        logger = Logger.__logger
+        if Logger.LVL_ERROR < logger.minLogLevel:
+            return
+
         # noinspection PyArgumentList
-        Logger.__logger.__write(msg, level=Logger.LVL_ERROR, *args, **kwargs)
+        logger.__write(msg, level=Logger.LVL_ERROR, *args, **kwargs)
         return
 
     @staticmethod
@@ -202,8 +252,12 @@ class Logger:
 
         """
 
+        logger = Logger.__logger
+        if Logger.LVL_WARNING < logger.minLogLevel:
+            return
+
         # noinspection PyArgumentList
-        Logger.__logger.__write(msg, level=Logger.LVL_WARNING, *args, **kwargs)
+        logger.__write(msg, level=Logger.LVL_WARNING, *args, **kwargs)
         return
 
     @staticmethod
@@ -219,8 +273,12 @@ class Logger:
 
         """
 
+        logger = Logger.__logger
+        if Logger.LVL_CRITICAL < logger.minLogLevel:
+            return
+
         # noinspection PyArgumentList
-        Logger.__logger.__write(msg, level=Logger.LVL_CRITICAL, *args, **kwargs)
+        logger.__write(msg, level=Logger.LVL_CRITICAL, *args, **kwargs)
         return
 
     def close_log(self, log_closing=True):
@@ -242,6 +300,7 @@ class Logger:
             # self.dualLog("CURRENT LOGGER after: {0}".format(Logger.instance() or "none"))
             # self.dualLog("CLOSING LOGGER: {0}".format(self.id))
 
+        self.__stop_writer()
         self.logHandle.flush()
         if self.logHandle is not sys.stdout:
             self.logHandle.close()
@@ -282,8 +341,21 @@ class Logger:
 
         if was_open:
             self.__open_log()
+            self.__start_writer()
         return
 
+    def flush(self):
+        """ Writes all pending log records to the log file. """
+
+        if self.__writer is None:
+            self.logHandle.flush()
+            return
+
+        with self.__pending_condition:
+            self.__pending_condition.notify_all()
+            while (self.__pending or self.__writing) and self.__writer.is_alive():
+                self.__pending_condition.wait(self.writeInterval)
+
     def __str__(self):
         return str(self.id)
 
@@ -322,7 +394,7 @@ class Logger:
             (source_file, source_line_number) = self.__find_caller()
 
             # get time information
-            timestamp = datetime.datetime.today().strftime(self.timeFormat)
+            timestamp = self.__get_timestamp()
 
             # check for exception info, if present, add to end of string:
             # noinspection PyArgumentList
@@ -331,42 +403,41 @@ class Logger:
             # now split lines and write everyline into the logfile:
             lines = msg.splitlines()
             line_count = len(lines)
+            level_name = self.logLevelNames.get(log_level)
+
+            # check if multiline
+            if line_count > 1:
+                formatted_lines = []
+                for i in range(0, line_count):
+                    # for line in lines:
+                    line = lines[i]
+                    if len(line) <= 0:
+                        continue
+
+                    # if last line:
+                    if i == line_count - 1:
+                        line = '+ %s' % (line, )
+                    elif i > 0:
+                        line = '| %s' % (line,)
+
+                    formatted_lines.append(self.logFormat % (
+                        timestamp, level_name, source_file, source_line_number, line))
+                formatted_message = "".join(formatted_lines)
+            else:
+                formatted_message = self.logFormat % (
+                    timestamp, level_name, source_file, source_line_number, msg)
+
+            if self.__writer is not None:
+                with self.__pending_condition:
+                    self.__pending.append(formatted_message)
+                    self.logEntryCount += 1
+                    if self.logEntryCount % self.flushInterval == 0:
+                        # let the background writer write and flush the batch
+                        self.logEntryCount = 0
+                        self.__pending_condition.notify_all()
+                return
 
-            try:
-                # check if multiline
-                if line_count > 1:
-                    for i in range(0, line_count):
-                        # for line in lines:
-                        line = lines[i]
-                        if len(line) <= 0:
-                            continue
-
-                        # if last line:
-                        if i == line_count - 1:
-                            line = '+ %s' % (line, )
-                        elif i > 0:
-                            line = '| %s' % (line,)
-
-                        formatted_message = self.logFormat % (
-                            timestamp,
-                            self.logLevelNames.get(log_level),
-                            source_file,
-                            source_line_number,
-                            line)
-                        self.logHandle.write(formatted_message)
-                else:
-                    formatted_message = self.logFormat % (
-                        timestamp,
-                        self.logLevelNames.get(log_level),
-                        source_file,
-                        source_line_number,
-                        msg)
-                    self.logHandle.write(formatted_message)
-            except UnicodeEncodeError:
-                if PY2:
-                    formatted_message = formatted_message.encode('raw_unicode_escape')
-                    self.logHandle.write(formatted_message)
-                raise
+            self.__write_to_handle(formatted_message)
 
             # Finally close the filehandle
             self.logEntryCount += 1
@@ -389,40 +460,145 @@ class Logger:
             self.dualLog(repr(formatted_message))
             self.dualLog("---------------------------")
 
+    def __write_to_handle(self, formatted_message):
+        """ Writes formatted log records to the log file.
+
+        :param str formatted_message:   The formatted log records.
+
+        """
+
+        try:
+            self.logHandle.write(formatted_message)
+        except UnicodeEncodeError:
+            if PY2:
+                formatted_message = formatted_message.encode('raw_unicode_escape')
+                self.logHandle.write(formatted_message)
+            raise
+
+    def __start_writer(self):
+        """ Starts the background thread that writes the log records, if it was requested. """
+
+        if not self.__background or self.__writer is not None:
+            return
+
+        self.__stopping = False
+        self.__writer = threading.Thread(target=self.__write_pending, name="RetrospectLogWriter")
+        self.__writer.daemon = True
+        self.__writer.start()
+
+    def __stop_writer(self):
+        """ Stops the background writer after it has written all pending log records. """
+
+        writer = self.__writer
+        if writer is None:
+            return
+
+        with self.__pending_condition:
+            self.__stopping = True
+            self.__pending_condition.notify_all()
+        writer.join()
+        self.__writer = None
+
+    def __write_pending(self):
+        """ Writes the pending log records in batches until the writer is stopped. """
+
+        while True:
+            with self.__pending_condition:
+                if not self.__pending and not self.__stopping:
+                    self.__pending_condition.wait(self.writeInterval)
+                pending = self.__pending
+                self.__pending = []
+                self.__writing = bool(pending)
+                stopping = self.__stopping
+
+            if pending:
+                try:
+                    self.__write_to_handle("".join(pending))
+                    self.logHandle.flush()
+                except:
+                    if self.logDual:
+                        self.dualLog("Retrospect Logger :: Error writing log records:")
+                        self.dualLog(traceback.format_exc())
+                    else:
+                        traceback.print_exc()
+
+            with self.__pending_condition:
+                # wake up any thread that is waiting for the records to be written
+                self.__writing = False
+                self.__pending_condition.notify_all()
+
+            if stopping and not pending:
+                return
+
+    def __get_timestamp(self):
+        """ Returns the formatted time stamp for a log record. As the format has a resolution of
+        seconds, it is only formatted once per second.
+
+        :return: The formatted time stamp.
+        :rtype: str
+
+        """
+
+        now = int(time.time())
+        if now != self.__timestamp_second:
+            self.__timestamp = time.strftime(self.timeFormat, time.localtime(now))
+            self.__timestamp_second = now
+        return self.__timestamp
+
     def __find_caller(self):
         """Find the stack frame of the caller.
 
         Find the stack frame of the caller so that we can note the source
-        file name, line number and function name.
+        file name, line number and function name. Whether a code object belongs to
+        a caller is cached, so the file names only need to be inspected once.
 
         :return: the source file and line number of the caller
         :rtype: tuple[str, int]
 
         """
-        return_value = ("Unknown", 0)
+
+        caller_files = Logger.__caller_files
 
         # get the current frame and descent down until the correct one is found
         # noinspection PyProtectedMember,PyUnresolvedReferences
         current_frame = sys._getframe(3)  # could be _getframe(#) and (3)
-        while hasattr(current_frame, "f_code"):
+        while current_frame is not None:
             co = current_frame.f_code
-            source_file = os.path.normcase(co.co_filename)
-            method_name = co.co_name
-            # if current_frame belongs to this logger.py, equals <string> or equals a private log
-            # method (_log or __Log) continue searching.
-            if source_file == "<string>" \
-                    or source_file in os.path.normcase(__file__) \
-                    or "stopwatch.py" in source_file \
-                    or method_name in ("_Log", "__Log", "_log", "__log"):
-                current_frame = current_frame.f_back
-                continue
-            else:
-                # get the source_path and source_file
-                (source_path, source_file) = os.path.split(source_file)
-                return_value = (source_file, current_frame.f_lineno)
-                break
+            try:
+                source_file = caller_files[co]
+            except KeyError:
+                source_file = self.__get_caller_file(co)
+                caller_files[co] = source_file
+
+            if source_file is not None:
+                return source_file, current_frame.f_lineno
+
+            current_frame = current_frame.f_back
+
+        return "Unknown", 0
+
+    def __get_caller_file(self, co):
+        """ Returns the file name to log for the code object of a caller.
+
+        :param co: The code object of the caller.
+
+        :return: The file name or None if the frame belongs to the logging itself.
+        :rtype: str|None
+
+        """
 
-        return return_value
+        source_file = os.path.normcase(co.co_filename)
+        method_name = co.co_name
+        # if current_frame belongs to this logger.py, equals <string> or equals a private log
+        # method (_log or __Log) continue searching.
+        if source_file == "<string>" \
+                or source_file in os.path.normcase(__file__) \
+                or "stopwatch.py" in source_file \
+                or method_name in ("_Log", "__Log", "_log", "__log"):
+            return None
+
+        # get the source_path and source_file
+        return os.path.split(source_file)[1]
 
     def __open_log(self):
         """ Opens the log file for appending.
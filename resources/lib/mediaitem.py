@@ -3,6 +3,7 @@
 
 from datetime import datetime
 from functools import reduce
+from operator import itemgetter
 from random import getrandbits
 
 import xbmcgui
@@ -19,6 +20,94 @@ from resources.lib.streams.adaptive import Adaptive
 from resources.lib.proxyinfo import ProxyInfo
 
 
+class _StateSchema(object):
+    def __init__(self, fields):
+        """ The schema of a compact pickle state: the values of the known attributes are stored
+        as a flat tuple in the order of `fields`. Other attributes are stored by their name.
+
+        :param tuple[tuple[str,any]] fields:    The known attributes and their defaults. Mutable
+                                                defaults are types that are called to create them.
+
+        """
+
+        self.names = tuple(name for name, _ in fields)
+        self.indices = dict((name, index) for index, name in enumerate(self.names))
+        self.defaults = dict((name, default) for name, default in fields if not callable(default))
+        self.factories = tuple((name, default) for name, default in fields if callable(default))
+        self.__get_fields = itemgetter(*self.names)
+
+    def get_state(self, values):
+        """ Creates a compact state from an object's __dict__.
+
+        :param dict[str,any] values:    The __dict__ of the object.
+
+        :return: The values of the known attributes in field order and a dict with the other
+                 attributes or None if there are none.
+        :rtype: tuple[tuple,dict[str,any]|None]
+
+        """
+
+        try:
+            fields = self.__get_fields(values)
+        except KeyError:
+            # Some known attributes were removed from the object: store their defaults.
+            defaults = self.__get_defaults()
+            fields = tuple(values.get(name, defaults[name]) for name in self.names)
+
+        if len(values) == len(fields):
+            return fields, None
+
+        indices = self.indices
+        others = dict((name, value) for name, value in values.items() if name not in indices)
+        return fields, others or None
+
+    def get_values(self, fields, others=None):
+        """ Creates an object's __dict__ from a compact state.
+
+        :param tuple|dict[int|str,any] fields:  The values in field order or, for older states,
+                                                the values by field index or name.
+        :param dict[str,any]|None others:       The other attributes.
+
+        :return: The __dict__ with the default values for the missing attributes.
+        :rtype: dict[str,any]
+
+        """
+
+        names = self.names
+        if isinstance(fields, tuple):
+            values = dict(zip(names, fields))
+            if len(fields) < len(names):
+                # States from before attributes were appended to the schema.
+                defaults = self.__get_defaults()
+                for name in names[len(fields):]:
+                    values[name] = defaults[name]
+        else:
+            # Older states only contain the non-default values by field index.
+            values = self.__get_defaults()
+            field_count = len(names)
+            for key, value in fields.items():
+                if not isinstance(key, int):
+                    values[key] = value
+                elif key < field_count:
+                    values[names[key]] = value
+
+        if others:
+            values.update(others)
+        return values
+
+    def __get_defaults(self):
+        """ Returns the default values, with new instances of the mutable defaults.
+
+        :rtype: dict[str,any]
+
+        """
+
+        values = self.defaults.copy()
+        for name, factory in self.factories:
+            values[name] = factory()
+        return values
+
+
 # Don't make this an MediaItem(object) as it breaks the pickles
 class MediaItem:
     """Main class that represent items that are retrieved in Retrospect. They are used
@@ -37,6 +126,44 @@ class MediaItem:
     LabelTvShowTitle = "TVShowTitle"
     ExpiresAt = LanguageHelper.get_localized_string(LanguageHelper.ExpiresAt)
 
+    # The pickled attributes with their default values (mutable ones are created by calling
+    # them). The order of the schema is used in the pickled state, so new attributes should only
+    # be appended and the __state_version should be increased if existing ones change.
+    __state_version = 3
+    __state_schema = _StateSchema((
+        ("name", ""),
+        ("tv_show_title", None),
+        ("url", None),
+        ("actionUrl", None),
+        ("description", ""),
+        ("thumb", ""),
+        ("fanart", ""),
+        ("icon", ""),
+        ("poster", ""),
+        ("_MediaItem__date", ""),
+        ("_MediaItem__timestamp", datetime.min),
+        ("_MediaItem__expires_datetime", None),
+        ("dontGroup", False),
+        ("isLive", False),
+        ("isGeoLocked", False),
+        ("isDrmProtected", False),
+        ("isPaid", False),
+        ("season", 0),
+        ("episode", 0),
+        ("_MediaItem__infoLabels", dict),
+        ("complete", False),
+        ("items", list),
+        ("HttpHeaders", dict),
+        ("isCloaked", False),
+        ("metaData", dict),
+        ("media_type", mediatype.FOLDER),
+        ("content_type", contenttype.EPISODES),
+        ("streams", list),
+        ("subtitle", None),
+        ("_MediaItem__guid", None),
+        ("_MediaItem__guid_value", None),
+    ))
+
     #noinspection PyShadowingBuiltins
     def __init__(self, title, url, media_type=mediatype.FOLDER, depickle=False, tv_show_title=None):
         """ Creates a new MediaItem.
@@ -491,12 +618,15 @@ class MediaItem:
         item.setLabel2(self.__date)
 
         # set a flag to indicate it is a item that can be used with setResolveUrl.
+        log_trace = Logger.is_enabled_for(Logger.LVL_TRACE)
         if self.is_playable:
-            Logger.trace("Setting IsPlayable to True")
+            if log_trace:
+                Logger.trace("Setting IsPlayable to True")
             item.setProperty("IsPlayable", "true")
 
         # specific items
-        Logger.trace("Setting InfoLabels: %s", info_labels)
+        if log_trace:
+            Logger.trace("Setting InfoLabels: %s", info_labels)
         if self.media_type in mediatype.AUDIO_TYPES:
             item.setInfo(type="music", infoLabels=info_labels)
         else:
@@ -611,14 +741,22 @@ class MediaItem:
                 # no bitrate set, see if others are available
                 continue
 
+            stream_bitrate = stream.Bitrate
+            if stream.Bitrates:
+                # an adaptive stream with known representations will play the best one that fits
+                fitting_bitrates = [b for b in stream.Bitrates if b <= bitrate]
+                if not fitting_bitrates:
+                    continue
+                stream_bitrate = max(fitting_bitrates)
+
             # this is the bitrate-as-max-limit-method
-            if stream.Bitrate > bitrate:
+            if stream_bitrate > bitrate:
                 # if the bitrate is higher, continue for more
                 continue
             # if commented ^^ , we get the closest-match-method
 
             # determine the distance till the bitrate
-            distance = abs(bitrate - stream.Bitrate)
+            distance = abs(bitrate - stream_bitrate)
 
             if best_distance is None or best_distance > distance:
                 # this stream is better, so store it.
@@ -890,45 +1028,52 @@ class MediaItem:
 
         return name
 
+    def __getstate__(self):
+        """ Returns a compact state for pickling. Known attributes are stored as a tuple in the
+        order of the `__state_schema`, any other attributes by their name.
+
+        :return: The state version, the values and the other attributes (if any).
+        :rtype: tuple
+
+        """
+
+        fields, others = MediaItem.__state_schema.get_state(self.__dict__)
+        if others is None:
+            return MediaItem.__state_version, fields
+        return MediaItem.__state_version, fields, others
+
     def __setstate__(self, state):
-        """ Sets the current MediaItem's state based on the pickled value. However, it also adds
-        newly added class variables so old items won't brake. This happens with depickling.
+        """ Sets the current MediaItem's state based on the pickled value. Attributes that were
+        not pickled get their default value, without calling the __init__(), so older pickles
+        with fewer attributes still work.
 
-        @param dict state: a default Pickle __dict__
+        :param tuple|dict[str,any] state:   The compact state from __getstate__() or the full
+                                            __dict__ of older pickles.
 
         """
 
+        if isinstance(state, tuple):
+            # Any modification/fixes for other state versions could be done here
+            self.__dict__ = MediaItem.__state_schema.get_values(*state[1:])
+            return
+
+        # Older pickles contain the complete __dict__
+        self.__dict__ = MediaItem.__state_schema.get_values({})
+
         # Convert older `MediaItem.type` to the new `mediatype` values.
         media_type = state.get("type")
         if media_type == "audio":
-            media_type = mediatype.MUSIC
+            self.media_type = mediatype.MUSIC
         elif media_type == "folder":
-            media_type = mediatype.FOLDER
+            self.media_type = mediatype.FOLDER
         elif media_type == "page":
-            media_type = mediatype.PAGE
+            self.media_type = mediatype.PAGE
         elif media_type == "video":
-            media_type = mediatype.VIDEO
+            self.media_type = mediatype.VIDEO
 
-        m = MediaItem(state["name"], state["url"], media_type=media_type, depickle=False)
-        self.__dict__ = m.__dict__
         self.__dict__.update(state)
-
-        # Any modification/fixes for older version could be done here
         return
 
-    # Because this happens at pickle-time, it could still lead to issues if the __init__() would
-    # change. The result for __reduce__() will be the same as with the __setstate_() solution.
-    # def __reduce__(self):
-    #     """ Define a __reduce__() method used to store the data to call __init__() when
-    #     depickling items. This happens when pickling.
-    #
-    #     :return: a tuple with type, parameters and state
-    #     :rtype: type, tuple, dict
-    #
-    #     """
-    #
-    #     return type(self), (self.name, self.url), self.__dict__
-
 
 class FolderItem(MediaItem):
     def __init__(self, title, url, content_type, media_type=mediatype.FOLDER, depickle=False):
@@ -961,6 +1106,17 @@ class FolderItem(MediaItem):
 class MediaStream:
     """Class that represents a Mediastream with <url> and a specific <bitrate>"""
 
+    # The pickled attributes with their default values, see MediaItem.__state_schema.
+    __state_version = 3
+    __state_schema = _StateSchema((
+        ("Url", None),
+        ("Bitrate", 0),
+        ("Properties", list),
+        ("Adaptive", False),
+        ("HttpHeaders", dict),
+        ("Bitrates", list),
+    ))
+
     def __init__(self, url, bitrate=0, *args):
         """Initialises a new MediaStream
 
@@ -976,6 +1132,7 @@ class MediaStream:
         self.Properties = []
         self.Adaptive = False
         self.HttpHeaders = dict()  # :  HTTP Headers for stream playback
+        self.Bitrates = []         # :  Bitrates (kbps) of the video representations of an adaptive stream
 
         for prop in args:
             self.add_property(prop[0], prop[1])
@@ -1030,3 +1187,31 @@ class MediaStream:
             text = "%s\n    + Property: %s=%s" % (text, prop[0], prop[1])
 
         return text
+
+    def __getstate__(self):
+        """ Returns a compact state for pickling with the values in the schema order.
+
+        :return: The state version, the values and the other attributes (if any).
+        :rtype: tuple
+
+        """
+
+        fields, others = MediaStream.__state_schema.get_state(self.__dict__)
+        if others is None:
+            return MediaStream.__state_version, fields
+        return MediaStream.__state_version, fields, others
+
+    def __setstate__(self, state):
+        """ Sets the current MediaStream's state based on the pickled value.
+
+        :param tuple|dict[str,any] state:   The compact state from __getstate__() or the full
+                                            __dict__ of older pickles.
+
+        """
+
+        if isinstance(state, tuple):
+            self.__dict__ = MediaStream.__state_schema.get_values(*state[1:])
+            return
+
+        self.__dict__ = MediaStream.__state_schema.get_values({})
+        self.__dict__.update(state)
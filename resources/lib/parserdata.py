@@ -6,7 +6,7 @@ import re
 class ParserData(object):
     __slots__ = ["Name", "Match", "PreProcessor", "PostProcessor",
                  "Parser", "Creator", "Updater",
-                 "IsJson", "MatchType", "LogOnRequired"]
+                 "IsJson", "MatchType", "LogOnRequired", "__regex"]
 
     # define them here so we can just refer to them instead of using the strings all
     # over the place. The values are self explaining.
@@ -29,6 +29,7 @@ class ParserData(object):
         self.IsJson = False
         self.LogOnRequired = False
         self.MatchType = ParserData.MatchStart
+        self.__regex = None
 
     def is_video_updater_only(self):
         """ Return whether only this instance is used for updating only
@@ -88,7 +89,9 @@ class ParserData(object):
         if self.MatchType == ParserData.MatchExact:
             return url == self.Match
         if self.MatchType == ParserData.MatchRegex:
-            return re.match(self.Match, url, re.DOTALL + re.IGNORECASE) is not None
+            if self.__regex is None:
+                self.__regex = re.compile(self.Match, re.DOTALL + re.IGNORECASE)
+            return self.__regex.match(url) is not None
         else:
             return self.Match in url
 
@@ -133,3 +136,89 @@ class ParserData(object):
                 self.Match,
                 self.PreProcessor,
                 self.Parser, self.Creator, self.Updater)
+
+
+class ParserDataIndex(object):
+    def __init__(self, data_parsers):
+        """ Creates a dispatch index for a dictionary of DataParsers by URL.
+
+        It returns the same DataParsers as checking all keys, ordered from long to short, and
+        returning the matching DataParsers of the first key that had any. But instead of
+        matching each DataParser, the exact matches are looked up in a dictionary and the start
+        and end matches in a trie. Only the contains and regex matches are checked one by one.
+
+        :param dict[str,list[ParserData]] data_parsers:     The DataParsers by URL.
+
+        """
+
+        self.__exact = {}
+        self.__starts = {}
+        self.__ends = {}
+        self.__others = []
+
+        # The rank of the key determines which key wins, the position the order within a key.
+        keys = sorted(data_parsers.keys(), key=len, reverse=True)
+        for rank, key in enumerate(keys):
+            for position, data_parser in enumerate(data_parsers[key]):
+                entry = (rank, position, data_parser)
+                match_type = data_parser.MatchType
+                if match_type == ParserData.MatchExact:
+                    self.__exact.setdefault(data_parser.Match, []).append(entry)
+                elif match_type == ParserData.MatchStart:
+                    self.__add_to_trie(self.__starts, data_parser.Match, entry)
+                elif match_type == ParserData.MatchEnd:
+                    self.__add_to_trie(self.__ends, data_parser.Match[::-1], entry)
+                else:
+                    self.__others.append(entry)
+
+    def get_data_parsers(self, url):
+        """ Returns the DataParsers of the longest key that has DataParsers matching the URL.
+
+        :param str url:     The URL to match.
+
+        :return: The matching DataParsers in the order they were added.
+        :rtype: list[ParserData]
+
+        """
+
+        entries = list(self.__exact.get(url, []))
+        self.__find_in_trie(self.__starts, url, entries)
+        self.__find_in_trie(self.__ends, url[::-1], entries)
+        entries.extend(entry for entry in self.__others if entry[2].matches(url))
+        if not entries:
+            return []
+
+        best_rank = min(entry[0] for entry in entries)
+        return [entry[2] for entry in sorted(entry for entry in entries if entry[0] == best_rank)]
+
+    def __add_to_trie(self, trie, text, entry):
+        """ Adds an entry to a trie with a dictionary per node. The entries of a node are stored
+        under the `None` key.
+
+        :param dict trie:       The trie.
+        :param str text:        The text to add.
+        :param tuple entry:     The entry for the text.
+
+        """
+
+        node = trie
+        for char in text:
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append(entry)
+
+    def __find_in_trie(self, trie, text, entries):
+        """ Finds the entries of all texts in the trie that `text` starts with.
+
+        :param dict trie:       The trie.
+        :param str text:        The text to look up.
+        :param list entries:    The list to add the found entries to.
+
+        """
+
+        node = trie
+        entries.extend(node.get(None, []))
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                return
+            entries.extend(node.get(None, []))
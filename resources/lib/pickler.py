@@ -11,9 +11,13 @@ import os
 import io
 import sys
 import base64
+import struct
+import threading
+import zlib
 from functools import reduce
 
 from resources.lib.regexer import Regexer
+from resources.lib.helpers import fileutils
 from resources.lib.logger import Logger
 from resources.lib.mediaitem import MediaItem
 
@@ -39,17 +43,34 @@ class Pickler:
 
     __store_separator = "--"
 
-    def __init__(self, pickle_store_path=None):
+    # A PickleStore file starts with a header (magic + size of the index), followed by the
+    # pickled index with the location of each item and then the separately pickled items.
+    __store_magic = b"RPS1"
+    __store_header = struct.Struct(">4sI")
+
+    def __init__(self, pickle_store_path=None, codec="zlib", level=1):
+        """ Creates a Pickler that (de)serializes MediaItems, either as a string or by storing them
+        in the PickleStore.
+
+        :param str|None pickle_store_path:  The path of the PickleStore.
+        :param str|None codec:              The compression used for the PickleStore: `zlib`,
+                                            `bz2`, `lzma` or None for no compression.
+        :param int level:                   The compression level.
+
+        """
+
         # store some vars for speed optimization
         self.__pickle_container = dict()  # : storage for pickled items to prevent duplicate pickling
         self.__depickle_container = dict()  # : storage for depickled items.
 
         self.__pickle_store_path = pickle_store_path
-        self.__compress = True
-        if self.__compress:
-            self.__ext = "store.z"
-        else:
-            self.__ext = "store"
+        self.__codec = codec
+        self.__level = level
+        self.__write_thread = None
+        self.__ext = "pack"
+        self.__resolved_ext = "resolved"
+        # The extensions of the stores of previous versions (a single pickled dictionary).
+        self.__legacy_exts = ("store.z", "store")
 
     def de_pickle_child_items(self, hex_string):
         """ De-serializes a serialized mediaitem.
@@ -145,11 +166,13 @@ class Pickler:
         import glob
         import time
 
-        pickles_path = os.path.join(
-            self.__pickle_store_path, "pickles", "*", "*", "*.{}".format(self.__ext))
+        pickles_paths = [
+            os.path.join(self.__pickle_store_path, "pickles", "*", "*", "*.{}".format(ext))
+            for ext in (self.__ext, self.__resolved_ext) + self.__legacy_exts
+        ]
 
         cache_time = age * 30 * 24 * 60 * 60
-        for filename in glob.glob(pickles_path):
+        for filename in (f for path in pickles_paths for f in glob.glob(path)):
             create_time = os.path.getctime(filename)
             pickle_store_id = os.path.split(filename)[1].split(".", 1)[0]
             if create_time + cache_time < time.time():
@@ -159,12 +182,14 @@ class Pickler:
                 os.remove(filename)
                 Logger.debug("PickleStore: Removed file '%s'", filename)
 
-    def store_media_items(self, store_guid, parent, children):
+    def store_media_items(self, store_guid, parent, children, background=False):
         """ Store the MediaItems in the given store path
 
         :param str store_guid:              The guid used for storage
         :param MediaItem parent:            The parent item
         :param list[MediaItem] children:    The child items
+        :param bool background:             Store them using a background thread. Use `flush()`
+                                            to wait for it to finish.
 
         :rtype: str
 
@@ -176,31 +201,81 @@ class Pickler:
         if store_guid is None:
             raise ValueError("No parent and not channel guid specified")
 
-        children = children or []
+        # Only a single write at the time.
+        self.flush()
+        if not background:
+            self.__write_store(store_guid, parent, children)
+            return
 
-        # The path is constructed like this for abcdef01-xxxx-xxxx-xxxx-xxxxxxxxxxxx:
-        # <storepath>/ab/cd/abcdef01-xxxx-xxxx-xxxx-xxxxxxxxxxxx
-        pickles_dir, pickles_path = self.__get_pickle_path(store_guid)
-        Logger.debug("PickleStore: Write to '%s'", pickles_path)
+        self.__write_thread = threading.Thread(
+            target=self.__write_store, name="PickleStore-{}".format(store_guid),
+            args=(store_guid, parent, children))
+        self.__write_thread.start()
+        return
+
+    def store_resolved_media_item(self, store_id, item, time_to_live):
+        """ Stores a MediaItem that was already resolved (so it has its streams) for a limited
+        amount of time, so it can be played without resolving it again.
 
+        :param str store_id:        The PickleStore id of the item (<store_guid>--<item_guid>).
+        :param MediaItem item:      The resolved item.
+        :param int time_to_live:    The number of seconds the item is valid.
+
+        """
+
+        if self.__pickle_store_path is None:
+            raise ValueError("Cannot find pickle store path")
+
+        pickles_dir, pickles_path = self.__get_resolved_path(store_id)
         if not os.path.isdir(pickles_dir):
             os.makedirs(pickles_dir)
 
-        content = {
-            "parent": parent,
-            "children": {item.guid: item for item in children}
-        }
+        import time
+        content = (time.time() + time_to_live, self.__codec, self.__dump_item(item, self.__codec))
+        with fileutils.atomic_open(pickles_path, "wb") as fp:
+            pickle.dump(content, fp, protocol=pickle.HIGHEST_PROTOCOL)
 
-        if self.__compress:
-            pickle_content = pickle.dumps(content, protocol=pickle.HIGHEST_PROTOCOL)
-            import zlib
-            with io.open(pickles_path, 'wb+') as fp:
-                fp.write(zlib.compress(pickle_content, zlib.Z_BEST_COMPRESSION))
-        else:
-            with io.open(pickles_path, "wb+") as fp:
-                pickle.dump(content, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        Logger.debug("PickleStore: Stored resolved item for %ss in '%s'", time_to_live, pickles_path)
 
-        return
+    def de_pickle_resolved_media_item(self, store_id):
+        """ Retrieves a MediaItem that was stored with `store_resolved_media_item`, if it has not
+        yet expired.
+
+        :param str store_id:    The PickleStore id of the item (<store_guid>--<item_guid>).
+
+        :return: The resolved item or None if there was none or it expired.
+        :rtype: MediaItem|None
+
+        """
+
+        if self.__pickle_store_path is None or not self.is_pickle_store_id(store_id or ""):
+            return None
+
+        pickles_dir, pickles_path = self.__get_resolved_path(store_id)
+        if not os.path.isfile(pickles_path):
+            return None
+
+        import time
+        try:
+            with io.open(pickles_path, "rb") as fp:
+                expires, codec, pickle_bytes = pickle.load(fp)
+            if expires < time.time():
+                Logger.debug("PickleStore: Resolved item in '%s' expired", pickles_path)
+                os.remove(pickles_path)
+                return None
+            return self.__load_item(pickle_bytes, codec)
+        except:
+            Logger.error("Error opening '%s'", pickles_path, exc_info=True)
+            return None
+
+    def flush(self):
+        """ Waits for a background write of the PickleStore to finish. """
+
+        if self.__write_thread is None:
+            return
+
+        self.__write_thread.join()
+        self.__write_thread = None
 
     def is_pickle_store_id(self, pickle):
         """ Checks if a Pickle string is an actual pickle or a reference to a PickleStore entry
@@ -212,7 +287,55 @@ class Pickler:
         """
         return self.__store_separator in pickle
 
+    def __write_store(self, store_guid, parent, children):
+        """ Writes the MediaItems to the PickleStore file. The file is replaced atomically, so it
+        is never read while it is only partially written.
+
+        :param str store_guid:              The guid used for storage
+        :param MediaItem parent:            The parent item
+        :param list[MediaItem] children:    The child items
+
+        """
+
+        children = children or []
+
+        # The path is constructed like this for abcdef01-xxxx-xxxx-xxxx-xxxxxxxxxxxx:
+        # <storepath>/ab/cd/abcdef01-xxxx-xxxx-xxxx-xxxxxxxxxxxx
+        pickles_dir, pickles_path = self.__get_pickle_path(store_guid)
+        Logger.debug("PickleStore: Write to '%s'", pickles_path)
+
+        if not os.path.isdir(pickles_dir):
+            os.makedirs(pickles_dir)
+
+        # Each item is pickled (and compressed) separately, so a single item can be read without
+        # reading the others.
+        codec = self.__codec
+        blobs = []
+        offset = 0
+        locations = []
+        try:
+            for guid, item in [(None, parent)] + [(item.guid, item) for item in children]:
+                blob = self.__dump_item(item, codec)
+                blobs.append(blob)
+                locations.append((guid, offset, len(blob)))
+                offset += len(blob)
+
+            index = pickle.dumps((codec, locations[0][1:], locations[1:]), protocol=pickle.HIGHEST_PROTOCOL)
+            with fileutils.atomic_open(pickles_path, "wb") as fp:
+                fp.write(Pickler.__store_header.pack(Pickler.__store_magic, len(index)))
+                fp.write(index)
+                fp.writelines(blobs)
+        except:
+            Logger.error("PickleStore: Error writing '%s'", pickles_path, exc_info=True)
+            return
+
+        self.__depickle_container.pop(store_guid, None)
+        Logger.debug("PickleStore: Written %s items (%s bytes) to '%s'",
+                     len(children), offset, pickles_path)
+        return
+
     def __retrieve_media_items_from_store(self, store_guid):
+        self.flush()
         content = self.__depickle_container.get(store_guid)
         if content:
             items = content.get("children")
@@ -222,14 +345,10 @@ class Pickler:
         Logger.debug("PickleStore: Reading items from '%s'", pickles_path)
 
         try:
-            if self.__compress:
-                import zlib
-                with io.open(pickles_path, 'rb') as fp:
-                    pickle_bytes = zlib.decompress(fp.read())
-                    content = pickle.loads(pickle_bytes)
+            if os.path.isfile(pickles_path):
+                content = self.__read_store(pickles_path)
             else:
-                with io.open(pickles_path, "rb") as fp:
-                    content = pickle.load(fp)
+                content = self.__read_legacy_store(store_guid)
         except:
             Logger.error("Error opening '%s'", pickles_path, exc_info=True)
             return None
@@ -240,21 +359,146 @@ class Pickler:
 
     def __retrieve_media_item_from_store(self, storage_location):
         store_guid, item_guid = storage_location.split(Pickler.__store_separator)
-        items = self.__retrieve_media_items_from_store(store_guid)
+        self.flush()
+        content = self.__depickle_container.get(store_guid)
+        if content:
+            return content.get("children").get(item_guid)
+
+        pickles_dir, pickles_path = self.__get_pickle_path(store_guid)
+        if not os.path.isfile(pickles_path):
+            items = self.__retrieve_media_items_from_store(store_guid)
+            return items.get(item_guid) if items else None
+
+        Logger.debug("PickleStore: Reading item '%s' from '%s'", item_guid, pickles_path)
+        try:
+            return self.__read_store(pickles_path, item_guid)
+        except:
+            Logger.error("Error opening '%s'", pickles_path, exc_info=True)
+            return None
+
+    def __read_store(self, pickles_path, item_guid=None):
+        """ Reads the items from a PickleStore file.
+
+        :param str pickles_path:        The path of the PickleStore file.
+        :param str|None item_guid:      If specified, only the item with this guid is read.
+
+        :return: The item with the given `item_guid` (None if it is not present) or, if no
+                 `item_guid` was specified, the content of the store as a dictionary with the
+                 `parent` and a dictionary with the `children` by guid.
+        :rtype: MediaItem|dict|None
+
+        """
 
-        item_pickle = items.get(item_guid)
-        return item_pickle
+        header = Pickler.__store_header
+        with io.open(pickles_path, "rb") as fp:
+            magic, index_size = header.unpack(fp.read(header.size))
+            if magic != Pickler.__store_magic:
+                raise ValueError("Invalid PickleStore file: {}".format(pickles_path))
 
-    def __get_pickle_path(self, store_guid):
+            codec, parent_location, child_locations = pickle.loads(fp.read(index_size))
+            data_offset = header.size + index_size
+
+            if item_guid is not None:
+                location = next((loc for loc in child_locations if loc[0] == item_guid), None)
+                if location is None:
+                    return None
+
+                fp.seek(data_offset + location[1])
+                return self.__load_item(fp.read(location[2]), codec)
+
+            data = fp.read()
+
+        offset, size = parent_location
+        return {
+            "parent": self.__load_item(data[offset:offset + size], codec),
+            "children": {
+                guid: self.__load_item(data[offset:offset + size], codec)
+                for guid, offset, size in child_locations
+            }
+        }
+
+    def __read_legacy_store(self, store_guid):
+        """ Reads a PickleStore file of a previous version, which contains a single pickled
+        dictionary with all items.
+
+        :param str store_guid:  The guid used for storage.
+
+        :return: A dictionary with the `parent` and a dictionary with the `children` by guid.
+        :rtype: dict
+
+        """
+
+        pickles_dir, pickles_path = self.__get_pickle_path(store_guid, self.__legacy_exts[0])
+        if os.path.isfile(pickles_path):
+            with io.open(pickles_path, 'rb') as fp:
+                return pickle.loads(zlib.decompress(fp.read()))
+
+        pickles_dir, pickles_path = self.__get_pickle_path(store_guid, self.__legacy_exts[1])
+        with io.open(pickles_path, "rb") as fp:
+            return pickle.load(fp)
+
+    def __dump_item(self, item, codec):
+        """ Pickles a single item.
+
+        :param MediaItem|None item:     The item to pickle.
+        :param str|None codec:          The compression to use.
+
+        :rtype: bytes
+
+        """
+
+        pickle_bytes = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+        if codec is None:
+            return pickle_bytes
+        elif codec == "zlib":
+            return zlib.compress(pickle_bytes, self.__level)
+        elif codec == "bz2":
+            import bz2
+            return bz2.compress(pickle_bytes, self.__level)
+        elif codec == "lzma":
+            # noinspection PyUnresolvedReferences,PyCompatibility
+            import lzma
+            return lzma.compress(pickle_bytes, preset=self.__level)
+        raise ValueError("Unknown PickleStore codec: {}".format(codec))
+
+    def __load_item(self, pickle_bytes, codec):
+        """ De-pickles a single item.
+
+        :param bytes pickle_bytes:  The pickled (and possibly compressed) item.
+        :param str|None codec:      The compression that was used.
+
+        :rtype: MediaItem|None
+
+        """
+
+        if codec == "zlib":
+            pickle_bytes = zlib.decompress(pickle_bytes)
+        elif codec == "bz2":
+            import bz2
+            pickle_bytes = bz2.decompress(pickle_bytes)
+        elif codec == "lzma":
+            # noinspection PyUnresolvedReferences,PyCompatibility
+            import lzma
+            pickle_bytes = lzma.decompress(pickle_bytes)
+        elif codec is not None:
+            raise ValueError("Unknown PickleStore codec: {}".format(codec))
+        return pickle.loads(pickle_bytes)
+
+    def __get_pickle_path(self, store_guid, ext=None):
         # file storage is always lower case
         store_guid = store_guid.lower()
-        pickles_file = "{}.{}".format(store_guid, self.__ext)
+        pickles_file = "{}.{}".format(store_guid, ext or self.__ext)
 
         pickles_dir = os.path.join(
             self.__pickle_store_path, "pickles", store_guid[0:2], store_guid[2:4])
         pickles_path = os.path.join(pickles_dir, pickles_file)
         return pickles_dir, pickles_path
 
+    def __get_resolved_path(self, store_id):
+        # The resolved items are stored next to their store: <store_guid>.<item_guid>.resolved
+        store_guid, item_guid = store_id.split(Pickler.__store_separator)
+        return self.__get_pickle_path(store_guid, "{}.{}".format(item_guid.lower(), self.__resolved_ext))
+
     def __get_kodi_favourites(self, addon_id):
         """ Retrieves the PickleStore ID's corresponding to Kodi Favourites using the json RPC
 
@@ -63,6 +63,44 @@ class Player(xbmc.Player):
         Logger.warning("Player: time-out occurred waiting for playback (%s)", time_out)
         return
 
+    def waitForRemainingTime(self, remaining, url=None, poll_interval=10.0):
+        """ Blocks the call until the current item has at most `remaining` seconds left to play.
+
+        :param float remaining:         The number of seconds before the end of the item.
+        :param str url:                 The url that should be playing.
+        :param float poll_interval:     The maximum time between checks of the playing time.
+
+        :return: Whether that moment was reached. False if playback stopped or another item
+                 started playing before that.
+        :rtype: bool
+
+        """
+
+        Logger.debug("Player: Waiting until %ss of playback remain", remaining)
+        while not self.__monitor.abortRequested():
+            if self.__playPlayBackEndedEventsTriggered or not self.__is_url_playing(url):
+                Logger.debug("Player: Playback ended before %ss remained", remaining)
+                return False
+
+            try:
+                total_time = self.getTotalTime()
+                time_left = total_time - self.getTime()
+            except Exception:
+                # Kodi raises an exception if nothing is playing.
+                Logger.debug("Player: Playback ended before %ss remained", remaining)
+                return False
+
+            # The total time is not known until the stream is loaded.
+            if total_time > 0 and time_left <= remaining:
+                Logger.debug("Player: %ss of playback remain", time_left)
+                return True
+
+            wait_time = time_left - remaining if total_time > 0 else poll_interval
+            self.__monitor.waitForAbort(max(min(wait_time, poll_interval), self.__pollInterval))
+
+        Logger.debug("Player: Abort requested")
+        return False
+
     # The end of playback is 100% working, as a next track does not trigger any events.
     # def waitForPlayBackEnded(self):
     #     Logger.debug("Player: Waiting for playback to end")
@@ -9,6 +9,7 @@ from resources.lib.xbmcwrapper import XbmcWrapper
 from resources.lib.helpers.channelimporter import ChannelIndex
 from resources.lib.helpers.languagehelper import LanguageHelper
 from resources.lib.helpers.sessionhelper import SessionHelper
+from resources.lib.urihandler import UriHandler
 from resources.lib.actions.actionparser import ActionParser
 from resources.lib.actions import keyword
 from resources.lib.actions import action
@@ -57,8 +58,11 @@ class Plugin(ActionParser):
             # check for cache folder
             env_ctrl.cache_check()
 
-            # do some cache cleanup
-            env_ctrl.cache_clean_up(Config.cacheDir, Config.cacheValidTime)
+            # do some cache cleanup. The HTTP cache store cleans up its own files.
+            cache_store = UriHandler.instance().cacheStore
+            env_ctrl.cache_clean_up(Config.cacheDir, Config.cacheValidTime,
+                                    exclude=cache_store.FILE_MASK if cache_store else None)
+            UriHandler.clean_up_cache(Config.cacheValidTime)
 
             # empty picklestore
             self.pickler.purge_store(Config.addonId)
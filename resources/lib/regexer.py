@@ -57,7 +57,9 @@ class Regexer(object):
                     return Regexer.__do_regex(regex, data)
 
             # We got a list of Regexes
-            Logger.debug("Performing multi-regex find on '%s'", regex)
+            log_debug = Logger.is_enabled_for(Logger.LVL_DEBUG)
+            if log_debug:
+                Logger.debug("Performing multi-regex find on '%s'", regex)
             results = []
             count = 0
             for r in regex:
@@ -79,7 +81,8 @@ class Regexer(object):
                         results += [(count, x) for x in regex_results]
                 # increase count
                 count += 1
-            Logger.debug("Returning %s results", len(results))
+            if log_debug:
+                Logger.debug("Returning %s results", len(results))
             return list(results)
         except:
             Logger.critical('error regexing', exc_info=True)
@@ -126,11 +129,13 @@ class Regexer(object):
         @return: a compiled regex
         """
 
-        if regex in Regexer.__compiledRegexes:
-            Logger.debug("Re-using cached Compiled Regex object")
-            compiled_regex = Regexer.__compiledRegexes[regex]
+        compiled_regex = Regexer.__compiledRegexes.get(regex)
+        if compiled_regex is not None:
+            if Logger.is_enabled_for(Logger.LVL_DEBUG):
+                Logger.debug("Re-using cached Compiled Regex object")
         else:
-            Logger.trace("Compiling Regex object and storing in cache")
+            if Logger.is_enabled_for(Logger.LVL_TRACE):
+                Logger.trace("Compiling Regex object and storing in cache")
             compiled_regex = re.compile(regex, re.DOTALL + re.IGNORECASE)
             Regexer.__compiledRegexes[regex] = compiled_regex
 
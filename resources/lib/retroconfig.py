@@ -1,7 +1,8 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import io
+import json
 import os
-import xml.dom.minidom
 
 import xbmc
 import xbmcvfs
@@ -13,6 +14,49 @@ except AttributeError:
     translatePath = xbmc.translatePath
 
 from .version import Version
+from .helpers import fileutils
+
+
+def _get_add_on_info(add_on_xml_path, info_path):
+    """ Retrieves the ID, version and name of the add-on from the addon.xml.
+
+    Parsing the addon.xml is relatively slow, so the values are stored in a small JSON file that
+    is used as long as the modification time of the addon.xml did not change.
+
+    :param str add_on_xml_path: The path of the addon.xml.
+    :param str info_path:       The path of the JSON file with the precomputed values.
+
+    :return: The ID, version and name of the add-on.
+    :rtype: tuple[str,str,str]
+
+    """
+
+    modified = os.path.getmtime(add_on_xml_path)
+    try:
+        with io.open(info_path, mode="r", encoding="utf-8") as fp:
+            info = json.load(fp)
+        if info["path"] == add_on_xml_path and info["modified"] == modified:
+            return info["id"], info["version"], info["name"]
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        pass
+
+    import xml.dom.minidom
+    add_on_id = version = name = None
+    for add_on_entry in xml.dom.minidom.parse(add_on_xml_path).getElementsByTagName("addon"):
+        add_on_id = add_on_entry.getAttribute("id")
+        version = add_on_entry.getAttribute("version")
+        name = add_on_entry.getAttribute("name")
+
+    # The profile folder is only created once the add-on runs.
+    if os.path.isdir(os.path.dirname(info_path)):
+        info = {"path": add_on_xml_path, "modified": modified,
+                "id": add_on_id, "version": version, "name": name}
+        try:
+            fileutils.atomic_write(info_path, json.dumps(info))
+        except (IOError, OSError):
+            xbmc.log("Retrospect: cannot store add-on info in {0}".format(info_path), xbmc.LOGDEBUG)
+
+    return add_on_id, version, name
 
 
 class Config:
@@ -74,13 +118,11 @@ class Config:
 
     # must be single quotes for build script
     __addonXmlPath = os.path.join(rootDir, 'addon.xml')
-    __addonXmlcontents = xml.dom.minidom.parse(__addonXmlPath)
-    for addonentry in __addonXmlcontents.getElementsByTagName("addon"):
-        addonId = str(addonentry.getAttribute("id"))          # : The ID the addon has in Kodi (from addon.xml)
-        __version = addonentry.getAttribute("version")        # : The Version of the addon (from addon.xml) in text
-        version = Version(version=__version)                  # : The Version of the addon (from addon.xml)
-        #noinspection PyRedeclaration
-        appName = str(addonentry.getAttribute("name"))        # : The name from the addon (from addon.xml)
+    addonId, __version, appName = _get_add_on_info(__addonXmlPath, os.path.join(profileDir, 'addoninfo.json'))
+    addonId = str(addonId)                                    # : The ID the addon has in Kodi (from addon.xml)
+    version = Version(version=__version)                      # : The Version of the addon (from addon.xml)
+    #noinspection PyRedeclaration
+    appName = str(appName)                                    # : The name from the addon (from addon.xml)
 
     updateUrl = "https://api.github.com/repos/retrospect-addon/plugin.video.retrospect/releases"
 
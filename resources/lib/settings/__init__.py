@@ -1,3 +1,3 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-__all__ = ["localsettings", "kodisettings"]
+__all__ = ["localsettings", "kodisettings", "settingssnapshot"]
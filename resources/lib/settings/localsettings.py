@@ -7,15 +7,30 @@ import shutil
 
 from . import settingsstore
 from resources.lib.backtothefuture import PY2
+from resources.lib.helpers import fileutils
 
 
 class LocalSettings(settingsstore.SettingsStore):
     __settings = None
+    # Are there any changes that were not yet written to disk?
+    __changed = False
+    # The content of the settings file as it was last read or written.
+    __content = None
 
     __SETTINGS_KEY = "settings"
     __CHANNELS_KEY = "channels"
 
     def __init__(self, addon_data_folder, logger):
+        """ A settings store that keeps the settings in a JSON file in the add-on data folder.
+
+        Changes are not written immediately, but on `commit()` (and when the store is
+        removed). So multiple changes during a single invocation only cause a single write.
+
+        :param str addon_data_folder:   The folder in which the settings file is stored.
+        :param Logger logger:           A logger instance.
+
+        """
+
         super(LocalSettings, self).__init__(logger)
 
         if not addon_data_folder or not os.path.isdir(addon_data_folder):
@@ -46,8 +61,8 @@ class LocalSettings(settingsstore.SettingsStore):
                                channel.id, setting_id,
                                self._get_safe_print_value(setting_id, setting_value))
 
-        # store the file
-        self.__store_settings()
+        # the file is stored on commit
+        LocalSettings.__changed = True
         return setting_value
 
     def get_boolean_setting(self, setting_id, channel=None, default=None):
@@ -71,6 +86,32 @@ class LocalSettings(settingsstore.SettingsStore):
         # the default was already retrieved by the dict.get(key, default)
         return setting_value
 
+    def commit(self):
+        """ Writes the settings file if any of the settings were set since the last write and
+        the content actually changed.
+
+        :return: Indication whether the settings file was written.
+        :rtype: bool
+
+        """
+
+        if not LocalSettings.__changed:
+            return False
+
+        if LocalSettings.__settings is None or not list(LocalSettings.__settings.keys()):
+            raise ValueError("Empty settings object cannot save.")
+
+        # json.dumps will create a str, but we write bytes
+        content = json.dumps(LocalSettings.__settings, separators=(",", ":")).encode('utf-8')
+        if content == LocalSettings.__content:
+            self._logger.debug("Local settings did not change")
+            LocalSettings.__changed = False
+            return False
+
+        self.__store_settings(content)
+        LocalSettings.__changed = False
+        return True
+
     def open_settings(self):
         raise NotImplementedError()
 
@@ -79,6 +120,11 @@ class LocalSettings(settingsstore.SettingsStore):
 
     # this really only works if no reference to the <store> object is kept somewhere.
     def __del__(self):
+        try:
+            self.commit()
+        except:
+            self._logger.error("Error storing local settings", exc_info=True)
+
         if LocalSettings.__settings is not None:
             del LocalSettings.__settings
             LocalSettings.__settings = None
@@ -88,6 +134,8 @@ class LocalSettings(settingsstore.SettingsStore):
         return "LocalSettings store: {0}".format(self.local_settings_file)
 
     def __load_settings(self):
+        LocalSettings.__changed = False
+        LocalSettings.__content = None
         if not os.path.isfile(self.local_settings_file):
             LocalSettings.__settings = self.__empty_settings()
             self._logger.warning("No local settings file found: %s", self.local_settings_file)
@@ -103,6 +151,7 @@ class LocalSettings(settingsstore.SettingsStore):
 
                 # Print the content might expose secret settings. See self._secure_setting_ids
                 # self._logger.Trace("Loading settings: %s", content)
+                LocalSettings.__content = content
                 if PY2:
                     LocalSettings.__settings = json.loads(content, encoding='utf-8')
                 else:
@@ -116,20 +165,24 @@ class LocalSettings(settingsstore.SettingsStore):
                 self.local_settings_file,
                 backup
             )
-            self.__store_settings()
+            LocalSettings.__changed = True
+            self.commit()
             return
 
-    def __store_settings(self):
-        if LocalSettings.__settings is None or not list(LocalSettings.__settings.keys()):
-            raise ValueError("Empty settings object cannot save.")
+    def __store_settings(self, content):
+        """ Writes the settings atomically: they are written to a temporary file which then
+        replaces the actual settings file. So a crash can never leave a half written file.
+
+        :param bytes content:   The JSON content to write.
+
+        """
 
-        # open the file as binary file, as json.dumps will already encode as utf-8 bytes
-        with io.open(self.local_settings_file, mode='w+b') as fp:
-            content = json.dumps(LocalSettings.__settings, indent=4).encode('utf-8')
-            fp.write(content)
+        # Print the content might expose secret settings. See self._secure_setting_ids
+        # self._logger.Debug("Storing settings: %s", content)
+        fileutils.atomic_write(self.local_settings_file, content)
 
-            # Print the content might expose secret settings. See self._secure_setting_ids
-            # self._logger.Debug("Storing settings: %s", content)
+        LocalSettings.__content = content
+        self._logger.debug("Stored local settings: %s", self.local_settings_file)
 
     def __empty_settings(self):
         return {
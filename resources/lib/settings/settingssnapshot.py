@@ -0,0 +1,53 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from . import settingsstore
+
+
+class SettingsSnapshot(settingsstore.SettingsStore):
+    def __init__(self, logger, store, setting_ids):
+        """ Creates a read-only snapshot of the global settings of another store.
+
+        The values of all `setting_ids` are retrieved once, so looking them up does not need a
+        round trip into Kodi or a log line each time. Channel settings and settings that are not
+        part of the snapshot are retrieved from the underlying store.
+
+        :param Logger logger:                       A logger instance.
+        :param settingsstore.SettingsStore store:   The store to take the snapshot from.
+        :param list[str] setting_ids:               The IDs of the settings to include.
+
+        """
+
+        super(SettingsSnapshot, self).__init__(logger)
+
+        self.__store = store
+        self.__values = dict((setting_id, store.get_setting(setting_id)) for setting_id in setting_ids)
+        self._logger.debug("Created a settings snapshot with %d settings", len(self.__values))
+
+    def set_setting(self, setting_id, setting_value, channel=None):
+        raise ValueError("Cannot update setting '{0}' in a read-only settings snapshot".format(setting_id))
+
+    def get_boolean_setting(self, setting_id, channel=None, default=True):
+        bool_value = self.get_setting(setting_id, channel)
+        if bool_value is None:
+            return default
+
+        return bool_value == "true"
+
+    def get_integer_setting(self, setting_id, channel=None, default=None):
+        int_value = self.get_setting(setting_id, channel)
+        if int_value is None:
+            return default
+
+        return int(int_value)
+
+    def get_setting(self, setting_id, channel=None, default=None):
+        if channel or setting_id not in self.__values:
+            return self.__store.get_setting(setting_id, channel, default)
+
+        return self.__values[setting_id] or default
+
+    def get_localized_string(self, string_id):
+        return self.__store.get_localized_string(string_id)
+
+    def open_settings(self):
+        self.__store.open_settings()
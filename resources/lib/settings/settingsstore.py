@@ -88,6 +88,14 @@ class SettingsStore(object):
 
         pass
 
+    def commit(self):
+        """ Persists all pending changes. Stores that persist their changes immediately do not
+        need to do anything here.
+
+        """
+
+        pass
+
     def _get_safe_print_value(self, setting_id, setting_value):
         """ Makes sure we strip out the sensitive data while logging.
 
@@ -1,3 +1,3 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-__all__ = ["m3u8", "mms", "smil", "youtube", "f4m", "npostream", "vualto"]
+__all__ = ["m3u8", "mms", "smil", "youtube", "f4m", "npostream", "vualto", "hlsparser", "mpdparser"]
@@ -2,6 +2,7 @@
 
 from resources.lib.addonsettings import AddonSettings
 from resources.lib.helpers.htmlentityhelper import HtmlEntityHelper
+from resources.lib.logger import Logger
 
 
 class Adaptive(object):
@@ -138,5 +139,14 @@ class Adaptive(object):
         if "inputstream.adaptive.max_bandwidth" in stream.Properties:
             return
 
+        if stream.Bitrates:
+            # The representations of the manifest are known, so only limit when it matters.
+            if max_bit_rate >= max(stream.Bitrates):
+                Logger.debug("All representations are within the maximum bitrate of %s kbps", max_bit_rate)
+                return
+
+            # Make sure at least the lowest representation remains playable.
+            max_bit_rate = max(max_bit_rate, min(stream.Bitrates) + 1)
+
         stream.add_property("inputstream.adaptive.max_bandwidth", str(max_bit_rate * 1000))
         return
@@ -0,0 +1,370 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import re
+
+from resources.lib.backtothefuture import PY2
+if PY2:
+    # noinspection PyUnresolvedReferences
+    import urlparse as parse
+else:
+    # noinspection PyUnresolvedReferences
+    import urllib.parse as parse
+
+
+class HlsVariant(object):
+    def __init__(self, uri, attributes, is_iframe=False):
+        """ A variant stream of a HLS master playlist (EXT-X-STREAM-INF or
+        EXT-X-I-FRAME-STREAM-INF).
+
+        :param str uri:                         The absolute URI of the variant.
+        :param dict[str,str] attributes:        The attributes of the variant tag.
+        :param bool is_iframe:                  Is this an I-frame only stream?
+
+        """
+
+        self.uri = uri
+        self.attributes = attributes
+        self.is_iframe = is_iframe
+
+        self.bandwidth = int(attributes.get("BANDWIDTH", 0))
+        average = attributes.get("AVERAGE-BANDWIDTH")
+        self.average_bandwidth = int(average) if average else None
+        self.codecs = attributes.get("CODECS")
+        frame_rate = attributes.get("FRAME-RATE")
+        self.frame_rate = float(frame_rate) if frame_rate else None
+        self.audio = attributes.get("AUDIO")
+        self.video = attributes.get("VIDEO")
+        self.subtitles = attributes.get("SUBTITLES")
+        self.closed_captions = attributes.get("CLOSED-CAPTIONS")
+
+        self.width = None
+        self.height = None
+        resolution = attributes.get("RESOLUTION")
+        if resolution and "x" in resolution:
+            width, height = resolution.lower().split("x", 1)
+            self.width = int(width)
+            self.height = int(height)
+
+    @property
+    def bitrate(self):
+        """ The bitrate in kbps, as used by the MediaStreams.
+
+        :rtype: int
+
+        """
+
+        return self.bandwidth // 1000
+
+    def __str__(self):
+        return "HLS {0}Variant: {1} [bandwidth={2}, resolution={3}x{4}, codecs={5}]".format(
+            "I-Frame " if self.is_iframe else "", self.uri, self.bandwidth,
+            self.width, self.height, self.codecs)
+
+
+class HlsRendition(object):
+    def __init__(self, uri, attributes):
+        """ An alternative rendition (EXT-X-MEDIA) of a HLS master playlist.
+
+        :param str|None uri:                The absolute URI of the rendition (if present).
+        :param dict[str,str] attributes:    The attributes of the rendition tag.
+
+        """
+
+        self.uri = uri
+        self.attributes = attributes
+
+        self.type = attributes.get("TYPE")
+        self.group_id = attributes.get("GROUP-ID")
+        self.name = attributes.get("NAME")
+        self.language = attributes.get("LANGUAGE")
+        self.default = attributes.get("DEFAULT") == "YES"
+        self.autoselect = attributes.get("AUTOSELECT") == "YES"
+        self.forced = attributes.get("FORCED") == "YES"
+        self.channels = attributes.get("CHANNELS")
+        self.characteristics = attributes.get("CHARACTERISTICS")
+
+    def __str__(self):
+        return "HLS Rendition: {0} [type={1}, group={2}, language={3}]".format(
+            self.uri, self.type, self.group_id, self.language)
+
+
+class HlsKey(object):
+    def __init__(self, uri, attributes):
+        """ An encryption key (EXT-X-KEY or EXT-X-SESSION-KEY) of a HLS playlist.
+
+        :param str|None uri:                The absolute URI of the key (if present).
+        :param dict[str,str] attributes:    The attributes of the key tag.
+
+        """
+
+        self.uri = uri
+        self.attributes = attributes
+
+        self.method = attributes.get("METHOD")
+        self.iv = attributes.get("IV")
+        self.key_format = attributes.get("KEYFORMAT", "identity")
+        self.key_format_versions = attributes.get("KEYFORMATVERSIONS")
+
+    def __str__(self):
+        return "HLS Key: {0} [method={1}, format={2}]".format(self.uri, self.method, self.key_format)
+
+
+class HlsSegment(object):
+    def __init__(self, uri, duration, title, sequence, key):
+        """ A media segment of a HLS media playlist.
+
+        :param str uri:             The absolute URI of the segment.
+        :param float duration:      The duration in seconds.
+        :param str|None title:      The title of the segment.
+        :param int sequence:        The media sequence number of the segment.
+        :param HlsKey|None key:     The key that encrypts the segment.
+
+        """
+
+        self.uri = uri
+        self.duration = duration
+        self.title = title
+        self.sequence = sequence
+        self.key = key
+
+
+class HlsPlaylist(object):
+    def __init__(self, url):
+        """ The parsed content of a HLS master or media playlist.
+
+        :param str|None url:    The URL of the playlist.
+
+        """
+
+        self.url = url
+        self.version = None
+
+        # Master playlist content
+        self.variants = []          # type: list[HlsVariant]
+        self.iframe_variants = []   # type: list[HlsVariant]
+        self.renditions = []        # type: list[HlsRendition]
+        self.session_keys = []      # type: list[HlsKey]
+
+        # Media playlist content
+        self.segments = []          # type: list[HlsSegment]
+        self.keys = []              # type: list[HlsKey]
+        self.target_duration = None
+        self.media_sequence = 0
+        self.playlist_type = None
+        self.has_end_list = False
+
+    @property
+    def is_master(self):
+        """ Is this a master playlist (with variants) or a media playlist (with segments)?
+
+        :rtype: bool
+
+        """
+
+        return bool(self.variants or self.iframe_variants or self.renditions)
+
+    @property
+    def is_live(self):
+        """ Is this media playlist a live (or still growing event) playlist?
+
+        :rtype: bool
+
+        """
+
+        return not self.is_master and not self.has_end_list and self.playlist_type != "VOD"
+
+    def get_renditions(self, rendition_type, group_id=None, language=None):
+        """ Returns the renditions of the given type, optionally filtered.
+
+        :param str rendition_type:      The type: AUDIO, VIDEO, SUBTITLES or CLOSED-CAPTIONS.
+        :param str|None group_id:       Only return the renditions of this group.
+        :param str|None language:       Only return the renditions with this language.
+
+        :rtype: list[HlsRendition]
+
+        """
+
+        return [
+            r for r in self.renditions
+            if r.type == rendition_type
+            and (group_id is None or r.group_id == group_id)
+            and (language is None or r.language == language)
+        ]
+
+    def get_rendition(self, rendition_type, group_id):
+        """ Returns the rendition of a group that a player would pick: the default one, or the
+        first one if there is no default.
+
+        :param str rendition_type:  The type: AUDIO, VIDEO, SUBTITLES or CLOSED-CAPTIONS.
+        :param str group_id:        The group.
+
+        :rtype: HlsRendition|None
+
+        """
+
+        renditions = self.get_renditions(rendition_type, group_id=group_id)
+        if not renditions:
+            return None
+        return next((r for r in renditions if r.default), renditions[0])
+
+    def __str__(self):
+        if self.is_master:
+            return "HLS Master Playlist: {0} [{1} variants, {2} renditions]".format(
+                self.url, len(self.variants), len(self.renditions))
+        return "HLS Media Playlist: {0} [{1} segments, live={2}]".format(
+            self.url, len(self.segments), self.is_live)
+
+
+class HlsParser(object):
+    __attribute_regex = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^",]*)')
+
+    def __init__(self, url=None):
+        """ A single pass, line oriented parser for HLS (m3u8) master and media playlists.
+
+        Relative URIs are resolved against the URL of the playlist while parsing.
+
+        :param str|None url:    The URL of the playlist.
+
+        """
+
+        self.url = url
+
+        # Most URIs are relative to the folder of the playlist, so those are simply appended.
+        base_url = (url or "").split("?", 1)[0]
+        self.__base_url = base_url
+        self.__base_folder = base_url[:base_url.rindex("/") + 1] if "/" in base_url else ""
+
+    @staticmethod
+    def parse(data, url=None):
+        """ Parses a HLS playlist.
+
+        :param str data:        The content of the playlist.
+        :param str|None url:    The URL of the playlist.
+
+        :return: The parsed playlist.
+        :rtype: HlsPlaylist
+
+        """
+
+        return HlsParser(url).parse_playlist(data)
+
+    def parse_playlist(self, data):
+        """ Parses a HLS playlist.
+
+        :param str data:    The content of the playlist.
+
+        :return: The parsed playlist.
+        :rtype: HlsPlaylist
+
+        """
+
+        playlist = HlsPlaylist(self.url)
+
+        # The state of the tags that apply to the next URI line.
+        stream_info = None
+        segment_info = None
+        key = None
+        sequence = None
+
+        for line in data.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+
+            if not line.startswith("#"):
+                if stream_info is not None:
+                    playlist.variants.append(HlsVariant(self.resolve(line), stream_info))
+                    stream_info = None
+                elif segment_info is not None:
+                    if sequence is None:
+                        sequence = playlist.media_sequence
+                    playlist.segments.append(HlsSegment(
+                        self.resolve(line), segment_info[0], segment_info[1], sequence, key))
+                    sequence += 1
+                    segment_info = None
+                continue
+
+            if not line.startswith("#EXT"):
+                # A comment
+                continue
+
+            tag, _, value = line.partition(":")
+            if tag == "#EXTINF":
+                duration, _, title = value.partition(",")
+                segment_info = (float(duration or 0), title or None)
+            elif tag == "#EXT-X-STREAM-INF":
+                stream_info = self.__get_attributes(value)
+            elif tag == "#EXT-X-MEDIA":
+                attributes = self.__get_attributes(value)
+                playlist.renditions.append(HlsRendition(self.__resolve_attribute(attributes), attributes))
+            elif tag == "#EXT-X-I-FRAME-STREAM-INF":
+                attributes = self.__get_attributes(value)
+                playlist.iframe_variants.append(
+                    HlsVariant(self.__resolve_attribute(attributes), attributes, is_iframe=True))
+            elif tag == "#EXT-X-KEY":
+                attributes = self.__get_attributes(value)
+                key = HlsKey(self.__resolve_attribute(attributes), attributes)
+                if key.method == "NONE":
+                    key = None
+                else:
+                    playlist.keys.append(key)
+            elif tag == "#EXT-X-SESSION-KEY":
+                attributes = self.__get_attributes(value)
+                playlist.session_keys.append(HlsKey(self.__resolve_attribute(attributes), attributes))
+            elif tag == "#EXT-X-TARGETDURATION":
+                playlist.target_duration = int(value)
+            elif tag == "#EXT-X-MEDIA-SEQUENCE":
+                playlist.media_sequence = int(value)
+            elif tag == "#EXT-X-PLAYLIST-TYPE":
+                playlist.playlist_type = value
+            elif tag == "#EXT-X-ENDLIST":
+                playlist.has_end_list = True
+            elif tag == "#EXT-X-VERSION":
+                playlist.version = int(value)
+
+        return playlist
+
+    def resolve(self, uri):
+        """ Resolves a (relative) URI against the URL of the playlist.
+
+        :param str uri:     The URI to resolve.
+
+        :return: The absolute URI.
+        :rtype: str
+
+        """
+
+        if "://" in uri or not self.__base_url:
+            return uri
+
+        # Fast path for the common case: relative to the folder of the playlist.
+        if not uri.startswith("/") and not uri.startswith("."):
+            return self.__base_folder + uri
+
+        return parse.urljoin(self.__base_url, uri)
+
+    def __resolve_attribute(self, attributes):
+        """ Resolves the URI attribute of a tag (if present).
+
+        :param dict[str,str] attributes:    The attributes of the tag.
+
+        :return: The absolute URI or None.
+        :rtype: str|None
+
+        """
+
+        uri = attributes.get("URI")
+        return self.resolve(uri) if uri else None
+
+    def __get_attributes(self, value):
+        """ Parses an attribute list: KEY=VALUE,KEY="quoted, value".
+
+        :param str value:   The attribute list.
+
+        :return: The attributes with the quotes removed from quoted values.
+        :rtype: dict[str,str]
+
+        """
+
+        return dict((k, v[1:-1] if v.startswith('"') else v)
+                    for k, v in self.__attribute_regex.findall(value))
@@ -2,8 +2,8 @@
 
 from resources.lib.urihandler import UriHandler
 from resources.lib.logger import Logger
-from resources.lib.regexer import Regexer
 from resources.lib.streams.adaptive import Adaptive
+from resources.lib.streams.hlsparser import HlsParser
 from resources.lib.mediaitem import MediaStream, MediaItem
 from resources.lib.addonsettings import AddonSettings
 
@@ -28,47 +28,20 @@ class M3u8(object):
         """
 
         data = play_list_data or UriHandler.open(url)
-        regex = r'(#\w[^:]+)[^\n]+TYPE=SUBTITLES[^\n]*LANGUAGE="(\w+)"[^\n]*\W+URI="([^"]+.m3u8[^"\n\r]*)'
+        playlist = HlsParser.parse(data, url)
+        qs = M3u8.__get_query_string(url, append_query_string)
+
         sub = ""
+        for rendition in playlist.get_renditions("SUBTITLES"):
+            if not rendition.uri:
+                continue
 
-        qs = None
-        if append_query_string and "?" in url:
-            base, qs = url.split("?", 1)
-            Logger.info("Going to append QS: %s", qs)
-        elif "?" in url:
-            base, qs = url.split("?", 1)
-            Logger.info("Ignoring QS: %s", qs)
-            qs = None
-        else:
-            base = url
-
-        needles = Regexer.do_regex(regex, data)
-        url_index = 2
-        language_index = 1
-        base_url_logged = False
-        base_url = base[:base.rindex("/")]
-        for n in needles:
-            if language is not None and n[language_index] != language:
-                Logger.debug("Found incorrect language: %s", n[language_index])
+            if language is not None and rendition.language != language:
+                Logger.debug("Found incorrect language: %s", rendition.language)
                 continue
 
-            if "://" not in n[url_index]:
-                if not base_url_logged:
-                    Logger.debug("Using base_url %s for M3u8", base_url)
-                    base_url_logged = True
-                sub = "%s/%s" % (base_url, n[url_index])
-            else:
-                if not base_url_logged:
-                    Logger.debug("Full url found in M3u8")
-                    base_url_logged = True
-                sub = n[url_index]
-
-            if qs is not None and sub.endswith("?null="):
-                sub = sub.replace("?null=", "?%s" % (qs, ))
-            elif qs is not None and "?" in sub:
-                sub = "%s&%s" % (sub, qs)
-            elif qs is not None:
-                sub = "%s?%s" % (sub, qs)
+            # If there are multiple, the last one is used.
+            sub = M3u8.__append_query_string(rendition.uri, qs)
 
         return sub
 
@@ -218,8 +191,8 @@ class M3u8(object):
         :param bool map_audio:              Map audio streams
         :param str play_list_data:          Data of an already retrieved M3u8
 
-        :return: a list of streams with their bitrate and optionally the audio streams.
-        :rtype: list[tuple[str,str]|tuple[str,str,str]]
+        :return: a list of streams with their bitrate (in kbps) and optionally the audio streams.
+        :rtype: list[tuple[str,int]|tuple[str,int,str|None]]
 
         """
 
@@ -228,75 +201,67 @@ class M3u8(object):
         data = play_list_data or UriHandler.open(url, additional_headers=headers)
         Logger.trace(data)
 
-        qs = None
-        if append_query_string and "?" in url:
-            base, qs = url.split("?", 1)
-            Logger.info("Going to append QS: %s", qs)
-        elif "?" in url:
-            base, qs = url.split("?", 1)
-            Logger.info("Ignoring QS: %s", qs)
-            qs = None
-        else:
-            base = url
+        qs = M3u8.__get_query_string(url, append_query_string)
 
         Logger.debug("Processing M3U8 Streams: %s", url)
-
-        # If we need audio
-        if map_audio:
-            audio_needle = r'(#\w[^:]+):TYPE=AUDIO()[^\r\n]+ID="([^"]+)"[^\n\r]+URI="([^"]+.m3u8[^"]*)"'
-            needles = Regexer.do_regex(audio_needle, data)
-            needle = r'(#\w[^:]+)[^\n]+BANDWIDTH=(\d+)\d{3}(?:[^\r\n]*AUDIO="([^"]+)"){0,1}[^\n]*\W+([^\n]+.m3u8[^\n\r]*)'
-            needles += Regexer.do_regex(needle, data)
-            type_index = 0
-            bitrate_index = 1
-            id_index = 2
-            url_index = 3
-        else:
-            needle = r"(#\w[^:]+)[^\n]+BANDWIDTH=(\d+)\d{3}[^\n]*\W+([^\n]+.m3u8[^\n\r]*)"
-            needles = Regexer.do_regex(needle, data)
-            type_index = 0
-            bitrate_index = 1
-            url_index = 2
-
-        audio_streams = {}
-        base_url_logged = False
-        base_url = base[:base.rindex("/")]
-        for n in needles:
-            # see if we need to append a server path
-            Logger.trace(n)
-
-            if "#EXT-X-I-FRAME" in n[type_index]:
-                continue
-
-            if "://" not in n[url_index]:
-                if not base_url_logged:
-                    Logger.debug("Using baseUrl %s for M3u8", base_url)
-                    base_url_logged = True
-                stream = "%s/%s" % (base_url, n[url_index])
-            else:
-                if not base_url_logged:
-                    Logger.debug("Full url found in M3u8")
-                    base_url_logged = True
-                stream = n[url_index]
-            bitrate = n[bitrate_index]
-
-            if qs is not None and stream.endswith("?null="):
-                stream = stream.replace("?null=", "?%s" % (qs, ))
-            elif qs is not None and "?" in stream:
-                stream = "%s&%s" % (stream, qs)
-            elif qs is not None:
-                stream = "%s?%s" % (stream, qs)
-
-            if map_audio and "#EXT-X-MEDIA" in n[type_index]:
-                # noinspection PyUnboundLocalVariable
-                Logger.debug("Found audio stream: %s -> %s", n[id_index], stream)
-                audio_streams[n[id_index]] = stream
+        playlist = HlsParser.parse(data, url)
+        for variant in playlist.variants:
+            Logger.trace(variant)
+            stream = M3u8.__append_query_string(variant.uri, qs)
+            if not map_audio:
+                streams.append((stream, variant.bitrate))
                 continue
 
-            if map_audio:
-                streams.append((stream, bitrate, audio_streams.get(n[id_index]) or None))
-            else:
-                streams.append((stream, bitrate))
+            audio = None
+            rendition = playlist.get_rendition("AUDIO", variant.audio) if variant.audio else None
+            if rendition is not None and rendition.uri:
+                audio = M3u8.__append_query_string(rendition.uri, qs)
+                Logger.debug("Found audio stream: %s -> %s", rendition.group_id, audio)
+            streams.append((stream, variant.bitrate, audio))
 
         Logger.debug("Found %s substreams in M3U8", len(streams))
         return streams
+
+    @staticmethod
+    def __get_query_string(url, append_query_string):
+        """ Determines the query string of the playlist URL that should be appended to the URLs
+        in the playlist.
+
+        :param str url:                     The M3u8 url.
+        :param bool append_query_string:    Should the existing query string be appended?
+
+        :return: The query string or None if it should not be appended.
+        :rtype: str|None
+
+        """
+
+        if "?" not in url:
+            return None
+
+        qs = url.split("?", 1)[1]
+        if append_query_string:
+            Logger.info("Going to append QS: %s", qs)
+            return qs
+
+        Logger.info("Ignoring QS: %s", qs)
+        return None
+
+    @staticmethod
+    def __append_query_string(url, qs):
+        """ Appends a query string to the URL of a stream in the playlist.
+
+        :param str url:         The URL.
+        :param str|None qs:     The query string to append (if any).
+
+        :return: The URL with the query string appended.
+        :rtype: str
+
+        """
+
+        if qs is None:
+            return url
+        if url.endswith("?null="):
+            return url.replace("?null=", "?%s" % (qs, ))
+        if "?" in url:
+            return "%s&%s" % (url, qs)
+        return "%s?%s" % (url, qs)
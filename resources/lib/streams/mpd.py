@@ -90,3 +90,33 @@ class Mpd(object):
                                         key_headers=key_headers,
                                         key_value=key_value,
                                         json_filter=json_filter)
+
+    @staticmethod
+    def get_manifest(url, data=None, headers=None):
+        """ Retrieves and parses a MPEG-DASH manifest in a single pass.
+
+        :param str url:                 The URL of the manifest.
+        :param str|None data:           The content of the manifest, if it was already
+                                        downloaded.
+        :param dict[str,str] headers:   Possible HTTP Headers.
+
+        :return: The parsed manifest with its periods, adaptation sets, representations and
+                 content protection.
+        :rtype: resources.lib.streams.mpdparser.MpdManifest
+
+        Can be used like this:
+
+            manifest = Mpd.get_manifest(mpd_url)
+            stream = item.add_stream(mpd_url, 0)
+            Mpd.set_input_stream_addon_input(stream, license_key=...)
+            stream.Bitrates = manifest.get_bitrates("video")
+
+        """
+
+        # Local import to make sure the overhead is low
+        from resources.lib.streams.mpdparser import MpdParser
+        from resources.lib.urihandler import UriHandler
+
+        if data is None:
+            data = UriHandler.open(url, additional_headers=headers)
+        return MpdParser.parse(data, url)
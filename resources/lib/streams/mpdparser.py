@@ -0,0 +1,446 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import io
+import re
+import xml.etree.ElementTree as ElementTree
+
+from resources.lib.backtothefuture import PY2
+if PY2:
+    # noinspection PyUnresolvedReferences
+    import urlparse as parse
+else:
+    # noinspection PyUnresolvedReferences
+    import urllib.parse as parse
+
+
+class MpdContentProtection(object):
+    # The known DRM systems by their (lower case) scheme ID
+    SYSTEMS = {
+        "urn:mpeg:dash:mp4protection:2011": "mp4protection",
+        "urn:uuid:edef8ba9-79d6-4ace-a3c8-27dcd51d21ed": "widevine",
+        "urn:uuid:9a04f079-9840-4286-ab92-e65be0885f95": "playready",
+        "urn:uuid:e2719d58-a985-b3c9-781a-b030af78d30e": "clearkey",
+        "urn:uuid:94ce86fb-07ff-4f43-adb8-93d2fa968ca2": "fairplay",
+    }
+
+    def __init__(self, attributes):
+        """ A ContentProtection element of an AdaptationSet or Representation.
+
+        :param dict[str,str] attributes:    The attributes of the element (without namespaces).
+
+        """
+
+        self.attributes = attributes
+        self.scheme_id_uri = attributes.get("schemeIdUri", "")
+        self.system = MpdContentProtection.SYSTEMS.get(self.scheme_id_uri.lower())
+        self.value = attributes.get("value")
+        self.default_kid = attributes.get("default_KID")
+        self.pssh = None
+        self.license_url = attributes.get("licenseUrl") or attributes.get("licenseAcquisitionUrl")
+
+    def __str__(self):
+        return "MPD ContentProtection: {0} [kid={1}, license={2}]".format(
+            self.system or self.scheme_id_uri, self.default_kid, self.license_url)
+
+
+class MpdRepresentation(object):
+    def __init__(self, adaptation_set, attributes):
+        """ A Representation of an AdaptationSet.
+
+        :param MpdAdaptationSet adaptation_set:     The AdaptationSet it belongs to.
+        :param dict[str,str] attributes:            The attributes of the element.
+
+        """
+
+        self.adaptation_set = adaptation_set
+        self.attributes = attributes
+        self.base_url = adaptation_set.base_url
+        self.base_urls = []             # type: list[str]
+        self.content_protections = []   # type: list[MpdContentProtection]
+
+        self.id = attributes.get("id")
+        self.bandwidth = int(attributes.get("bandwidth", 0))
+        self.width = int(attributes["width"]) if "width" in attributes else None
+        self.height = int(attributes["height"]) if "height" in attributes else None
+        self.frame_rate = attributes.get("frameRate", adaptation_set.attributes.get("frameRate"))
+        self.codecs = attributes.get("codecs", adaptation_set.codecs)
+        self.mime_type = attributes.get("mimeType", adaptation_set.mime_type)
+        self.content_type = adaptation_set.content_type or MpdAdaptationSet.get_content_type(
+            self.mime_type, self.codecs)
+
+    @property
+    def bitrate(self):
+        """ The bitrate in kbps, as used by the MediaStreams.
+
+        :rtype: int
+
+        """
+
+        return self.bandwidth // 1000
+
+    def __str__(self):
+        return "MPD Representation: {0} [{1}, bandwidth={2}, resolution={3}x{4}, codecs={5}]".format(
+            self.id, self.content_type, self.bandwidth, self.width, self.height, self.codecs)
+
+
+class MpdAdaptationSet(object):
+    def __init__(self, period, attributes):
+        """ An AdaptationSet of a Period.
+
+        :param MpdPeriod period:            The Period it belongs to.
+        :param dict[str,str] attributes:    The attributes of the element.
+
+        """
+
+        self.period = period
+        self.attributes = attributes
+        self.base_url = period.base_url
+        self.base_urls = []             # type: list[str]
+        self.representations = []       # type: list[MpdRepresentation]
+        self.content_protections = []   # type: list[MpdContentProtection]
+
+        self.id = attributes.get("id")
+        self.lang = attributes.get("lang")
+        self.codecs = attributes.get("codecs")
+        self.mime_type = attributes.get("mimeType")
+        self.content_type = attributes.get("contentType") or \
+            MpdAdaptationSet.get_content_type(self.mime_type, self.codecs)
+
+    @staticmethod
+    def get_content_type(mime_type, codecs):
+        """ Determines the content type (video, audio or text) based on the mime type and codecs.
+
+        :param str|None mime_type:  The mime type.
+        :param str|None codecs:     The codecs.
+
+        :rtype: str|None
+
+        """
+
+        if not mime_type:
+            return None
+
+        main_type = mime_type.split("/", 1)[0]
+        if main_type in ("video", "audio", "text"):
+            return main_type
+        if "ttml" in mime_type or "vtt" in mime_type or (codecs or "").startswith(("stpp", "wvtt")):
+            return "text"
+        return None
+
+    def __str__(self):
+        return "MPD AdaptationSet: {0} [{1}, lang={2}, {3} representations]".format(
+            self.id, self.content_type, self.lang, len(self.representations))
+
+
+class MpdPeriod(object):
+    def __init__(self, manifest, attributes):
+        """ A Period of a manifest.
+
+        :param MpdManifest manifest:        The manifest it belongs to.
+        :param dict[str,str] attributes:    The attributes of the element.
+
+        """
+
+        self.manifest = manifest
+        self.attributes = attributes
+        self.base_url = manifest.base_url
+        self.base_urls = []         # type: list[str]
+        self.adaptation_sets = []   # type: list[MpdAdaptationSet]
+
+        self.id = attributes.get("id")
+        self.start = MpdParser.get_duration(attributes.get("start"))
+        self.duration = MpdParser.get_duration(attributes.get("duration"))
+
+
+class MpdManifest(object):
+    def __init__(self, url):
+        """ The parsed content of a MPEG-DASH manifest (MPD).
+
+        :param str|None url:    The URL of the manifest.
+
+        """
+
+        self.url = url
+        self.base_url = url
+        self.base_urls = []     # type: list[str]
+        self.attributes = {}
+        self.periods = []   # type: list[MpdPeriod]
+
+        self.type = "static"
+        self.media_presentation_duration = None
+        self.minimum_update_period = None
+
+    @property
+    def is_live(self):
+        """ Is this a live (dynamic) manifest?
+
+        :rtype: bool
+
+        """
+
+        return self.type == "dynamic"
+
+    def get_adaptation_sets(self, content_type=None):
+        """ Returns the AdaptationSets of all periods, optionally filtered by content type.
+
+        :param str|None content_type:   The content type: video, audio or text.
+
+        :rtype: list[MpdAdaptationSet]
+
+        """
+
+        return [a for p in self.periods for a in p.adaptation_sets
+                if content_type is None or a.content_type == content_type]
+
+    def get_representations(self, content_type=None):
+        """ Returns the Representations of all periods, optionally filtered by content type.
+
+        :param str|None content_type:   The content type: video, audio or text.
+
+        :rtype: list[MpdRepresentation]
+
+        """
+
+        return [r for p in self.periods for a in p.adaptation_sets for r in a.representations
+                if content_type is None or r.content_type == content_type]
+
+    def get_bitrates(self, content_type="video"):
+        """ Returns the distinct bitrates (in kbps) of the representations.
+
+        :param str|None content_type:   The content type: video, audio or text.
+
+        :rtype: list[int]
+
+        """
+
+        return sorted(set(r.bitrate for r in self.get_representations(content_type)))
+
+    def get_content_protections(self, system=None):
+        """ Returns all ContentProtection elements, optionally only those of a DRM system.
+
+        :param str|None system:     The DRM system: widevine, playready, clearkey, fairplay or
+                                    mp4protection.
+
+        :rtype: list[MpdContentProtection]
+
+        """
+
+        protections = []
+        for adaptation_set in self.get_adaptation_sets():
+            protections += adaptation_set.content_protections
+            for representation in adaptation_set.representations:
+                protections += representation.content_protections
+        return [p for p in protections if system is None or p.system == system]
+
+    def get_default_kids(self):
+        """ Returns the distinct `cenc:default_KID` values.
+
+        :rtype: list[str]
+
+        """
+
+        kids = []
+        for protection in self.get_content_protections():
+            if protection.default_kid and protection.default_kid not in kids:
+                kids.append(protection.default_kid)
+        return kids
+
+    def get_pssh(self, system="widevine"):
+        """ Returns the first `cenc:pssh` box of a DRM system.
+
+        :param str system:  The DRM system.
+
+        :rtype: str|None
+
+        """
+
+        return next((p.pssh for p in self.get_content_protections(system) if p.pssh), None)
+
+    def get_license_url(self):
+        """ Returns the first license URL found in the ContentProtection elements.
+
+        :rtype: str|None
+
+        """
+
+        return next((p.license_url for p in self.get_content_protections() if p.license_url), None)
+
+    def __str__(self):
+        return "MPD Manifest: {0} [{1}, {2} periods, {3} representations]".format(
+            self.url, self.type, len(self.periods), len(self.get_representations()))
+
+
+class MpdParser(object):
+    __duration_regex = re.compile(
+        r"^P(?:(\d+(?:\.\d+)?)Y)?(?:(\d+(?:\.\d+)?)M)?(?:(\d+(?:\.\d+)?)D)?"
+        r"(?:T(?:(\d+(?:\.\d+)?)H)?(?:(\d+(?:\.\d+)?)M)?(?:(\d+(?:\.\d+)?)S)?)?$")
+    __duration_factors = (365 * 24 * 3600, 30 * 24 * 3600, 24 * 3600, 3600, 60, 1)
+
+    def __init__(self, url=None):
+        """ An incremental parser for MPEG-DASH manifests.
+
+        The manifest is read using `iterparse` and every element is removed from the tree as soon
+        as it was processed. So even the large SegmentTimelines of live manifests are never kept
+        in memory, only the model of periods, adaptation sets and representations is.
+
+        :param str|None url:    The URL of the manifest (used to resolve the BaseURLs).
+
+        """
+
+        self.url = url
+
+    @staticmethod
+    def parse(data, url=None):
+        """ Parses a MPEG-DASH manifest.
+
+        :param str|bytes|io.IOBase data:    The manifest content or a file-like object to read
+                                            it from.
+        :param str|None url:                The URL of the manifest.
+
+        :return: The parsed manifest.
+        :rtype: MpdManifest
+
+        """
+
+        return MpdParser(url).parse_manifest(data)
+
+    @staticmethod
+    def get_duration(value):
+        """ Converts an ISO 8601 duration (PT1H2M3.5S) into seconds.
+
+        :param str|None value:  The duration.
+
+        :return: The duration in seconds or None if it was not a valid duration.
+        :rtype: float|None
+
+        """
+
+        match = MpdParser.__duration_regex.match(value or "")
+        if not match or not value or value in ("P", "PT"):
+            return None
+
+        return sum(float(part) * factor
+                   for part, factor in zip(match.groups(), MpdParser.__duration_factors) if part)
+
+    def parse_manifest(self, data):
+        """ Parses a MPEG-DASH manifest.
+
+        :param str|bytes|io.IOBase data:    The manifest content or a file-like object to read
+                                            it from.
+
+        :return: The parsed manifest.
+        :rtype: MpdManifest
+
+        """
+
+        if not hasattr(data, "read"):
+            if not isinstance(data, bytes):
+                data = data.encode("utf-8")
+            data = io.BytesIO(data)
+
+        manifest = MpdManifest(self.url)
+
+        # The stack of the open elements and of the model objects they represent.
+        elements = []
+        nodes = [manifest]
+        protection = None
+
+        for event, element in ElementTree.iterparse(data, events=("start", "end")):
+            tag = element.tag.rsplit("}", 1)[-1]
+
+            if event == "start":
+                elements.append(element)
+                if tag == "Representation":
+                    node = MpdRepresentation(nodes[-1], self.__get_attributes(element))
+                    nodes[-1].representations.append(node)
+                    nodes.append(node)
+                elif tag == "AdaptationSet":
+                    node = MpdAdaptationSet(nodes[-1], self.__get_attributes(element))
+                    nodes[-1].adaptation_sets.append(node)
+                    nodes.append(node)
+                elif tag == "ContentProtection":
+                    protection = MpdContentProtection(self.__get_attributes(element))
+                    if hasattr(nodes[-1], "content_protections"):
+                        nodes[-1].content_protections.append(protection)
+                elif tag == "Period":
+                    node = MpdPeriod(manifest, self.__get_attributes(element))
+                    manifest.periods.append(node)
+                    nodes.append(node)
+                elif tag == "MPD":
+                    manifest.attributes = self.__get_attributes(element)
+                    manifest.type = manifest.attributes.get("type", "static")
+                    manifest.media_presentation_duration = MpdParser.get_duration(
+                        manifest.attributes.get("mediaPresentationDuration"))
+                    manifest.minimum_update_period = MpdParser.get_duration(
+                        manifest.attributes.get("minimumUpdatePeriod"))
+                continue
+
+            # The end of an element: all its content is available now.
+            elements.pop()
+            if tag in ("Representation", "AdaptationSet", "Period"):
+                nodes.pop()
+            elif tag == "BaseURL":
+                # BaseURLs are relative to that of the parent. The first one is used.
+                node = nodes[-1]
+                if element.text and element.text.strip():
+                    node.base_urls.append(
+                        self.__resolve(self.__get_parent_base_url(node), element.text.strip()))
+                    node.base_url = node.base_urls[0]
+            elif tag == "ContentProtection":
+                protection = None
+            elif protection is not None:
+                if tag == "pssh":
+                    protection.pssh = (element.text or "").strip() or None
+                elif tag.lower() in ("laurl", "licenseacquisitionurl"):
+                    protection.license_url = (element.text or "").strip() or \
+                        self.__get_attributes(element).get("licenseUrl") or protection.license_url
+
+            # Remove the processed element, so the tree never grows.
+            if elements:
+                elements[-1].remove(element)
+            else:
+                element.clear()
+
+        return manifest
+
+    def __get_parent_base_url(self, node):
+        """ Returns the BaseURL a node inherited from its parent.
+
+        :param MpdManifest|MpdPeriod|MpdAdaptationSet|MpdRepresentation node:  The node.
+
+        :rtype: str|None
+
+        """
+
+        if isinstance(node, MpdRepresentation):
+            return node.adaptation_set.base_url
+        if isinstance(node, MpdAdaptationSet):
+            return node.period.base_url
+        if isinstance(node, MpdPeriod):
+            return node.manifest.base_url
+        return self.url
+
+    def __resolve(self, base_url, url):
+        """ Resolves a (relative) BaseURL.
+
+        :param str|None base_url:   The BaseURL of the parent.
+        :param str url:             The BaseURL to resolve.
+
+        :rtype: str
+
+        """
+
+        if not base_url or "://" in url:
+            return url
+        return parse.urljoin(base_url, url)
+
+    def __get_attributes(self, element):
+        """ Returns the attributes of an element, without their namespaces.
+
+        :param ElementTree.Element element:     The element.
+
+        :rtype: dict[str,str]
+
+        """
+
+        return dict((k.rsplit("}", 1)[-1], v) for k, v in element.attrib.items())
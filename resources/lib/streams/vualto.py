@@ -1,5 +1,6 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 from resources.lib.addonsettings import AddonSettings
+from resources.lib.authentication.tokencache import TokenCache
 from resources.lib.helpers.htmlentityhelper import HtmlEntityHelper
 from resources.lib.helpers.jsonhelper import JsonHelper
 from resources.lib.helpers.subtitlehelper import SubtitleHelper
@@ -38,18 +39,9 @@ class Vualto(object):
         """
 
         # We need a player token and for that we need to passa
-
-        token_url = "https://media-services-public.vrt.be" \
-                    "/vualto-video-aggregator-web/rest/external/v2/tokens"
-        token_headers = {"Content-Type": "application/json"}
-
-        if identity_token:
-            post_data = {"identityToken": identity_token}
-            token_data = UriHandler.open(token_url, json=post_data, additional_headers=token_headers)
-        else:
-            token_data = UriHandler.open(token_url, data="", additional_headers=token_headers)
-
-        token = JsonHelper(token_data).get_value("vrtPlayerToken")
+        token = TokenCache.instance().get_token(
+            "vualto", identity_token, lambda: self.__fetch_player_token(identity_token),
+            lifetime=300)
 
         asset_url = "https://media-services-public.vrt.be/vualto-video-aggregator-web/rest/" \
                     "external/v2/videos/{0}?vrtPlayerToken={1}&client={2}" \
@@ -132,3 +124,28 @@ class Vualto(object):
 
             item.complete = True
         return item
+
+    def __fetch_player_token(self, identity_token):
+        """ Fetches a new player token for the given identity token.
+
+        :param str|None identity_token:  The identity token to use.
+
+        :return: The player token and its expiry time (if known).
+        :rtype: tuple[str|None,float|None]
+
+        """
+
+        token_url = "https://media-services-public.vrt.be" \
+                    "/vualto-video-aggregator-web/rest/external/v2/tokens"
+        token_headers = {"Content-Type": "application/json"}
+
+        if identity_token:
+            post_data = {"identityToken": identity_token}
+            token_data = UriHandler.open(token_url, json=post_data, additional_headers=token_headers)
+        else:
+            token_data = UriHandler.open(token_url, data="", additional_headers=token_headers)
+
+        token_json = JsonHelper(token_data)
+        token = token_json.get_value("vrtPlayerToken")
+        expires = TokenCache.get_expiry(token_json.get_value("expirationDate", fallback=None))
+        return token, expires or TokenCache.get_jwt_expiry(token)
@@ -1,23 +1,31 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import os
+import threading
 import time
 
 from resources.lib.backtothefuture import PY2
 if PY2:
     # noinspection PyCompatibility,PyUnresolvedReferences
-    from cookielib import Cookie, CookieJar, MozillaCookieJar
+    from cookielib import Cookie, CookieJar
 else:
     # noinspection PyCompatibility
-    from http.cookiejar import Cookie, CookieJar, MozillaCookieJar, LoadError
+    from http.cookiejar import Cookie, CookieJar, LoadError
 from collections import namedtuple
 
 import requests
 import requests.cookies
 import requests.utils
+from requests.adapters import HTTPAdapter
 
 from resources.lib.connectivity.cachehttpadapter import CacheHTTPAdapter
+from resources.lib.connectivity.deferredcookiejar import DeferredCookieJar
 from resources.lib.connectivity.streamcache import StreamCache
+try:
+    from resources.lib.connectivity.sqlitecache import SqliteCache
+except ImportError:
+    # Some platforms ship Python without SQLite support.
+    SqliteCache = None
 from resources.lib.logger import Logger
 from resources.lib.proxyinfo import ProxyInfo
 
@@ -36,7 +44,10 @@ class UriHandler(object):
 
     @staticmethod
     def create_uri_handler(cache_dir=None, web_time_out=30,
-                           cookie_jar=None, ignore_ssl_errors=False):
+                           cookie_jar=None, ignore_ssl_errors=False,
+                           pool_connections=10, pool_maxsize=10, cookie_save_interval=None,
+                           cache_max_size=None, cache_stale_while_revalidate=0,
+                           cache_stale_if_error=24 * 3600):
         """ Initialises the UriHandler class
 
         Keyword Arguments:
@@ -44,6 +55,16 @@ class UriHandler(object):
         :param int web_time_out:        Timeout for requests in seconds.
         :param str|unicode cookie_jar:  The path to the cookie jar (in case of file storage).
         :param bool ignore_ssl_errors:  Ignore any SSL certificate errors.
+        :param int pool_connections:    The number of hosts for which connections are pooled.
+        :param int pool_maxsize:        The maximum number of kept-alive connections per host.
+        :param int cookie_save_interval: The minimal number of seconds between writes of changed
+                                         cookies. If None, they are only written on `flush()`.
+        :param int cache_max_size:      The maximum size of the http cache in bytes. If None, the
+                                        size is not limited.
+        :param int cache_stale_while_revalidate: The number of seconds an expired response may be
+                                                 served while it is refreshed in the background.
+        :param int cache_stale_if_error: The number of seconds an expired response may be served
+                                         if the server cannot be reached or returns an error.
 
         :return: A new UriHandler object
         :rtype: _RequestsHandler
@@ -54,9 +75,16 @@ class UriHandler(object):
         if UriHandler.__handler is None or \
                 UriHandler.instance().ignoreSslErrors != ignore_ssl_errors:
 
+            if UriHandler.__handler is not None:
+                UriHandler.__handler.close()
+
             handler = _RequestsHandler(
                 cache_dir=cache_dir, web_time_out=web_time_out, cookie_jar=cookie_jar,
-                ignore_ssl_errors=ignore_ssl_errors
+                ignore_ssl_errors=ignore_ssl_errors, pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize, cookie_save_interval=cookie_save_interval,
+                cache_max_size=cache_max_size,
+                cache_stale_while_revalidate=cache_stale_while_revalidate,
+                cache_stale_if_error=cache_stale_if_error
             )
 
             UriHandler.__handler = handler
@@ -130,6 +158,31 @@ class UriHandler(object):
             uri, proxy, params, data, json, referer,
             additional_headers, no_cache, force_text, force_cache_duration)
 
+    @staticmethod
+    def open_many(uris, proxy=None, referer=None, additional_headers=None, no_cache=False,
+                  force_text=False, force_cache_duration=None, max_workers=4):
+        """ Opens multiple URLs in parallel using a bounded number of threads and returns the
+        results in the same order as the URLs.
+
+        :param list[str] uris:                  The URIs to download (using GET requests).
+        :param ProxyInfo proxy:                 The address and port (proxy.address.ext:port) of a
+                                                proxy server that should be used.
+        :param str referer:                     The http referer to use.
+        :param dict additional_headers:         The optional headers.
+        :param bool no_cache:                   Should cache be disabled.
+        :param bool force_text:                 In case no content type is specified, force text.
+        :param int|None force_cache_duration:   Should a forced cache duration be used?
+        :param int max_workers:                 The maximum number of simultaneous requests.
+
+        :return: The data that was retrieved from each of the URIs.
+        :rtype: list[str|unicode]
+
+        """
+
+        return UriHandler.instance().open_many(
+            uris, proxy, referer, additional_headers, no_cache, force_text,
+            force_cache_duration, max_workers)
+
     @staticmethod
     def header(uri, proxy=None, referer=None, additional_headers=None):
         """ Retrieves header information only.
@@ -274,6 +327,21 @@ class UriHandler(object):
             # noinspection PyUnresolvedReferences
             cookie_jar.save()
 
+    @staticmethod
+    def clean_up_cache(max_age):
+        """ Removes the HTTP cache entries that were stored more than `max_age` seconds ago.
+
+        :param int max_age:     The maximum age in seconds.
+
+        """
+
+        cache_store = UriHandler.instance().cacheStore
+        if cache_store is None:
+            return
+
+        Logger.info("Cleaning up %s entries older than %s days", cache_store, max_age / 24 / 3600)
+        cache_store.clean_up(max_age)
+
     @staticmethod
     def get_extension_from_url(url):
         """ determines the file extension for a certain URL
@@ -300,7 +368,9 @@ class UriHandler(object):
 class _RequestsHandler(object):
 
     def __init__(self, cache_dir=None, web_time_out=30, cookie_jar=None,
-                 ignore_ssl_errors=False):
+                 ignore_ssl_errors=False, pool_connections=10, pool_maxsize=10,
+                 cookie_save_interval=None, cache_max_size=None, cache_stale_while_revalidate=0,
+                 cache_stale_if_error=24 * 3600):
         """ Initialises the UriHandler class
 
         Keyword Arguments:
@@ -308,13 +378,23 @@ class _RequestsHandler(object):
         :param int web_time_out:      Timeout for requests in seconds
         :param str cookie_jar:        The path to the cookie jar (in case of file storage)
         :param ignore_ssl_errors:     Ignore any SSL certificate errors.
+        :param int pool_connections:  The number of hosts for which connections are pooled.
+        :param int pool_maxsize:      The maximum number of kept-alive connections per host.
+        :param int cookie_save_interval: The minimal number of seconds between writes of changed
+                                         cookies. If None, they are only written on `flush()`.
+        :param int cache_max_size:    The maximum size of the http cache in bytes. If None, the
+                                      size is not limited.
+        :param int cache_stale_while_revalidate: The number of seconds an expired response may be
+                                                 served while it is refreshed in the background.
+        :param int cache_stale_if_error: The number of seconds an expired response may be served
+                                         if the server cannot be reached or returns an error.
 
         """
 
         self.id = int(time.time())
 
         if cookie_jar:
-            self.cookieJar = MozillaCookieJar(cookie_jar)
+            self.cookieJar = DeferredCookieJar(cookie_jar, save_interval=cookie_save_interval)
             if not os.path.isfile(cookie_jar):
                 self.cookieJar.save()
 
@@ -335,7 +415,10 @@ class _RequestsHandler(object):
         self.cacheDir = cache_dir
         self.cacheStore = None
         if cache_dir:
-            self.cacheStore = StreamCache(cache_dir)
+            if SqliteCache is not None:
+                self.cacheStore = SqliteCache(cache_dir, cache_max_size)
+            else:
+                self.cacheStore = StreamCache(cache_dir, cache_max_size)
             Logger.debug("Opened %s", self.cacheStore)
         else:
             Logger.debug("No cache-store provided. Cached disabled.")
@@ -349,6 +432,25 @@ class _RequestsHandler(object):
         # status of the most recent call
         self.status = UriStatus(code=0, url=None, error=False, reason=None)
 
+        # One session for the lifetime of the handler, so connections (and TLS sessions) to a
+        # host are kept alive and re-used by consecutive requests.
+        self.cacheAdapter = None
+        if self.cacheStore:
+            self.cacheAdapter = CacheHTTPAdapter(
+                self.cacheStore, None,
+                pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                stale_while_revalidate=cache_stale_while_revalidate,
+                stale_if_error=cache_stale_if_error)
+            adapter = self.cacheAdapter
+        else:
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+
+        self.__session = requests.session()
+        self.__session.cookies = self.cookieJar
+        self.__session.verify = not self.ignoreSslErrors
+        self.__session.mount("https://", adapter)
+        self.__session.mount("http://", adapter)
+
         # for download animation
         self.__animationIndex = -1
 
@@ -455,6 +557,91 @@ class _RequestsHandler(object):
         if r is None:
             return ""
 
+        return self.__get_content(r, force_text)
+
+    def open_many(self, uris, proxy=None, referer=None, additional_headers=None, no_cache=False,
+                  force_text=False, force_cache_duration=None, max_workers=4):
+        """ Opens multiple URLs in parallel using a bounded number of threads and returns the
+        results in the same order as the URLs.
+
+        All requests share the session, so they re-use its pooled connections and the cache. If
+        any of the requests failed, the `status` is that of the first failed request. If one of
+        them raised an exception, the first one is re-raised once all requests are done.
+
+        :param list[str] uris:                  The URIs to download (using GET requests).
+        :param ProxyInfo proxy:                 The address and port (proxy.address.ext:port) of a
+                                                proxy server that should be used.
+        :param str referer:                     The http referer to use.
+        :param dict|None additional_headers:    The optional headers.
+        :param bool no_cache:                   Should cache be disabled.
+        :param bool|None force_text:            In case no content type is specified, force text.
+        :param int|None force_cache_duration:   Should a forced cache duration be used?
+        :param int max_workers:                 The maximum number of simultaneous requests.
+
+        :return: The data that was retrieved from each of the URIs.
+        :rtype: list[str|unicode]
+
+        """
+
+        if not uris:
+            return []
+
+        results = [""] * len(uris)
+        statuses = [None] * len(uris)
+        errors = [None] * len(uris)
+        next_index = [0]
+        index_lock = threading.Lock()
+
+        def open_next():
+            while True:
+                with index_lock:
+                    index = next_index[0]
+                    if index >= len(uris):
+                        return
+                    next_index[0] += 1
+
+                uri = uris[index]
+                try:
+                    r = self.__requests(uri, proxy=proxy, params=None, data=None, json=None,
+                                        referer=referer, additional_headers=additional_headers,
+                                        no_cache=no_cache, stream=False,
+                                        force_cache_duration=force_cache_duration)
+                    statuses[index] = UriStatus(code=r.status_code, url=r.url, error=not r.ok, reason=r.reason)
+                    results[index] = self.__get_content(r, force_text)
+                except Exception as ex:
+                    Logger.error("Error opening %s", uri, exc_info=True)
+                    errors[index] = ex
+
+        worker_count = max(1, min(max_workers, len(uris)))
+        Logger.debug("Opening %s urls using %s threads", len(uris), worker_count)
+        workers = [threading.Thread(target=open_next, name="OpenMany-{0}".format(i))
+                   for i in range(worker_count)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        # The status of the most recent call is not meaningful for parallel calls.
+        statuses = [status for status in statuses if status is not None]
+        if statuses:
+            self.status = next((status for status in statuses if status.error), statuses[-1])
+
+        error = next((error for error in errors if error is not None), None)
+        if error is not None:
+            raise error
+        return results
+
+    def __get_content(self, r, force_text):
+        """ Returns the content of a response, decoded as text if possible.
+
+        :param requests.Response r:     The response.
+        :param bool|None force_text:    In case no content type is specified, force text.
+
+        :return: The (decoded) content.
+        :rtype: str|unicode|bytes
+
+        """
+
         content_type = r.headers.get("content-type", "")
         if r.encoding == 'ISO-8859-1' and "text" in content_type:
             # Requests defaults to ISO-8859-1 for all text content that does not specify an encoding
@@ -489,84 +676,110 @@ class _RequestsHandler(object):
 
         """
 
-        with requests.session() as s:
-            s.cookies = self.cookieJar
-            s.verify = not self.ignoreSslErrors
+        s = self.__session
+        if self.cacheAdapter:
+            self.cacheAdapter.set_request_options(no_cache=True)
 
-            proxies = self.__get_proxies(proxy, uri)
-            headers = self.__get_headers(referer, additional_headers)
+        proxies = self.__get_proxies(proxy, uri)
+        headers = self.__get_headers(referer, additional_headers)
 
-            Logger.info("Performing a HEAD for %s", uri)
-            r = s.head(uri, proxies=proxies, headers=headers, allow_redirects=True,
-                       timeout=self.webTimeOut)
+        Logger.info("Performing a HEAD for %s", uri)
+        r = s.head(uri, proxies=proxies, headers=headers, allow_redirects=True,
+                   timeout=self.webTimeOut)
 
-            content_type = r.headers.get("Content-Type", "")
-            real_url = r.url
+        content_type = r.headers.get("Content-Type", "")
+        real_url = r.url
 
-            self.status = UriStatus(code=r.status_code, url=uri, error=not r.ok, reason=r.reason)
-            if self.cookieJarFile:
-                # noinspection PyUnresolvedReferences
-                self.cookieJar.save()
+        self.status = UriStatus(code=r.status_code, url=uri, error=not r.ok, reason=r.reason)
+        if self.cookieJarFile:
+            # noinspection PyUnresolvedReferences
+            self.cookieJar.save_if_due()
 
-            if r.ok:
-                Logger.info("%s resulted in '%s %s' (%s) for %s",
-                            r.request.method, r.status_code, r.reason, r.elapsed, r.url)
-                return content_type, real_url
-            else:
-                Logger.error("%s failed with in '%s %s' (%s) for %s",
-                             r.request.method, r.status_code, r.reason, r.elapsed, r.url)
-                return "", ""
+        if r.ok:
+            Logger.info("%s resulted in '%s %s' (%s) for %s",
+                        r.request.method, r.status_code, r.reason, r.elapsed, r.url)
+            return content_type, real_url
+        else:
+            Logger.error("%s failed with in '%s %s' (%s) for %s",
+                         r.request.method, r.status_code, r.reason, r.elapsed, r.url)
+            return "", ""
 
     # noinspection PyUnusedLocal
     def __requests(self, uri, proxy, params, data, json, referer,
                    additional_headers, no_cache, stream, force_cache_duration):
 
-        with requests.session() as s:
-            s.cookies = self.cookieJar
-            s.verify = not self.ignoreSslErrors
-            if self.cacheStore and not no_cache:
-                Logger.trace("Adding the %s to the request", self.cacheStore)
-                s.mount("https://", CacheHTTPAdapter(self.cacheStore, force_cache_duration))
-                s.mount("http://", CacheHTTPAdapter(self.cacheStore, force_cache_duration))
-
-            proxies = self.__get_proxies(proxy, uri)
-
-            headers = self.__get_headers(referer, additional_headers)
-
-            if params is not None:
-                # Old UriHandler behaviour. Set form header to keep compatible
-                if "content-type" not in headers:
-                    headers["content-type"] = "application/x-www-form-urlencoded"
-
-                Logger.info("Performing a POST with '%s' for %s", headers["content-type"], uri)
-                r = s.post(uri, data=params, proxies=proxies, headers=headers,
-                           stream=stream, timeout=self.webTimeOut)
-            elif data is not None:
-                # Normal Requests compatible data object
-                Logger.info("Performing a POST with '%s' for %s", headers.get("content-type", "<No Content-Type>"), uri)
-                r = s.post(uri, data=data, proxies=proxies, headers=headers,
-                           stream=stream, timeout=self.webTimeOut)
-            elif json is not None:
-                Logger.info("Performing a json POST with '%s' for %s", headers.get("content-type", "<No Content-Type>"), uri)
-                r = s.post(uri, json=json, proxies=proxies, headers=headers,
-                           stream=stream, timeout=self.webTimeOut)
-            else:
-                Logger.info("Performing a GET for %s", uri)
-                r = s.get(uri, proxies=proxies, headers=headers,
-                          stream=stream, timeout=self.webTimeOut)
+        s = self.__session
+        if self.cacheAdapter:
+            Logger.trace("Using the %s for the request", self.cacheStore)
+            self.cacheAdapter.set_request_options(no_cache, force_cache_duration)
+
+        proxies = self.__get_proxies(proxy, uri)
+
+        headers = self.__get_headers(referer, additional_headers)
+
+        if params is not None:
+            # Old UriHandler behaviour. Set form header to keep compatible
+            if "content-type" not in headers:
+                headers["content-type"] = "application/x-www-form-urlencoded"
+
+            Logger.info("Performing a POST with '%s' for %s", headers["content-type"], uri)
+            r = s.post(uri, data=params, proxies=proxies, headers=headers,
+                       stream=stream, timeout=self.webTimeOut)
+        elif data is not None:
+            # Normal Requests compatible data object
+            Logger.info("Performing a POST with '%s' for %s", headers.get("content-type", "<No Content-Type>"), uri)
+            r = s.post(uri, data=data, proxies=proxies, headers=headers,
+                       stream=stream, timeout=self.webTimeOut)
+        elif json is not None:
+            Logger.info("Performing a json POST with '%s' for %s", headers.get("content-type", "<No Content-Type>"), uri)
+            r = s.post(uri, json=json, proxies=proxies, headers=headers,
+                       stream=stream, timeout=self.webTimeOut)
+        else:
+            Logger.info("Performing a GET for %s", uri)
+            r = s.get(uri, proxies=proxies, headers=headers,
+                      stream=stream, timeout=self.webTimeOut)
 
-            if r.ok:
-                Logger.info("%s resulted in '%s %s' (%s) for %s",
-                            r.request.method, r.status_code, r.reason, r.elapsed, r.url)
-            else:
-                Logger.error("%s failed with '%s %s' (%s) for %s",
-                             r.request.method, r.status_code, r.reason, r.elapsed, r.url)
+        if r.ok:
+            Logger.info("%s resulted in '%s %s' (%s) for %s",
+                        r.request.method, r.status_code, r.reason, r.elapsed, r.url)
+        else:
+            Logger.error("%s failed with '%s %s' (%s) for %s",
+                         r.request.method, r.status_code, r.reason, r.elapsed, r.url)
 
-            self.status = UriStatus(code=r.status_code, url=r.url, error=not r.ok, reason=r.reason)
-            if self.cookieJarFile:
-                # noinspection PyUnresolvedReferences
-                self.cookieJar.save()
-            return r
+        self.status = UriStatus(code=r.status_code, url=r.url, error=not r.ok, reason=r.reason)
+        if self.cookieJarFile:
+            # noinspection PyUnresolvedReferences
+            self.cookieJar.save_if_due()
+        return r
+
+    def flush(self):
+        """ Waits for background cache revalidations, saves the cookies to the cookie jar file,
+        if any of them changed, and logs the cache statistics. To be called at the end of each
+        add-on invocation.
+
+        """
+
+        if self.cacheAdapter:
+            self.cacheAdapter.wait_for_revalidations(self.webTimeOut)
+
+        if self.cookieJarFile:
+            # noinspection PyUnresolvedReferences
+            self.cookieJar.flush()
+
+        if self.cacheStore:
+            Logger.info("%s: %s", self.cacheStore, self.cacheStore.get_statistics())
+
+    def close(self):
+        """ Saves the changed cookies, closes all the pooled connections of this handler and
+        closes the cache store. The handler should not be used after closing it.
+
+        """
+
+        self.flush()
+        Logger.debug("Closing the connection pools of %s", self)
+        self.__session.close()
+        if self.cacheStore:
+            self.cacheStore.close()
 
     def __get_headers(self, referer, additional_headers):
         headers = {}
@@ -7,6 +7,16 @@ import base64
 import random
 import string
 import hashlib
+import time
+
+try:
+    # A native AES implementation from the pycryptodome(x) packages, if those are available.
+    from Cryptodome.Cipher import AES
+except ImportError:
+    try:
+        from Crypto.Cipher import AES
+    except ImportError:
+        AES = None
 
 from resources.lib.backtothefuture import PY2
 from resources.lib.logger import Logger
@@ -19,9 +29,18 @@ from resources.lib.helpers.encodinghelper import EncodingHelper
 class Vault(object):
     # bytes representation of the key. Use bytes.decode() to get string representation
     __Key = None  # type: bytes
+    __KeyTime = 0.0  # : When the key was decrypted
     __APPLICATION_KEY_SETTING = "application_key"
     __VAULT_HOWTO_SETTING = "vault_shown"
 
+    # The scrypt parameters (log2(N), r, p) for the PIN based key. The legacy parameters were
+    # chosen so a Raspberry Pi can handle the pure Python scrypt. A native scrypt can handle
+    # much stronger parameters. The parameters are stored with the encrypted application key.
+    __LEGACY_KDF_PARAMETERS = (7, 1, 1)
+    __NATIVE_SCRYPT = hasattr(hashlib, "scrypt")
+    __KDF_PARAMETERS = (14, 8, 1) if __NATIVE_SCRYPT else __LEGACY_KDF_PARAMETERS
+    __KDF_PREFIX = "$scrypt$"
+
     def __init__(self):
         """ Creates a new instance of the Vault class """
 
@@ -48,11 +67,19 @@ class Vault(object):
                 self.__newKeyGeneratedInConstructor = True
 
             Vault.__Key = key
-            Logger.trace("Using Application Key with MD5: %s (length=%s)", EncodingHelper.encode_md5(key), len(key))
+            Vault.__KeyTime = time.time()
+            if Logger.is_enabled_for(Logger.LVL_TRACE):
+                Logger.trace("Using Application Key with MD5: %s (length=%s)", EncodingHelper.encode_md5(key), len(key))
 
     def change_pin(self, application_key=None):
         """ Stores an existing ApplicationKey using a new PIN.
 
+        With a native scrypt the key is stored using the stronger key derivation parameters.
+        That is the only moment a stored key changes format: keys in the legacy format are
+        read as they are. After the change, versions of Retrospect without support for the
+        parameters can no longer read the key, and devices without a native scrypt (such as a
+        Raspberry Pi with an older Python) need a long time to derive the key from the PIN.
+
         :param bytes application_key: an existing ApplicationKey that will be stored. If none
                                       specified, the existing ApplicationKey of the Vault will
                                       be used.
@@ -106,9 +133,12 @@ class Vault(object):
             encrypted_key = "%s=%s" % (self.__APPLICATION_KEY_SETTING, application_key.decode())
 
         # let's generate a pin using the scrypt password-based key derivation
-        pin_key = self.__get_pbk(pin)
+        pin_key = self.__get_pbk(pin, Vault.__KDF_PARAMETERS)
         encrypted_key = self.__encrypt(encrypted_key, pin_key)
+        encrypted_key = Vault.__add_kdf_parameters(encrypted_key, Vault.__KDF_PARAMETERS)
         AddonSettings.set_setting(Vault.__APPLICATION_KEY_SETTING, encrypted_key, store=LOCAL)
+        # without the key nothing can be decrypted, so make sure it is stored right away.
+        AddonSettings.store(LOCAL).commit()
         Logger.info("Successfully updated the Retrospect PIN")
         return True
 
@@ -129,11 +159,35 @@ class Vault(object):
 
         Logger.info("Resetting the vault to a new initial state.")
         AddonSettings.set_setting(Vault.__APPLICATION_KEY_SETTING, "", store=LOCAL)
+        Vault.__Key = None
 
         # create a vault instance so we initialize a new one with a new PIN.
         Vault()
         return
 
+    @staticmethod
+    def lock(expired_only=False):
+        """ Removes the application key from memory, so the PIN is required again. The key is
+        only kept in the memory of this Python interpreter (which Kodi reuses for the next
+        calls of the add-on), never in a location other add-ons can read.
+
+        :param bool expired_only:   Only remove the key if the user opted in to forget it after
+                                    a while and that time has passed. Otherwise it is kept for
+                                    as long as the Python interpreter lives.
+
+        """
+
+        if Vault.__Key is None:
+            return
+
+        if expired_only:
+            duration = AddonSettings.get_vault_key_cache_duration()
+            if not duration or Vault.__KeyTime + duration > time.time():
+                return
+
+        Logger.debug("Removing the ApplicationKey from memory.")
+        Vault.__Key = None
+
     def get_channel_setting(self, channel_guid, setting_id):
         """ Retrieves channel settings for the given channel.
 
@@ -266,7 +320,16 @@ class Vault(object):
         if not pin:
             XbmcWrapper.show_notification("", vault_incorrect_pin, XbmcWrapper.Error)
             raise RuntimeError("Incorrect Retrospect PIN specified")
-        pin_key = self.__get_pbk(pin)
+        kdf_parameters, application_key_encrypted = \
+            Vault.__split_kdf_parameters(application_key_encrypted)
+        if not Vault.__NATIVE_SCRYPT and kdf_parameters != Vault.__LEGACY_KDF_PARAMETERS:
+            # The key was stored on a device with a native scrypt. The pure Python one needs
+            # minutes for those parameters on a Raspberry Pi, so the user should know.
+            Logger.warning("No native scrypt available for %s, this might take a while.", kdf_parameters)
+            XbmcWrapper.show_notification(
+                "", LanguageHelper.get_localized_string(LanguageHelper.VaultSlowKeyDerivation),
+                XbmcWrapper.Warning, display_time=5000)
+        pin_key = self.__get_pbk(pin, kdf_parameters)
         try:
             application_key = self.__decrypt(application_key_encrypted, pin_key)
         except UnicodeDecodeError:
@@ -280,7 +343,10 @@ class Vault(object):
             raise RuntimeError("Incorrect Retrospect PIN specified")
 
         application_key_value = application_key[len(Vault.__APPLICATION_KEY_SETTING) + 1:]
+        # The key is not re-encrypted with other parameters here: that only happens when the
+        # user changes the PIN, see change_pin().
         Logger.info("Successfully decrypted the ApplicationKey.")
+
         if PY2:
             return application_key_value
 
@@ -299,10 +365,11 @@ class Vault(object):
         """
 
         Logger.debug("Encrypting with keysize: %s", len(key))
-        aes = pyaes.AESModeOfOperationCTR(key)
+        aes = Vault.__get_cipher(key)
         if PY2:
             return base64.b64encode(aes.encrypt(data))
-        return base64.b64encode(aes.encrypt(data)).decode()
+        # pyaes encodes text using the code points as bytes.
+        return base64.b64encode(aes.encrypt(data.encode("latin-1"))).decode()
 
     def __decrypt(self, data, key):
         """ Decrypts string data (not bytes) using the given encryption key (bytes). The decrypted
@@ -317,7 +384,7 @@ class Vault(object):
         """
 
         Logger.debug("Decrypting with keysize: %s", len(key))
-        aes = pyaes.AESModeOfOperationCTR(key)
+        aes = Vault.__get_cipher(key)
 
         if PY2:
             return aes.decrypt(base64.b64decode(data))
@@ -341,10 +408,11 @@ class Vault(object):
         # The key is bytes in Py3
         return new_key.encode()
 
-    def __get_pbk(self, pin):
+    def __get_pbk(self, pin, kdf_parameters):
         """ Gets the Password Based Key (PBK) based on the PIN.
 
-        :param str pin: The pin for the key.
+        :param str pin:                         The pin for the key.
+        :param tuple[int,int,int] kdf_parameters: The scrypt log2(N), r and p parameters.
 
         :return: The PBK
         :rtype: bytes
@@ -352,12 +420,72 @@ class Vault(object):
         """
 
         salt = AddonSettings.get_client_id()
-        pbk = pyscrypt.hash(password=pin if PY2 else pin.encode(),
-                            salt=salt if PY2 else salt.encode(),
-                            N=2 ** 7,  # should be so that Raspberry Pi can handle it
-                            # N=1024,
-                            r=1,
-                            p=1,
-                            dkLen=32)
-        Logger.trace("Generated PBK with MD5: %s", hashlib.md5(pbk).hexdigest())
+        password = pin if PY2 else pin.encode()
+        salt = salt if PY2 else salt.encode()
+        log_n, r, p = kdf_parameters
+
+        if Vault.__NATIVE_SCRYPT:
+            # noinspection PyUnresolvedReferences
+            pbk = hashlib.scrypt(password, salt=salt, n=2 ** log_n, r=r, p=p, dklen=32)
+        else:
+            pbk = pyscrypt.hash(password=password, salt=salt, N=2 ** log_n, r=r, p=p, dkLen=32)
+
+        if Logger.is_enabled_for(Logger.LVL_TRACE):
+            Logger.trace("Generated PBK with MD5: %s", hashlib.md5(pbk).hexdigest())
         return pbk
+
+    @staticmethod
+    def __get_cipher(key):
+        """ Creates an AES cipher in CTR mode, preferably a native one.
+
+        Both implementations start with a 128-bit counter with value 1, so they are compatible.
+
+        :param bytes key:   The key to use for encryption.
+
+        :return: An object with an encrypt() and decrypt() method.
+
+        """
+
+        if AES is not None:
+            try:
+                return AES.new(key, AES.MODE_CTR, nonce=b"", initial_value=1)
+            except TypeError:
+                # Older PyCrypto versions have a different signature.
+                pass
+        return pyaes.AESModeOfOperationCTR(key)
+
+    @staticmethod
+    def __add_kdf_parameters(data, kdf_parameters):
+        """ Prefixes the encrypted data with the key derivation parameters that were used for
+        the key. The legacy parameters are not stored, to keep the data readable for older
+        versions.
+
+        :param str data:                            The encrypted base64 encoded data.
+        :param tuple[int,int,int] kdf_parameters:   The scrypt log2(N), r and p parameters.
+
+        :return: The encrypted data with the parameters.
+        :rtype: str
+
+        """
+
+        if kdf_parameters == Vault.__LEGACY_KDF_PARAMETERS:
+            return data
+        return "%sln=%d,r=%d,p=%d$%s" % ((Vault.__KDF_PREFIX, ) + kdf_parameters + (data, ))
+
+    @staticmethod
+    def __split_kdf_parameters(data):
+        """ Splits the data into the key derivation parameters and the actual encrypted data.
+
+        :param str data:    The encrypted data with the parameters.
+
+        :return: The scrypt log2(N), r and p parameters and the encrypted base64 encoded data.
+        :rtype: tuple[tuple[int,int,int],str]
+
+        """
+
+        if not data.startswith(Vault.__KDF_PREFIX):
+            return Vault.__LEGACY_KDF_PARAMETERS, data
+
+        parameters, data = data[len(Vault.__KDF_PREFIX):].split("$", 1)
+        parameters = dict(parameter.split("=", 1) for parameter in parameters.split(","))
+        return (int(parameters["ln"]), int(parameters["r"]), int(parameters["p"])), data
@@ -3,6 +3,9 @@
 __all__ = ["test_version", "test_urihandler", "test_datehelper", "test_jsonhelper", "test_logger",
            "test_cloaker", "test_templatehelper", "test_youtube", "test_kodilibs", "test_logsender",
            "test_localsettings", "test_subtitlehelper", "test_channelimporter",
-           "test_htmlentityhelper"]
+           "test_htmlentityhelper", "test_cachestore", "test_pickler", "test_parserdata",
+           "test_mediaitem", "test_settingssnapshot", "test_vault",
+           "test_importtime", "test_tokencache", "test_hlsparser",
+           "test_mpdparser", "test_htmlhelper", "test_fileutils", "test_videoaction"]
 import os
 os.environ["KODI_STUB_RPC_RESPONSES"] = os.path.join(os.path.dirname(__file__), "data", "jsonrcpcommands")
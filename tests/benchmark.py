@@ -0,0 +1,57 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import time
+
+
+def print_timings(title, actions, iterations=10):
+    """ Runs each action a number of times and prints the average duration of a single run.
+
+    :param str title:           The title of the benchmark.
+    :param list[tuple] actions: The (name, action) pairs to time. An optional third item is a
+                                function that returns a note about the result, which is printed
+                                after the duration.
+    :param int iterations:      The number of runs per action.
+
+    """
+
+    print("\n{0}, average of {1} run{2}:".format(title, iterations, "" if iterations == 1 else "s"))
+    for timed_action in actions:
+        name, action = timed_action[:2]
+        describe = timed_action[2] if len(timed_action) > 2 else None
+
+        start = time.time()
+        for _ in range(iterations):
+            action()
+        duration = (time.time() - start) * 1000 / iterations
+
+        if describe is None:
+            print("{0:>20}: {1:8.2f} ms".format(name, duration))
+        else:
+            print("{0:>20}: {1:8.2f} ms ({2})".format(name, duration, describe()))
+
+
+def print_peak_memory(title, actions):
+    """ Runs each action once and prints the peak memory that was allocated while it ran. The
+    result of the action is kept until the measurement is done, so it is included.
+
+    :param str title:           The title of the benchmark.
+    :param list[tuple] actions: The (name, action) pairs to measure.
+
+    """
+
+    try:
+        import tracemalloc
+    except ImportError:
+        print("\n{0}: peak memory needs tracemalloc (Python 3.4+)".format(title))
+        return
+
+    print("\n{0}, peak memory:".format(title))
+    for name, action in actions:
+        tracemalloc.start()
+        try:
+            result = action()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        del result
+        print("{0:>20}: {1:8.2f} MB".format(name, peak / 1024.0 / 1024.0))
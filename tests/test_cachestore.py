@@ -0,0 +1,163 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from resources.lib.connectivity.sqlitecache import SqliteCache
+from resources.lib.connectivity.streamcache import StreamCache
+from resources.lib.logger import Logger
+
+
+class TestSqliteCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        Logger.create_logger(None, str(cls), min_log_level=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        Logger.instance().close_log()
+
+    def setUp(self):
+        self.cache_folder = tempfile.mkdtemp(prefix="retro_test_")
+        self.store = self._create_store()
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.cache_folder)
+
+    def _create_store(self, max_size=None):
+        return SqliteCache(self.cache_folder, max_size)
+
+    def test_miss(self):
+        self.assertIsNone(self.store.get_meta("missing"))
+        self.assertIsNone(self.store.get_body("missing"))
+        self.assertFalse(self.store.has_cache_key("missing"))
+
+    def test_set_and_get(self):
+        body = b"\x00binary\xffbody" * 100
+        self.store.set("key", self.__get_meta(), body)
+
+        meta = self.store.get_meta("key")
+        self.assertEqual(200, meta["status"])
+        self.assertEqual("OK", meta["reason"])
+        self.assertEqual("utf-8", meta["encoding"])
+        self.assertEqual("application/json", meta["headers"]["Content-Type"])
+        self.assertEqual(60, meta["cache_data"]["max-age"])
+        self.assertAlmostEqual(time.time(), meta["stored_at"], delta=5)
+        self.assertEqual(body, self.store.get_body("key").read())
+        self.assertEqual(1, self.store.get_entry_count())
+
+    def test_empty_body(self):
+        self.store.set("key", self.__get_meta(), b"")
+        body = self.store.get_body("key")
+        self.assertEqual(b"", body.read())
+        body.close()
+
+    def test_read_body_in_chunks(self):
+        self.store.set("key", self.__get_meta(), b"0123456789")
+        body = self.store.get_body("key")
+        self.assertEqual(b"0123", body.read(4))
+        self.assertEqual(b"456789", body.read(10))
+        self.assertEqual(b"", body.read(10))
+        body.close()
+
+    def test_replace(self):
+        self.store.set("key", self.__get_meta(), b"first")
+        self.store.set("key", self.__get_meta(), b"second")
+        self.assertEqual(b"second", self.store.get_body("key").read())
+        self.assertEqual(1, self.store.get_entry_count())
+
+    def test_expired(self):
+        self.store.set("key", self.__get_meta(), b"body")
+        meta = self.store.get_meta("key")
+        self.assertFalse(self.store.is_expired(meta, 60))
+        self.assertTrue(self.store.is_expired(meta, -1))
+
+    def test_touch(self):
+        self.store.set("key", self.__get_meta(), b"body")
+        stored_at = self.store.get_meta("key")["stored_at"]
+        time.sleep(0.01)
+        self.store.touch("key")
+        self.assertGreater(self.store.get_meta("key")["stored_at"], stored_at)
+
+    def test_remove_and_clean_up(self):
+        self.store.set("key1", self.__get_meta(), b"body")
+        self.store.set("key2", self.__get_meta(), b"body")
+        self.store.remove("key1")
+        self.assertFalse(self.store.has_cache_key("key1"))
+        self.assertEqual(1, self.store.get_entry_count())
+
+        self.assertEqual(0, self.store.clean_up(60))
+        self.assertEqual(1, self.store.clean_up(-1))
+        self.assertEqual(0, self.store.get_entry_count())
+
+    def test_size(self):
+        self.assertEqual(0, self.store.get_size())
+        self.store.set("key1", self.__get_meta(), b"1" * 100)
+        self.store.set("key2", self.__get_meta(), b"2" * 50)
+        self.assertEqual(150, self.store.get_size())
+        self.assertIn("2 entries", self.store.get_statistics())
+
+    def test_lru_eviction(self):
+        self.store.close()
+        self.store = self._create_store(max_size=1000)
+
+        for i in range(4):
+            self.store.set("key{0}".format(i), self.__get_meta(), b"x" * 300)
+            time.sleep(0.01)
+            # keep the first one in use
+            self.store.get_body("key0")
+            time.sleep(0.01)
+
+        # the 4th entry exceeded the budget, so the least recently used entries were removed
+        self.assertLessEqual(self.store.get_size(), 1000)
+        self.assertTrue(self.store.has_cache_key("key0"))
+        self.assertFalse(self.store.has_cache_key("key1"))
+        self.assertTrue(self.store.has_cache_key("key3"))
+
+    def test_too_large_for_cache(self):
+        self.store.close()
+        self.store = self._create_store(max_size=10)
+
+        self.store.set("key", self.__get_meta(), b"x" * 11)
+        self.assertFalse(self.store.has_cache_key("key"))
+
+    def test_persistence(self):
+        self.store.set("key", self.__get_meta(), b"body")
+        self.store.close()
+
+        self.store = self._create_store()
+        self.assertEqual(b"body", self.store.get_body("key").read())
+
+    def test_corrupt_database(self):
+        self.store.close()
+        with open(self.store.databasePath, "wb") as fp:
+            fp.write(b"this is not a database" * 100)
+
+        self.store = self._create_store()
+        self.assertEqual(0, self.store.get_entry_count())
+
+    def __get_meta(self):
+        return {
+            "url": "https://example.com/",
+            "status": 200,
+            "reason": "OK",
+            "encoding": "utf-8",
+            "headers": {"Content-Type": "application/json"},
+            "cache_data": {"max-age": 60}
+        }
+
+
+class TestStreamCache(TestSqliteCache):
+    def _create_store(self, max_size=None):
+        return StreamCache(self.cache_folder, max_size)
+
+    def test_corrupt_database(self):
+        # There is no database for the file based cache.
+        pass
+
+    def test_cache_path(self):
+        self.assertEqual(os.path.join(self.cache_folder, "www"), self.store.cachePath)
@@ -1,5 +1,6 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import json
 import os
 import unittest
 
@@ -28,9 +29,8 @@ class TestChannelImporter(unittest.TestCase):
         ChannelIndex._ChannelIndex__channelIndexer = None
 
     def setUp(self):
-        self.index_json = os.path.join(
-            "tests", "home", "userdata", "addon_data", "plugin.video.retrospect",
-            "channelindex.json")
+        from resources.lib.retroconfig import Config
+        self.index_json = os.path.join(Config.profileDir, "channelindex.json")
         if os.path.isfile(self.index_json):
             os.remove(self.index_json)
 
@@ -84,3 +84,101 @@ class TestChannelImporter(unittest.TestCase):
         # Fetch a simple channel without channel code
         channel = instance.get_channel("channel.se.urplay", None)
         self.assertEqual("channel.se.urplay", channel.id)
+
+    def test_channel_index_created(self):
+        from resources.lib.helpers.channelimporter import ChannelIndex
+        instance = ChannelIndex.get_register()
+        channels = instance.get_channels()
+        self.assertTrue(os.path.isfile(self.index_json))
+
+        with open(self.index_json) as fp:
+            index = json.load(fp)
+        self.assertIn("channel.se.svt", index["sets"])
+
+        # A new indexer uses the stored index.
+        ChannelIndex._ChannelIndex__channelIndexer = None
+        instance = ChannelIndex.get_register()
+        self.assertEqual(len(channels), len(instance.get_channels()))
+        channel = instance.get_channel("channel.se.svt", "svt")
+        self.assertEqual("channel.se.svt.svt", channel.id)
+
+    def test_channel_index_single_channel(self):
+        from resources.lib.helpers.channelimporter import ChannelIndex
+        instance = ChannelIndex.get_register()
+        channel = instance.get_channel("channel.se.urplay", None, info_only=True)
+        self.assertIsNotNone(channel)
+
+        with open(self.index_json) as fp:
+            index = json.load(fp)
+        self.assertEqual(["channel.se.urplay"], list(index["sets"].keys()))
+
+    def test_channel_index_changed_set(self):
+        from resources.lib.helpers.channelimporter import ChannelIndex
+        instance = ChannelIndex.get_register()
+        instance.get_channels()
+
+        # Changing the modification times invalidates the entry.
+        with open(self.index_json) as fp:
+            index = json.load(fp)
+        index["sets"]["channel.se.svt"]["mtimes"] = [0, 0]
+        index["sets"]["channel.se.svt"]["data"]["channels"] = []
+        with open(self.index_json, "w") as fp:
+            json.dump(index, fp)
+
+        ChannelIndex._ChannelIndex__channelIndexer = None
+        instance = ChannelIndex.get_register()
+        channel = instance.get_channel("channel.se.svt", "svt", info_only=True)
+        self.assertIsNotNone(channel)
+
+        # It was re-indexed
+        with open(self.index_json) as fp:
+            index = json.load(fp)
+        self.assertNotEqual([0, 0], index["sets"]["channel.se.svt"]["mtimes"])
+        self.assertTrue(index["sets"]["channel.se.svt"]["data"]["channels"])
+
+    def test_channel_index_other_version(self):
+        from resources.lib.helpers.channelimporter import ChannelIndex
+        ChannelIndex.get_register().get_channels()
+
+        with open(self.index_json) as fp:
+            index = json.load(fp)
+        index["version"] = "0.0.1"
+        index["sets"] = {}
+        with open(self.index_json, "w") as fp:
+            json.dump(index, fp)
+
+        ChannelIndex._ChannelIndex__channelIndexer = None
+        ChannelIndex.get_register().get_channels()
+        with open(self.index_json) as fp:
+            index = json.load(fp)
+        self.assertNotEqual("0.0.1", index["version"])
+        self.assertIn("channel.se.svt", index["sets"])
+
+    def test_settings_xml_sections(self):
+        from resources.lib.helpers.channelimporter import ChannelIndex
+        from resources.lib.addonsettings import AddonSettings
+        from resources.lib.retroconfig import Config
+
+        channels = ChannelIndex.get_register().get_channels()
+        sections_json = os.path.join(Config.profileDir, "settingssections.json")
+        settings_xml = os.path.join(Config.rootDir, "resources", "settings.xml")
+
+        AddonSettings.update_add_on_settings_with_channels(channels, Config)
+        with open(sections_json) as fp:
+            sections = json.load(fp)
+        self.assertEqual({"template", "country", "settings", "selection"}, set(sections.keys()))
+        self.assertIn("config_channel", sections["selection"]["xml"])
+
+        # Nothing changed, so nothing is written
+        os.utime(settings_xml, (0, 0))
+        AddonSettings.update_add_on_settings_with_channels(channels, Config)
+        self.assertEqual(0, os.path.getmtime(settings_xml))
+
+        # Only a changed section is regenerated, but the result is the same
+        sections["selection"]["hash"] = ""
+        with open(sections_json, "w") as fp:
+            json.dump(sections, fp)
+        AddonSettings.update_add_on_settings_with_channels(channels, Config)
+        with open(sections_json) as fp:
+            self.assertEqual(sections["settings"], json.load(fp)["settings"])
+        self.assertEqual(0, os.path.getmtime(settings_xml))
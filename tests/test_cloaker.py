@@ -36,6 +36,17 @@ class TestCloaker(unittest.TestCase):
         if os.path.isfile(self.cloakSettings):
             os.remove(self.cloakSettings)
 
+    def test_store_on_commit(self):
+        self.cloaker.cloak("test-url")
+        self.assertFalse(os.path.isfile(self.cloakSettings))
+
+        self.store.commit()
+        self.assertTrue(os.path.isfile(self.cloakSettings))
+
+        store = localsettings.LocalSettings(".", logger=self.logger)
+        cloaker = Cloaker(channel=self.channel, settings_store=store, logger=self.logger)
+        self.assertTrue(cloaker.is_cloaked("test-url"))
+
     def test_setting_first_time_cloak(self):
         self.assertTrue(self.cloaker.cloak("test-url"))
         self.assertFalse(self.cloaker.cloak("test-url2"))
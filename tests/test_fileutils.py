@@ -0,0 +1,42 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import glob
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from resources.lib.helpers import fileutils
+
+
+class TestFileUtils(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "file.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_unique_temp_paths(self):
+        first = fileutils.get_temp_path(self.path)
+        self.assertTrue(first.startswith(self.path))
+        self.assertNotEqual(first, fileutils.get_temp_path(self.path))
+
+    def test_atomic_write(self):
+        fileutils.atomic_write(self.path, b"old")
+        fileutils.atomic_write(self.path, u"néw")
+        with io.open(self.path, "rb") as fp:
+            self.assertEqual(u"néw".encode("utf-8"), fp.read())
+        self.assertEqual([self.path], glob.glob(os.path.join(self.folder, "*")))
+
+    def test_atomic_open_failure(self):
+        fileutils.atomic_write(self.path, b"old")
+        with self.assertRaises(ValueError):
+            with fileutils.atomic_open(self.path, "w", encoding="utf-8") as fp:
+                fp.write(u"half")
+                raise ValueError()
+
+        with io.open(self.path, "rb") as fp:
+            self.assertEqual(b"old", fp.read())
+        self.assertEqual([self.path], glob.glob(os.path.join(self.folder, "*")))
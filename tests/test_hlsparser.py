@@ -0,0 +1,213 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import io
+import os
+import unittest
+
+from resources.lib.logger import Logger
+from resources.lib.streams.hlsparser import HlsParser
+from tests.benchmark import print_timings
+
+
+class TestHlsParser(unittest.TestCase):
+    master_url = "https://example.com/show/master.m3u8?token=abc"
+    media_url = "https://example.com/live/channel/index.m3u8"
+
+    @classmethod
+    def setUpClass(cls):
+        Logger.create_logger(None, str(cls), min_log_level=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        Logger.instance().close_log()
+
+    def setUp(self):
+        # The M3u8 class needs the logger to be created before it is imported.
+        from resources.lib.streams.m3u8 import M3u8
+        self.m3u8 = M3u8
+
+        self.master = self.__read("test_hlsparser_001_master.m3u8")
+        self.media = self.__read("test_hlsparser_002_media.m3u8")
+
+    def test_master_variants(self):
+        playlist = HlsParser.parse(self.master, self.master_url)
+        self.assertTrue(playlist.is_master)
+        self.assertEqual(6, playlist.version)
+        self.assertEqual(4, len(playlist.variants))
+
+        variant = playlist.variants[0]
+        self.assertEqual("https://example.com/show/video/720/index.m3u8", variant.uri)
+        self.assertEqual(3296000, variant.bandwidth)
+        self.assertEqual(3296, variant.bitrate)
+        self.assertEqual(2800000, variant.average_bandwidth)
+        self.assertEqual((1280, 720), (variant.width, variant.height))
+        self.assertEqual(25.0, variant.frame_rate)
+        self.assertEqual("avc1.64001f,mp4a.40.2", variant.codecs)
+        self.assertEqual("audio-aacl-96", variant.audio)
+        self.assertEqual("subs", variant.subtitles)
+        self.assertEqual("cc", variant.closed_captions)
+        self.assertFalse(variant.is_iframe)
+
+        variant = playlist.variants[3]
+        self.assertEqual(64, variant.bitrate)
+        self.assertIsNone(variant.width)
+        self.assertIsNone(variant.average_bandwidth)
+        self.assertIsNone(variant.frame_rate)
+
+    def test_master_uris(self):
+        playlist = HlsParser.parse(self.master, self.master_url)
+        self.assertEqual([
+            "https://example.com/show/video/720/index.m3u8",
+            "https://example.com/show/video/360/index.m3u8?quality=low",
+            "https://cdn.example.com/video/1080/index.m3u8",
+            "https://example.com/audio-only/index.m3u8"
+        ], [v.uri for v in playlist.variants])
+        self.assertEqual("https://example.com/shared/audio/ec3/index.m3u8",
+                         playlist.get_rendition("AUDIO", "audio-ec3").uri)
+
+    def test_master_renditions(self):
+        playlist = HlsParser.parse(self.master, self.master_url)
+        self.assertEqual(6, len(playlist.renditions))
+
+        audio = playlist.get_renditions("AUDIO", group_id="audio-aacl-96")
+        self.assertEqual(["sv", "en"], [r.language for r in audio])
+        self.assertEqual("English", audio[1].name)
+        self.assertEqual("2", audio[1].channels)
+        self.assertTrue(audio[0].default)
+        self.assertFalse(audio[1].default)
+        self.assertTrue(audio[1].autoselect)
+
+        # The default one is picked
+        self.assertIs(audio[0], playlist.get_rendition("AUDIO", "audio-aacl-96"))
+        self.assertIsNone(playlist.get_rendition("AUDIO", "missing"))
+
+        subtitles = playlist.get_renditions("SUBTITLES", language="da")
+        self.assertEqual(1, len(subtitles))
+        self.assertEqual("https://example.com/show/subs/da/index.m3u8?null=", subtitles[0].uri)
+        self.assertFalse(subtitles[0].forced)
+
+        captions = playlist.get_renditions("CLOSED-CAPTIONS")
+        self.assertIsNone(captions[0].uri)
+        self.assertEqual("CC1", captions[0].attributes["INSTREAM-ID"])
+
+    def test_master_iframes_and_session_keys(self):
+        playlist = HlsParser.parse(self.master, self.master_url)
+        self.assertEqual(1, len(playlist.iframe_variants))
+        iframes = playlist.iframe_variants[0]
+        self.assertTrue(iframes.is_iframe)
+        self.assertEqual("https://example.com/show/video/720/iframes.m3u8", iframes.uri)
+        self.assertEqual(300, iframes.bitrate)
+
+        self.assertEqual(1, len(playlist.session_keys))
+        key = playlist.session_keys[0]
+        self.assertEqual("SAMPLE-AES", key.method)
+        self.assertEqual("skd://key-id", key.uri)
+        self.assertEqual("com.apple.streamingkeydelivery", key.key_format)
+        self.assertEqual("1", key.key_format_versions)
+
+    def test_media_playlist(self):
+        playlist = HlsParser.parse(self.media, self.media_url)
+        self.assertFalse(playlist.is_master)
+        self.assertTrue(playlist.is_live)
+        self.assertEqual(6, playlist.target_duration)
+        self.assertEqual(1200, playlist.media_sequence)
+
+        self.assertEqual([
+            "https://example.com/live/channel/segment-1200.ts",
+            "https://example.com/live/channel/segment-1201.ts",
+            "https://example.com/live/segment-1202.ts?token=abc"
+        ], [s.uri for s in playlist.segments])
+        self.assertEqual([1200, 1201, 1202], [s.sequence for s in playlist.segments])
+        self.assertEqual([6.0, 6.0, 5.5], [s.duration for s in playlist.segments])
+        self.assertEqual("Second segment", playlist.segments[1].title)
+        self.assertIsNone(playlist.segments[0].title)
+
+        # The key applies until the next key tag
+        key = playlist.segments[0].key
+        self.assertEqual("AES-128", key.method)
+        self.assertEqual("https://keys.example.com/key?id=1", key.uri)
+        self.assertEqual("0x00000000000000000000000000000001", key.iv)
+        self.assertIs(key, playlist.segments[1].key)
+        self.assertIsNone(playlist.segments[2].key)
+        self.assertEqual([key], playlist.keys)
+
+    def test_media_playlist_vod(self):
+        playlist = HlsParser.parse(self.media + "#EXT-X-ENDLIST\n", self.media_url)
+        self.assertFalse(playlist.is_live)
+
+        playlist = HlsParser.parse("#EXTM3U\r\n#EXT-X-PLAYLIST-TYPE:VOD\r\n#EXTINF:10,\r\na.ts\r\n")
+        self.assertFalse(playlist.is_live)
+        self.assertEqual("a.ts", playlist.segments[0].uri)
+
+    def test_resolve(self):
+        parser = HlsParser("https://example.com/a/b/index.m3u8?token=1")
+        self.assertEqual("https://example.com/a/b/c.m3u8", parser.resolve("c.m3u8"))
+        self.assertEqual("https://example.com/a/c.m3u8", parser.resolve("../c.m3u8"))
+        self.assertEqual("https://example.com/a/b/c.m3u8", parser.resolve("./c.m3u8"))
+        self.assertEqual("https://example.com/c.m3u8", parser.resolve("/c.m3u8"))
+        self.assertEqual("https://cdn.example.com/c.m3u8", parser.resolve("//cdn.example.com/c.m3u8"))
+        self.assertEqual("http://other.com/c.m3u8", parser.resolve("http://other.com/c.m3u8"))
+        self.assertEqual("c.m3u8", HlsParser().resolve("c.m3u8"))
+
+    def test_m3u8_streams(self):
+        streams = self.m3u8.get_streams_from_m3u8(self.master_url, play_list_data=self.master)
+        self.assertEqual([
+            ("https://example.com/show/video/720/index.m3u8", 3296),
+            ("https://example.com/show/video/360/index.m3u8?quality=low", 1296),
+            ("https://cdn.example.com/video/1080/index.m3u8", 6500),
+            ("https://example.com/audio-only/index.m3u8", 64)
+        ], streams)
+
+    def test_m3u8_streams_with_audio(self):
+        streams = self.m3u8.get_streams_from_m3u8(
+            self.master_url, play_list_data=self.master, map_audio=True, append_query_string=True)
+        self.assertEqual(4, len(streams))
+        self.assertEqual(("https://example.com/show/video/360/index.m3u8?quality=low&token=abc", 1296,
+                          "https://example.com/show/audio/sv/index.m3u8?token=abc"), streams[1])
+        self.assertEqual(("https://cdn.example.com/video/1080/index.m3u8?token=abc", 6500,
+                          "https://example.com/shared/audio/ec3/index.m3u8?token=abc"), streams[2])
+
+    def test_m3u8_subtitle(self):
+        self.assertEqual("https://example.com/show/subs/da/index.m3u8?token=abc",
+                         self.m3u8.get_subtitle(self.master_url, self.master))
+        self.assertEqual("https://example.com/show/subs/sv/index.m3u8?token=abc",
+                         self.m3u8.get_subtitle(self.master_url, self.master, language="sv"))
+        self.assertEqual("https://example.com/show/subs/da/index.m3u8?null=",
+                         self.m3u8.get_subtitle(self.master_url, self.master, append_query_string=False))
+        self.assertEqual("", self.m3u8.get_subtitle(self.master_url, self.master, language="fi"))
+
+    @unittest.skipUnless(os.environ.get("RETRO_BENCHMARK"), "Set RETRO_BENCHMARK=1 to run benchmarks")
+    def test_benchmark_large_playlists(self):
+        # A live master playlist with many audio languages and variants.
+        lines = ["#EXTM3U", "#EXT-X-VERSION:6"]
+        for group in range(4):
+            for language in range(40):
+                lines.append('#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="audio-{0}",LANGUAGE="l{1}",NAME="Language {1}",'
+                             'DEFAULT={2},AUTOSELECT=YES,CHANNELS="2",URI="audio/{0}/{1}/index.m3u8"'
+                             .format(group, language, "YES" if language == 0 else "NO"))
+        for variant in range(40):
+            lines.append('#EXT-X-STREAM-INF:BANDWIDTH={0},AVERAGE-BANDWIDTH={1},RESOLUTION=1280x720,'
+                         'FRAME-RATE=25.000,CODECS="avc1.64001f,mp4a.40.2",AUDIO="audio-{2}"'
+                         .format(300000 + variant * 150000, 250000 + variant * 150000, variant % 4))
+            lines.append("video/{0}/index.m3u8".format(variant))
+        master = "\n".join(lines)
+
+        # A live media playlist with a large DVR window.
+        lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:2", "#EXT-X-MEDIA-SEQUENCE:100000"]
+        for segment in range(10800):
+            lines.append("#EXTINF:2.000,")
+            lines.append("segment-{0}.ts".format(100000 + segment))
+        media = "\n".join(lines)
+
+        print_timings("HLS parser ({0} bytes master, {1} bytes media)".format(len(master), len(media)), [
+            ("parse master", lambda: HlsParser.parse(master, self.master_url)),
+            ("streams", lambda: self.m3u8.get_streams_from_m3u8(self.master_url, play_list_data=master)),
+            ("streams+audio", lambda: self.m3u8.get_streams_from_m3u8(
+                self.master_url, play_list_data=master, map_audio=True)),
+            ("subtitle", lambda: self.m3u8.get_subtitle(self.master_url, master)),
+            ("parse media", lambda: HlsParser.parse(media, self.media_url))
+        ])
+
+    def __read(self, name):
+        with io.open(os.path.join(os.path.dirname(__file__), "data", name), "r", encoding="utf-8") as fp:
+            return fp.read()
@@ -0,0 +1,37 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import io
+import os
+import unittest
+
+from resources.lib.logger import Logger
+from resources.lib.helpers.htmlhelper import HtmlHelper
+
+
+class TestHtmlHelper(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        Logger.create_logger(None, str(cls), min_log_level=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        Logger.instance().close_log()
+
+    def setUp(self):
+        with io.open(os.path.join(os.path.dirname(__file__), "data", "test_htmlhelper_001_page.html"),
+                     "r", encoding="utf-8") as fp:
+            self.page = fp.read()
+
+    def test_get_tag_attribute(self):
+        html = HtmlHelper(self.page)
+        self.assertEqual("Het Journaal", html.get_tag_attribute("meta", {"property": "og:title"}, {"content": None}))
+        self.assertEqual("vid-123456", html.get_tag_attribute("div", {"cls": "player"}, {"data-video-id": None}))
+        self.assertEqual(["ep-1", "ep-2", "ep-4", "ep-5"],
+                         html.get_tag_attribute("li", {"cls": "episode"}, {"data-id": None}, firstOnly=False))
+        self.assertEqual("", html.get_tag_attribute("img", {"cls": "missing"}, {"src": None}))
+
+    def test_get_tag_content(self):
+        html = HtmlHelper(self.page)
+        self.assertEqual("Het Journaal", html.get_tag_content("h1", {"cls": "hero__title"}))
+        self.assertEqual(["Aflevering 1", "Aflevering 2", "Aflevering 3", "Aflevering 4", "Aflevering 5"],
+                         html.get_tag_content("span", {"cls": "episode__title"}, first_only=False))
@@ -0,0 +1,70 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import subprocess
+import sys
+import unittest
+
+# The modules that are imported when the plugin starts (see retroaddon.py and addon.run_addon).
+STARTUP_IMPORTS = "from resources.lib import addon; " \
+                  "from resources.lib.retroconfig import Config; " \
+                  "from resources.lib.logger import Logger; " \
+                  "Logger.create_logger(None, Config.appName); " \
+                  "from resources.lib.urihandler import UriHandler; " \
+                  "from resources.lib.addonsettings import AddonSettings; " \
+                  "from resources.lib.textures import TextureHandler; " \
+                  "from resources.lib import plugin"
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "-X importtime requires Python 3.7+")
+class TestImportTime(unittest.TestCase):
+    def test_config_without_dom(self):
+        # The first import could create the precomputed add-on info, the second one uses it.
+        self.__get_import_times("from resources.lib.retroconfig import Config")
+        import_times = self.__get_import_times("from resources.lib.retroconfig import Config")
+
+        self.assertIn("resources.lib.retroconfig", import_times)
+        self.assertNotIn("xml.dom.minidom", import_times)
+
+    def test_startup_imports(self):
+        self.__get_import_times("from resources.lib.retroconfig import Config")
+        import_times = self.__get_import_times(STARTUP_IMPORTS)
+        self.assertIn("resources.lib.plugin", import_times)
+        self.assertNotIn("xml.dom.minidom", import_times)
+
+    @unittest.skipUnless(os.environ.get("RETRO_BENCHMARK"), "Set RETRO_BENCHMARK=1 to run benchmarks")
+    def test_benchmark(self):
+        import_times = self.__get_import_times(STARTUP_IMPORTS)
+        slowest = sorted(import_times.items(), key=lambda i: i[1][1], reverse=True)
+
+        print("\nSlowest imports during the plugin start-up (cumulative):")
+        for module, (own, cumulative) in slowest[:20]:
+            print("{:>8.2f} ms {:>8.2f} ms  {}".format(cumulative / 1000.0, own / 1000.0, module))
+
+    def __get_import_times(self, code):
+        """ Runs the code in a new Python process with `-X importtime` and parses the results.
+
+        :param str code:    The code to profile.
+
+        :return: The own and cumulative import time in microseconds per imported module.
+        :rtype: dict[str,tuple[int,int]]
+
+        """
+
+        process = subprocess.Popen([sys.executable, "-X", "importtime", "-c", code],
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        _, err = process.communicate()
+        self.assertEqual(0, process.returncode, err.decode("utf-8", "replace"))
+
+        import_times = {}
+        for line in err.decode("utf-8", "replace").splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+
+            own, cumulative, module = line[len("import time:"):].split("|")
+            if not own.strip().isdigit():
+                # the header
+                continue
+            import_times[module.strip()] = (int(own), int(cumulative))
+        return import_times
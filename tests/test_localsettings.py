@@ -1,3 +1,6 @@
+import glob
+import io
+import json
 import os
 import unittest
 
@@ -19,6 +22,7 @@ class TestLocalSettings(unittest.TestCase):
     def test_creation_on_missing(self):
         store = LocalSettings(Config.profileDir, Logger.instance())
         store.set_setting("test", True)
+        store.commit()
         self.assertTrue(os.path.isfile(store.local_settings_file))
 
     def test_store_value(self):
@@ -31,3 +35,40 @@ class TestLocalSettings(unittest.TestCase):
         store = LocalSettings(Config.profileDir, Logger.instance())
         result = store.get_setting(setting_to_store)
         self.assertEqual(value_to_store, result)
+
+    def test_store_on_commit_only(self):
+        store = LocalSettings(Config.profileDir, Logger.instance())
+        store.set_setting("test", True)
+        store.set_setting("test2", "value")
+        self.assertFalse(os.path.isfile(store.local_settings_file))
+
+        self.assertTrue(store.commit())
+        self.assertEqual([store.local_settings_file], glob.glob("{0}*".format(store.local_settings_file)))
+        with io.open(store.local_settings_file, mode="rb") as fp:
+            content = fp.read()
+
+        # compact JSON
+        self.assertNotIn(b"\n", content)
+        self.assertEqual({"test": True, "test2": "value"}, json.loads(content.decode())["settings"])
+
+    def test_commit_without_changes(self):
+        store = LocalSettings(Config.profileDir, Logger.instance())
+        self.assertFalse(store.commit())
+        self.assertFalse(os.path.isfile(store.local_settings_file))
+
+        store.set_setting("test", True)
+        self.assertTrue(store.commit())
+        os.utime(store.local_settings_file, (0, 0))
+
+        # setting the same value does not touch the file
+        store.set_setting("test", True)
+        self.assertFalse(store.commit())
+        self.assertEqual(0, os.path.getmtime(store.local_settings_file))
+
+    def test_store_on_delete(self):
+        store = LocalSettings(Config.profileDir, Logger.instance())
+        store.set_setting("test", True)
+        del store
+
+        store = LocalSettings(Config.profileDir, Logger.instance())
+        self.assertTrue(store.get_setting("test"))
@@ -7,6 +7,7 @@ import os
 import io
 
 from resources.lib.logger import Logger
+from tests.benchmark import print_timings
 
 
 class TestLogger(unittest.TestCase):
@@ -135,3 +136,71 @@ class TestLogger(unittest.TestCase):
             content = fp.readlines()
             lines = len(content)
             self.assertEqual(6, lines)
+
+    def test_is_enabled_for(self):
+        self.assertFalse(Logger.is_enabled_for(Logger.LVL_CRITICAL))
+        self.__logger = Logger.create_logger(self.output_log_file, "UnitTest",
+                                             min_log_level=Logger.LVL_INFO)
+        self.assertFalse(Logger.is_enabled_for(Logger.LVL_DEBUG))
+        self.assertTrue(Logger.is_enabled_for(Logger.LVL_INFO))
+        self.assertTrue(Logger.is_enabled_for(Logger.LVL_ERROR))
+
+    def test_caller(self):
+        self.__logger = Logger.create_logger(self.output_log_file, "UnitTest")
+        for _ in range(2):
+            Logger.info("Caller")
+
+        Logger.instance().close_log()
+        with io.open(self.output_log_file, 'r') as fp:
+            lines = fp.readlines()
+            self.assertIn("test_logger.py", lines[0])
+            self.assertEqual(lines[0].split(" - ")[2:], lines[1].split(" - ")[2:])
+
+    def test_logger_background(self):
+        self.__logger = Logger.create_logger(self.output_log_file, "UnitTest",
+                                             min_log_level=Logger.LVL_TRACE, background=True)
+        for i in range(100):
+            Logger.debug("Line %s", i)
+        Logger.error("Multi\nline")
+
+        Logger.instance().flush()
+        with io.open(self.output_log_file, 'r') as fp:
+            self.assertEqual(102, len(fp.readlines()))
+
+        Logger.info("Last line")
+        Logger.instance().close_log()
+        with io.open(self.output_log_file, 'r') as fp:
+            lines = fp.readlines()
+            self.assertEqual(104, len(lines))
+            self.assertTrue(lines[0].rstrip().endswith("Line 0"))
+            self.assertTrue(lines[102].rstrip().endswith("Last line"))
+            self.assertTrue(lines[103].rstrip().endswith("Flushing and closing logfile."))
+
+    def test_logger_background_counts_entries(self):
+        self.__logger = Logger.create_logger(self.output_log_file, "UnitTest",
+                                             min_log_level=Logger.LVL_TRACE, background=True)
+        logger = Logger.instance()
+        logger.logEntryCount = 0
+        for i in range(logger.flushInterval - 1):
+            Logger.debug("Line %s", i)
+        self.assertEqual(logger.flushInterval - 1, logger.logEntryCount)
+
+        Logger.debug("Last line")
+        self.assertEqual(0, logger.logEntryCount)
+
+    @unittest.skipUnless(os.environ.get("RETRO_BENCHMARK"), "Set RETRO_BENCHMARK=1 to run benchmarks")
+    def test_benchmark(self):
+        records = 20000
+
+        def log(min_log_level, background):
+            self.__logger = Logger.create_logger(self.output_log_file, "UnitTest",
+                                                 min_log_level=min_log_level, background=background)
+            for i in range(records):
+                Logger.debug("Processing item %s of %s: %s", i, records, "https://example.com/")
+            Logger.instance().close_log()
+
+        print_timings("Logging {} DEBUG records".format(records), [
+            ("level DEBUG", lambda: log(Logger.LVL_DEBUG, False)),
+            ("DEBUG in background", lambda: log(Logger.LVL_DEBUG, True)),
+            ("level INFO", lambda: log(Logger.LVL_INFO, False))
+        ], iterations=3)
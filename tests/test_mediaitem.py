@@ -0,0 +1,214 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import unittest
+
+from resources.lib.backtothefuture import PY2
+if PY2:
+    # noinspection PyPep8Naming,PyUnresolvedReferences
+    import cPickle as pickle
+else:
+    import pickle
+
+from resources.lib.logger import Logger
+from tests.benchmark import print_timings
+
+
+class _LegacyItem(object):
+    def __init__(self, item):
+        """ Pickles like a MediaItem (or MediaStream) did before it had a compact state.
+
+        :param any item:    The item to copy.
+
+        """
+
+        self.__dict__.update(item.__dict__)
+        if "streams" in self.__dict__:
+            self.streams = [_LegacyItem(stream) for stream in self.streams]
+
+
+class TestMediaItem(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        Logger.create_logger(None, str(cls), min_log_level=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        Logger.instance().close_log()
+
+    def test_all_attributes_have_defaults(self):
+        from resources.lib.mediaitem import MediaItem, MediaStream
+
+        # New attributes should be added to the state fields, so they get a default when loading.
+        item = MediaItem("Item", "https://example.com/")
+        _ = item.guid
+        fields = getattr(MediaItem, "_MediaItem__state_schema").names
+        self.assertEqual(sorted(item.__dict__.keys()), sorted(fields))
+
+        stream = MediaStream("https://example.com/stream.m3u8")
+        fields = getattr(MediaStream, "_MediaStream__state_schema").names
+        self.assertEqual(sorted(stream.__dict__.keys()), sorted(fields))
+
+    def test_pickle_and_de_pickle(self):
+        item = self.__create_item(1)
+        result = pickle.loads(pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL))
+        self.__assert_same(item, result)
+
+    def test_pickle_defaults(self):
+        from resources.lib.mediaitem import MediaItem
+
+        item = MediaItem("Item", "https://example.com/")
+        result = pickle.loads(pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL))
+        self.__assert_same(item, result)
+
+        # The mutable defaults should not be shared.
+        result.metaData["id"] = 1
+        self.assertEqual({}, MediaItem("Other", "https://example.com/").metaData)
+
+    def test_pickle_folder_item(self):
+        from resources.lib.mediaitem import FolderItem
+        from resources.lib import contenttype
+
+        item = FolderItem("Folder", "https://example.com/", content_type=contenttype.VIDEOS)
+        item.items.append(self.__create_item(2))
+        result = pickle.loads(pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL))
+        self.assertIsInstance(result, FolderItem)
+        self.assertEqual(contenttype.VIDEOS, result.content_type)
+        self.__assert_same(item.items[0], result.items[0])
+
+    def test_pickle_live_item_keeps_guid(self):
+        from resources.lib.mediaitem import MediaItem
+
+        item = MediaItem("Live", "https://example.com/live")
+        item.isLive = True
+        guid = item.guid
+        result = pickle.loads(pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(guid, result.guid)
+
+    def test_pickle_unknown_attribute(self):
+        from resources.lib.mediaitem import MediaItem
+
+        item = MediaItem("Item", "https://example.com/")
+        item.customValue = "value"
+        result = pickle.loads(pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL))
+        self.assertEqual("value", result.customValue)
+
+    def test_de_pickle_legacy_state(self):
+        from resources.lib.mediaitem import MediaItem, MediaStream
+        from resources.lib import mediatype
+
+        item = self.__create_item(3)
+        result = MediaItem.__new__(MediaItem)
+        state = dict(item.__dict__)
+        del state["metaData"]
+        result.__setstate__(state)
+        self.__assert_same(item, result, skip=["metaData"])
+        self.assertEqual({}, result.metaData)
+
+        state["type"] = "video"
+        del state["media_type"]
+        result.__setstate__(state)
+        self.assertEqual(mediatype.VIDEO, result.media_type)
+
+        stream = MediaStream.__new__(MediaStream)
+        stream.__setstate__({"Url": "https://example.com/stream.m3u8", "Bitrate": 100})
+        self.assertEqual("https://example.com/stream.m3u8", stream.Url)
+        self.assertEqual([], stream.Properties)
+        self.assertEqual({}, stream.HttpHeaders)
+
+    def test_de_pickle_version_2_state(self):
+        from resources.lib.mediaitem import MediaItem, MediaStream
+
+        # Version 2 only stored the non-default values by their index in the schema.
+        item = self.__create_item(5)
+        names = getattr(MediaItem, "_MediaItem__state_schema").names
+        stream_state = (2, {0: item.streams[0].Url, 1: item.streams[0].Bitrate})
+        stream = MediaStream.__new__(MediaStream)
+        stream.__setstate__(stream_state)
+        item.streams = [stream]
+
+        state = dict((names.index(name), value) for name, value in item.__dict__.items()
+                     if name != "metaData")
+        result = MediaItem.__new__(MediaItem)
+        result.__setstate__((2, state))
+        self.__assert_same(item, result, skip=["metaData"])
+        self.assertEqual({}, result.metaData)
+
+    def test_pickle_removed_attribute(self):
+        from resources.lib.mediaitem import MediaItem
+
+        item = MediaItem("Item", "https://example.com/")
+        del item.metaData
+        result = pickle.loads(pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL))
+        self.assertEqual({}, result.metaData)
+
+    def test_pickle_is_smaller(self):
+        item = self.__create_item(4)
+        legacy = pickle.dumps(item.__dict__, protocol=pickle.HIGHEST_PROTOCOL)
+        compact = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+        self.assertLess(len(compact), len(legacy))
+
+    @unittest.skipUnless(os.environ.get("RETRO_BENCHMARK"), "Set RETRO_BENCHMARK=1 to run benchmarks")
+    def test_benchmark_pickle(self):
+        from resources.lib.mediaitem import MediaItem
+
+        items = [self.__create_item(i) for i in range(500)]
+        for item in items:
+            _ = item.guid
+
+        def load_legacy(data):
+            # What the previous __setstate__ did for each item.
+            result = []
+            for item_data in data:
+                state = pickle.loads(item_data).__dict__
+                m = MediaItem(state["name"], state["url"], media_type=state["media_type"])
+                m.__dict__.update(state)
+                result.append(m)
+            return result
+
+        def dump(to_pickle):
+            return [pickle.dumps(i, protocol=pickle.HIGHEST_PROTOCOL) for i in to_pickle]
+
+        def describe(data):
+            return lambda: "{} bytes".format(sum(len(d) for d in data))
+
+        # The PickleStore pickles each item on its own.
+        legacy_items = [_LegacyItem(item) for item in items]
+        legacy_data = dump(legacy_items)
+        compact_data = dump(items)
+        print_timings("Pickling {} MediaItems".format(len(items)), [
+            ("legacy dump", lambda: dump(legacy_items), describe(legacy_data)),
+            ("compact dump", lambda: dump(items), describe(compact_data)),
+            ("legacy load", lambda: load_legacy(legacy_data)),
+            ("compact load", lambda: [pickle.loads(d) for d in compact_data])
+        ])
+
+    def __assert_same(self, item, result, skip=None):
+        skip = skip or []
+        self.assertEqual(item.guid, result.guid)
+        for name, value in item.__dict__.items():
+            if name in skip:
+                continue
+            if name == "streams":
+                self.assertEqual([s.__dict__ for s in value], [s.__dict__ for s in result.streams])
+                continue
+            self.assertEqual(value, result.__dict__[name], name)
+
+    def __create_item(self, i):
+        from resources.lib.mediaitem import MediaItem
+        from resources.lib import mediatype
+
+        item = MediaItem("Episode {}".format(i), "https://example.com/episodes/{}".format(i),
+                         media_type=mediatype.EPISODE)
+        item.description = "A description of episode {}.".format(i)
+        item.set_artwork(thumb="https://images.example.com/{}/thumb.jpg".format(i),
+                         fanart="https://images.example.com/{}/fanart.jpg".format(i))
+        item.set_date(2020, 1 + i % 12, 1 + i % 28, 20, 30, 0)
+        item.set_season_info(1, i, "A show")
+        item.set_info_label("duration", 1800 + i)
+        item.isGeoLocked = True
+        item.metaData["id"] = i
+        stream = item.add_stream("https://example.com/{}/stream.m3u8".format(i), 1500)
+        stream.add_property("inputstream", "inputstream.adaptive")
+        stream.HttpHeaders["Referer"] = "https://example.com/"
+        return item
@@ -0,0 +1,183 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import io
+import os
+import unittest
+
+from resources.lib.logger import Logger
+from resources.lib.streams.mpdparser import MpdParser
+from tests.benchmark import print_timings, print_peak_memory
+
+
+class TestMpdParser(unittest.TestCase):
+    vod_url = "https://example.com/show/episode/manifest.mpd?token=abc"
+    live_url = "https://live.example.com/channel/manifest.mpd"
+
+    @classmethod
+    def setUpClass(cls):
+        Logger.create_logger(None, str(cls), min_log_level=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        Logger.instance().close_log()
+
+    def setUp(self):
+        self.vod = self.__read("test_mpdparser_001_vod.mpd")
+        self.live = self.__read("test_mpdparser_002_live.mpd")
+
+    def test_vod_manifest(self):
+        manifest = MpdParser.parse(self.vod, self.vod_url)
+        self.assertFalse(manifest.is_live)
+        self.assertEqual(3723.5, manifest.media_presentation_duration)
+        self.assertEqual(1, len(manifest.periods))
+        self.assertEqual("p0", manifest.periods[0].id)
+        self.assertEqual(0, manifest.periods[0].start)
+        self.assertEqual(4, len(manifest.get_adaptation_sets()))
+        self.assertEqual(["video", "audio", "text", "text"],
+                         [a.content_type for a in manifest.get_adaptation_sets()])
+
+    def test_vod_representations(self):
+        manifest = MpdParser.parse(self.vod, self.vod_url)
+        videos = manifest.get_representations("video")
+        self.assertEqual(["video=400000", "video=1200000", "video=3000000"], [r.id for r in videos])
+        self.assertEqual([400, 1200, 3000], [r.bitrate for r in videos])
+        self.assertEqual((960, 540), (videos[1].width, videos[1].height))
+        self.assertEqual("25", videos[0].frame_rate)
+
+        # Codecs and mime types are inherited from the AdaptationSet
+        self.assertEqual("avc1.64001f", videos[0].codecs)
+        self.assertEqual("avc1.4d401f", videos[1].codecs)
+        self.assertEqual("video/mp4", videos[2].mime_type)
+
+        self.assertEqual([400, 1200, 3000], manifest.get_bitrates())
+        self.assertEqual([128], manifest.get_bitrates("audio"))
+        self.assertEqual("nl", manifest.get_adaptation_sets("audio")[0].lang)
+
+    def test_vod_base_urls(self):
+        manifest = MpdParser.parse(self.vod, self.vod_url)
+        self.assertEqual("https://example.com/show/episode/dash/", manifest.base_url)
+
+        videos = manifest.get_representations("video")
+        self.assertEqual("https://example.com/show/episode/dash/", videos[0].base_url)
+        self.assertEqual([], videos[0].base_urls)
+        self.assertEqual("https://cdn.example.com/hd/", videos[2].base_url)
+
+        subtitles = manifest.get_representations("text")
+        self.assertEqual("https://example.com/show/episode/subtitles/nl.vtt", subtitles[0].base_url)
+        self.assertEqual("https://example.com/show/episode/dash/", subtitles[1].base_url)
+
+    def test_vod_content_protection(self):
+        manifest = MpdParser.parse(self.vod, self.vod_url)
+        self.assertEqual(["0d3f5ebc-1c17-4a44-b1a2-9f2d3c4e5a6b", "1a2b3c4d-1c17-4a44-b1a2-9f2d3c4e5a6b"],
+                         manifest.get_default_kids())
+        self.assertEqual("https://license.example.com/widevine?id=1", manifest.get_license_url())
+        self.assertTrue(manifest.get_pssh("widevine").startswith("AAAAW3Bzc2gAAAAA"))
+        self.assertIsNone(manifest.get_pssh("playready"))
+
+        protections = manifest.get_adaptation_sets("video")[0].content_protections
+        self.assertEqual(["mp4protection", "widevine", "playready"], [p.system for p in protections])
+        self.assertEqual("cenc", protections[0].value)
+        self.assertEqual("MSPR 2.0", protections[2].value)
+        self.assertEqual(1, len(manifest.get_content_protections("widevine")))
+
+    def test_live_manifest(self):
+        with io.open(self.__get_path("test_mpdparser_002_live.mpd"), "rb") as fp:
+            manifest = MpdParser.parse(fp, self.live_url)
+
+        self.assertTrue(manifest.is_live)
+        self.assertEqual(6, manifest.minimum_update_period)
+        self.assertEqual(["period-0", "period-1", "period-2"], [p.id for p in manifest.periods])
+        self.assertEqual([0, 600, 1200], [p.start for p in manifest.periods])
+        self.assertEqual([800, 2500, 5000], manifest.get_bitrates())
+        self.assertEqual(9, len(manifest.get_representations()))
+        self.assertEqual("https://live2.example.com/channel/", manifest.get_representations()[-1].base_url)
+        self.assertEqual(3, len(manifest.get_default_kids()))
+
+    def test_parse_text_and_bytes(self):
+        for data in (self.live, self.live.encode("utf-8")):
+            manifest = MpdParser.parse(data, self.live_url)
+            self.assertEqual(3, len(manifest.periods))
+
+    def test_get_duration(self):
+        self.assertEqual(3723.5, MpdParser.get_duration("PT1H2M3.5S"))
+        self.assertEqual(86400 + 60, MpdParser.get_duration("P1DT1M"))
+        self.assertEqual(0, MpdParser.get_duration("PT0S"))
+        self.assertIsNone(MpdParser.get_duration(None))
+        self.assertIsNone(MpdParser.get_duration("PT"))
+        self.assertIsNone(MpdParser.get_duration("1 hour"))
+
+    def test_max_bitrate(self):
+        from resources.lib.mediaitem import MediaStream
+        from resources.lib.streams.adaptive import Adaptive
+
+        def get_max_bandwidth(max_bit_rate, bitrates):
+            stream = MediaStream(self.vod_url)
+            stream.Adaptive = True
+            stream.Bitrates = bitrates
+            Adaptive.set_max_bitrate(stream, max_bit_rate)
+            return dict(stream.Properties).get("inputstream.adaptive.max_bandwidth")
+
+        bitrates = MpdParser.parse(self.vod, self.vod_url).get_bitrates()
+        self.assertEqual("1500000", get_max_bandwidth(1500, bitrates))
+        self.assertEqual("401000", get_max_bandwidth(200, bitrates))
+        self.assertIsNone(get_max_bandwidth(3000, bitrates))
+        self.assertEqual("3000000", get_max_bandwidth(3000, []))
+
+    def test_matching_stream(self):
+        from resources.lib.mediaitem import MediaItem
+
+        item = MediaItem("Episode", self.vod_url)
+        hls = item.add_stream("https://example.com/index.m3u8", 1000)
+        mpd = item.add_stream(self.vod_url, 1)
+        mpd.Bitrates = MpdParser.parse(self.vod, self.vod_url).get_bitrates()
+
+        # The MPD will play its 1200 kbps representation, which is closest.
+        self.assertIs(mpd, item._MediaItem__get_matching_stream(1500))
+        self.assertIs(hls, item._MediaItem__get_matching_stream(1100))
+        self.assertIs(hls, item._MediaItem__get_matching_stream(0))
+
+    @unittest.skipUnless(os.environ.get("RETRO_BENCHMARK"), "Set RETRO_BENCHMARK=1 to run benchmarks")
+    def test_benchmark_large_live_manifest(self):
+        import re
+
+        # A multi-period live manifest with long SegmentTimelines.
+        lines = ['<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" xmlns:cenc="urn:mpeg:cenc:2013" type="dynamic">']
+        for period in range(50):
+            lines.append('<Period id="{0}"><BaseURL>p{0}/</BaseURL>'.format(period))
+            for content_type, bandwidths in (("video", range(400000, 8000000, 800000)), ("audio", (96000, 128000))):
+                lines.append('<AdaptationSet contentType="{0}" mimeType="{0}/mp4">'.format(content_type))
+                lines.append('<ContentProtection schemeIdUri="urn:mpeg:dash:mp4protection:2011" value="cenc" '
+                             'cenc:default_KID="00000000-0000-0000-0000-{0:012d}"/>'.format(period))
+                lines.append('<SegmentTemplate timescale="90000" media="$Time$.m4s"><SegmentTimeline>')
+                lines.extend('<S t="{0}" d="180000"/>'.format(s * 180000) for s in range(300))
+                lines.append('</SegmentTimeline></SegmentTemplate>')
+                lines.extend('<Representation id="{0}" bandwidth="{0}"/>'.format(b) for b in bandwidths)
+                lines.append('</AdaptationSet>')
+            lines.append('</Period>')
+        lines.append('</MPD>')
+        data = "\n".join(lines)
+
+        def regex_scan():
+            # What the channels used to do: a scan per property.
+            re.findall(r'bandwidth="(\d+)"', data)
+            re.findall(r'cenc:default_KID="([^"]+)"', data)
+            re.findall(r'<BaseURL>([^<]+)</BaseURL>', data)
+
+        print_timings("MPD parser ({0} bytes)".format(len(data)), [
+            ("parse", lambda: MpdParser.parse(data, self.live_url)),
+            ("parse+inspect", lambda: MpdParser.parse(data, self.live_url).get_default_kids()),
+            ("regex scans", regex_scan)
+        ])
+
+        import xml.etree.ElementTree as ElementTree
+        print_peak_memory("MPD parser ({0} bytes)".format(len(data)), [
+            ("parse", lambda: MpdParser.parse(data, self.live_url)),
+            ("full tree", lambda: ElementTree.fromstring(data))
+        ])
+
+    def __get_path(self, name):
+        return os.path.join(os.path.dirname(__file__), "data", name)
+
+    def __read(self, name):
+        with io.open(self.__get_path(name), "r", encoding="utf-8") as fp:
+            return fp.read()
@@ -0,0 +1,84 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import random
+import unittest
+
+from resources.lib.parserdata import ParserData, ParserDataIndex
+
+
+class TestParserData(unittest.TestCase):
+    def test_match_types(self):
+        self.assertTrue(self.__create("https://a.com/", ParserData.MatchStart).matches("https://a.com/x"))
+        self.assertTrue(self.__create("/x", ParserData.MatchEnd).matches("https://a.com/x"))
+        self.assertTrue(self.__create("a.com", ParserData.MatchContains).matches("https://a.com/x"))
+        self.assertTrue(self.__create("https://a.com/x", ParserData.MatchExact).matches("https://a.com/x"))
+        self.assertFalse(self.__create("https://a.com/", ParserData.MatchExact).matches("https://a.com/x"))
+        self.assertTrue(self.__create(r"https://A\.com/\w+$", ParserData.MatchRegex).matches("https://a.com/x"))
+        self.assertFalse(self.__create(r"https://a\.com/\d+$", ParserData.MatchRegex).matches("https://a.com/x"))
+
+    def test_index_longest_key_wins(self):
+        data_parsers = {}
+        short = self.__add(data_parsers, "https://a.com/", ParserData.MatchStart)
+        long = self.__add(data_parsers, "https://a.com/videos", ParserData.MatchStart)
+        index = ParserDataIndex(data_parsers)
+
+        self.assertEqual([long], index.get_data_parsers("https://a.com/videos/1"))
+        self.assertEqual([short], index.get_data_parsers("https://a.com/programs"))
+        self.assertEqual([], index.get_data_parsers("https://b.com/"))
+
+    def test_index_keeps_order(self):
+        data_parsers = {}
+        first = self.__add(data_parsers, "https://a.com/", ParserData.MatchStart, name="first")
+        second = self.__add(data_parsers, "https://a.com/", ParserData.MatchStart, name="second")
+        third = self.__add(data_parsers, "https://a.com/", ParserData.MatchStart, name="third")
+        index = ParserDataIndex(data_parsers)
+
+        self.assertEqual([first, second, third], index.get_data_parsers("https://a.com/x"))
+
+    def test_index_key_with_different_match(self):
+        # The key is used for ranking, the match of the ParserData for matching.
+        data_parsers = {}
+        end = self.__add(data_parsers, "https://a.com/very/long/key", ParserData.MatchEnd, match=".json")
+        start = self.__add(data_parsers, "https://a.com/", ParserData.MatchStart)
+        index = ParserDataIndex(data_parsers)
+
+        self.assertEqual([end], index.get_data_parsers("https://a.com/list.json"))
+        self.assertEqual([start], index.get_data_parsers("https://a.com/list.xml"))
+
+    def test_index_same_as_linear(self):
+        rnd = random.Random(42)
+        parts = ["https://", "a.com", "b.com", "/", "api", "videos", "?page=", "1", ".json", "x"]
+        match_types = [ParserData.MatchStart, ParserData.MatchEnd, ParserData.MatchContains,
+                       ParserData.MatchExact, ParserData.MatchRegex]
+
+        for _ in range(25):
+            data_parsers = {}
+            for _ in range(rnd.randint(1, 20)):
+                match = "".join(rnd.choice(parts) for _ in range(rnd.randint(1, 4)))
+                match_type = rnd.choice(match_types)
+                key = match if rnd.random() < 0.8 else rnd.choice(parts)
+                self.__add(data_parsers, key, match_type, match=match.replace("?", r"\?")
+                           if match_type == ParserData.MatchRegex else match)
+
+            index = ParserDataIndex(data_parsers)
+            for _ in range(50):
+                url = "".join(rnd.choice(parts) for _ in range(rnd.randint(0, 6)))
+                self.assertEqual(self.__get_linear(data_parsers, url), index.get_data_parsers(url), url)
+
+    def __get_linear(self, data_parsers, url):
+        for key in sorted(data_parsers.keys(), key=len, reverse=True):
+            matches = [d for d in data_parsers[key] if d.matches(url)]
+            if matches:
+                return matches
+        return []
+
+    def __add(self, data_parsers, key, match_type, match=None, name=None):
+        data_parser = self.__create(key if match is None else match, match_type)
+        data_parser.Name = name
+        data_parsers.setdefault(key, []).append(data_parser)
+        return data_parser
+
+    def __create(self, match, match_type):
+        data_parser = ParserData(match)
+        data_parser.MatchType = match_type
+        return data_parser
@@ -0,0 +1,198 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+
+from resources.lib.backtothefuture import PY2
+if PY2:
+    # noinspection PyPep8Naming,PyUnresolvedReferences
+    import cPickle as pickle
+else:
+    import pickle
+
+from resources.lib.logger import Logger
+from tests.benchmark import print_timings
+
+
+class TestPickler(unittest.TestCase):
+    store_guid = "ABCDEF0123456789"
+
+    @classmethod
+    def setUpClass(cls):
+        Logger.create_logger(None, str(cls), min_log_level=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        Logger.instance().close_log()
+
+    def setUp(self):
+        from resources.lib.mediaitem import MediaItem, FolderItem
+
+        self.store_path = tempfile.mkdtemp(prefix="retro_test_")
+        self.parent = FolderItem("Parent", "https://example.com/parent", content_type="episodes")
+        self.children = [
+            MediaItem("Item {}".format(i), "https://example.com/{}".format(i)) for i in range(10)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.store_path)
+
+    def test_pickle_and_de_pickle(self):
+        pickler = self.__create_pickler(None)
+        item = self.children[0]
+        pickle_string = pickler.pickle_media_item(item)
+        self.assertFalse(pickler.is_pickle_store_id(pickle_string))
+        self.assertEqual(item, pickler.de_pickle_media_item(pickle_string))
+
+    def test_store_and_retrieve_single_item(self):
+        self.__create_pickler().store_media_items(self.store_guid, self.parent, self.children)
+
+        # Use a new pickler, so nothing is cached.
+        item = self.children[5]
+        pickler = self.__create_pickler()
+        result = pickler.de_pickle_media_item(self.__get_store_id(item))
+        self.assertEqual(item, result)
+        self.assertEqual(item.name, result.name)
+
+    def test_retrieve_missing_item(self):
+        pickler = self.__create_pickler()
+        pickler.store_media_items(self.store_guid, self.parent, self.children)
+        store_id = "{}--{}".format(self.store_guid, "0" * 64)
+        self.assertIsNone(self.__create_pickler().de_pickle_media_item(store_id))
+
+    def test_retrieve_child_items(self):
+        self.__create_pickler().store_media_items(self.store_guid, self.parent, self.children)
+
+        pickler = self.__create_pickler()
+        store_guid, items = pickler.de_pickle_child_items(self.__get_store_id(self.children[0]))
+        self.assertEqual(self.store_guid, store_guid)
+        self.assertEqual(len(self.children), len(items))
+        for child in self.children:
+            self.assertEqual(child, items[child.guid])
+
+        # Once all children were read, the single items are taken from those.
+        item = pickler.de_pickle_media_item(self.__get_store_id(self.children[3]))
+        self.assertIs(items[self.children[3].guid], item)
+
+    def test_store_without_children(self):
+        self.__create_pickler().store_media_items(self.store_guid, self.parent, None)
+
+        store_id = "{}--{}".format(self.store_guid, self.parent.guid)
+        store_guid, items = self.__create_pickler().de_pickle_child_items(store_id)
+        self.assertEqual({}, items)
+
+    def test_retrieve_legacy_store(self):
+        content = {
+            "parent": self.parent,
+            "children": {item.guid: item for item in self.children}
+        }
+        store_guid = self.store_guid.lower()
+        legacy_dir = os.path.join(self.store_path, "pickles", store_guid[0:2], store_guid[2:4])
+        os.makedirs(legacy_dir)
+        with io.open(os.path.join(legacy_dir, "{}.store.z".format(store_guid)), "wb") as fp:
+            fp.write(zlib.compress(pickle.dumps(content, protocol=pickle.HIGHEST_PROTOCOL)))
+
+        item = self.children[2]
+        self.assertEqual(item, self.__create_pickler().de_pickle_media_item(self.__get_store_id(item)))
+
+    def test_store_in_background(self):
+        pickler = self.__create_pickler()
+        pickler.store_media_items(self.store_guid, self.parent, self.children, background=True)
+        pickler.flush()
+
+        item = self.children[7]
+        self.assertEqual(item, self.__create_pickler().de_pickle_media_item(self.__get_store_id(item)))
+
+    def test_read_while_storing_in_background(self):
+        pickler = self.__create_pickler()
+        pickler.store_media_items(self.store_guid, self.parent, self.children, background=True)
+
+        # Reading waits for the write to finish.
+        item = self.children[7]
+        self.assertEqual(item, pickler.de_pickle_media_item(self.__get_store_id(item)))
+
+    def test_codecs(self):
+        for codec, level in (("zlib", 1), ("zlib", 9), ("bz2", 9), ("lzma", 6), (None, 0)):
+            self.__create_pickler(codec=codec, level=level).store_media_items(
+                self.store_guid, self.parent, self.children)
+
+            # The codec is stored in the file, so any Pickler can read it.
+            store_guid, items = self.__create_pickler(codec="zlib", level=9).de_pickle_child_items(
+                self.__get_store_id(self.children[0]))
+            self.assertEqual(len(self.children), len(items), codec)
+
+    def test_resolved_item(self):
+        item = self.children[4]
+        item.add_stream("https://example.com/stream.m3u8", 0)
+        item.complete = True
+
+        self.__create_pickler().store_resolved_media_item(self.__get_store_id(item), item, 60)
+        result = self.__create_pickler().de_pickle_resolved_media_item(self.__get_store_id(item))
+        self.assertEqual(item, result)
+        self.assertTrue(result.complete)
+        self.assertTrue(result.has_streams())
+
+        # Only that item was resolved.
+        pickler = self.__create_pickler()
+        self.assertIsNone(pickler.de_pickle_resolved_media_item(self.__get_store_id(self.children[5])))
+        self.assertIsNone(pickler.de_pickle_resolved_media_item(pickler.pickle_media_item(item)))
+        self.assertIsNone(pickler.de_pickle_resolved_media_item(None))
+
+    def test_resolved_item_expired(self):
+        item = self.children[4]
+        self.__create_pickler().store_resolved_media_item(self.__get_store_id(item), item, -1)
+        self.assertIsNone(self.__create_pickler().de_pickle_resolved_media_item(self.__get_store_id(item)))
+
+    @unittest.skipUnless(os.environ.get("RETRO_BENCHMARK"), "Set RETRO_BENCHMARK=1 to run benchmarks")
+    def test_benchmark_codecs(self):
+        children = self.__create_listing(500)
+        def get_size():
+            size = sum(os.path.getsize(os.path.join(path, f))
+                       for path, _, files in os.walk(self.store_path) for f in files)
+            return "{} bytes".format(size)
+
+        actions = []
+        for codec, level in (("zlib", 1), ("zlib", 6), ("zlib", 9), ("bz2", 9), ("lzma", 0), (None, 0)):
+            pickler = self.__create_pickler(codec=codec, level=level)
+            name = "{} {}".format(codec, level)
+            actions += [
+                (name + " store", lambda p=pickler: p.store_media_items(self.store_guid, self.parent, children),
+                 get_size),
+                (name + " read item",
+                 lambda: self.__create_pickler().de_pickle_media_item(self.__get_store_id(children[250]))),
+                (name + " read all",
+                 lambda: self.__create_pickler().de_pickle_child_items(self.__get_store_id(children[0])))
+            ]
+        print_timings("PickleStore with {} items".format(len(children)), actions, iterations=5)
+
+    def __create_listing(self, count):
+        """ Creates a listing with items that have the data a channel typically sets. """
+
+        from resources.lib.mediaitem import MediaItem
+
+        items = []
+        for i in range(count):
+            item = MediaItem("Episode {} of a show with a reasonably long title".format(i),
+                             "https://api.example.com/v1/programs/show-{}/episodes/{}".format(i // 10, i))
+            item.description = "A description of episode {}. ".format(i) * 8
+            item.set_artwork(thumb="https://images.example.com/{}/thumb.jpg?w=640".format(i),
+                             fanart="https://images.example.com/{}/fanart.jpg?w=1920".format(i),
+                             poster="https://images.example.com/{}/poster.jpg".format(i))
+            item.set_date(2020, 1 + i % 12, 1 + i % 28, 20, 30, 0)
+            item.set_season_info(1 + i // 50, i % 50, "A show")
+            item.set_info_label("duration", 1800 + i)
+            item.isGeoLocked = i % 2 == 0
+            item.metaData["id"] = "show-{}-episode-{}".format(i // 10, i)
+            items.append(item)
+        return items
+
+    def __create_pickler(self, store_path="", codec="zlib", level=1):
+        from resources.lib.pickler import Pickler
+        return Pickler(self.store_path if store_path == "" else store_path, codec, level)
+
+    def __get_store_id(self, item):
+        return "{}--{}".format(self.store_guid, item.guid)
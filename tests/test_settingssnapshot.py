@@ -0,0 +1,90 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+from resources.lib.logger import Logger
+from resources.lib.settings.settingsstore import SettingsStore
+from resources.lib.settings.settingssnapshot import SettingsSnapshot
+
+
+class DictSettings(SettingsStore):
+    def __init__(self, logger, values):
+        super(DictSettings, self).__init__(logger)
+        self.values = values
+        self.calls = 0
+
+    def get_setting(self, setting_id, channel=None, default=None):
+        self.calls += 1
+        if channel:
+            setting_id = "{}_{}".format(channel, setting_id)
+        return self.values.get(setting_id) or default
+
+
+class TestSettingsSnapshot(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        Logger.create_logger(None, str(cls), min_log_level=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        Logger.instance().close_log()
+
+    def setUp(self):
+        self.store = DictSettings(Logger.instance(), {
+            "flag": "true", "number": "3", "text": "value", "empty": "", "other": "other",
+            "channel_flag": "false"
+        })
+        self.snapshot = SettingsSnapshot(
+            Logger.instance(), self.store, ["flag", "number", "text", "empty", "missing"])
+
+    def test_values(self):
+        self.assertTrue(self.snapshot.get_boolean_setting("flag"))
+        self.assertEqual(3, self.snapshot.get_integer_setting("number"))
+        self.assertEqual("value", self.snapshot.get_setting("text"))
+
+    def test_defaults(self):
+        self.assertEqual("default", self.snapshot.get_setting("empty", default="default"))
+        self.assertEqual(5, self.snapshot.get_integer_setting("missing", default=5))
+        self.assertFalse(self.snapshot.get_boolean_setting("missing", default=False))
+
+    def test_read_once(self):
+        calls = self.store.calls
+        for _ in range(10):
+            self.snapshot.get_boolean_setting("flag")
+            self.snapshot.get_setting("missing")
+        self.assertEqual(calls, self.store.calls)
+
+    def test_not_in_snapshot(self):
+        self.assertEqual("other", self.snapshot.get_setting("other"))
+        self.assertFalse(self.snapshot.get_boolean_setting("flag", channel="channel"))
+
+        # Changes of other settings are visible.
+        self.store.values["other"] = "changed"
+        self.assertEqual("changed", self.snapshot.get_setting("other"))
+
+    def test_read_only(self):
+        with self.assertRaises(ValueError):
+            self.snapshot.set_setting("flag", "false")
+
+        self.store.values["flag"] = "false"
+        self.assertTrue(self.snapshot.get_boolean_setting("flag"))
+
+    def test_addon_settings_snapshot(self):
+        from resources.lib.addonsettings import AddonSettings, KODI
+
+        AddonSettings.clear_cached_addon_settings_object()
+        snapshot = AddonSettings.snapshot()
+        self.assertIs(snapshot, AddonSettings.snapshot())
+        current = AddonSettings.get_setting("folder_prefix")
+
+        try:
+            # Changing a Kodi setting creates a new snapshot
+            AddonSettings.set_setting("folder_prefix", "snapshot", store=KODI)
+            self.assertIsNot(snapshot, AddonSettings.snapshot())
+            self.assertEqual("snapshot", AddonSettings.get_folder_prefix())
+
+            snapshot = AddonSettings.snapshot()
+            AddonSettings.clear_cached_addon_settings_object()
+            self.assertIsNot(snapshot, AddonSettings.snapshot())
+        finally:
+            AddonSettings.set_setting("folder_prefix", current or "", store=KODI)
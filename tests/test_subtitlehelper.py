@@ -10,6 +10,7 @@ from resources.lib.helpers.subtitlehelper import SubtitleHelper
 from resources.lib.logger import Logger
 from resources.lib.retroconfig import Config
 from resources.lib.urihandler import UriHandler
+from tests.benchmark import print_timings
 
 
 class TestSubtitleHelper(unittest.TestCase):
@@ -49,7 +50,7 @@ class TestSubtitleHelper(unittest.TestCase):
             raw = fp.read()
 
         # noinspection PyUnresolvedReferences
-        srt = SubtitleHelper._SubtitleHelper__convert_web_vtt_to_srt(raw)
+        srt = "".join(SubtitleHelper._SubtitleHelper__convert_web_vtt_to_srt(raw))
         self.assertIsNot("", srt)
 
     def test_webvtt_with_guids(self):
@@ -57,7 +58,133 @@ class TestSubtitleHelper(unittest.TestCase):
             raw = fp.read()
 
         # noinspection PyUnresolvedReferences
-        srt = SubtitleHelper._SubtitleHelper__convert_web_vtt_to_srt(raw)
+        srt = "".join(SubtitleHelper._SubtitleHelper__convert_web_vtt_to_srt(raw))
 
         guids = re.findall(r"^[0-9a-f]{32}$", srt, re.MULTILINE)
         self.assertFalse(guids)
+
+    def test_webvtt_cues(self):
+        raw = "WEBVTT\nX-TIMESTAMP-MAP=MPEGTS:0\n\n1\n00:01.000 --> 00:02.500\nFirst &amp; line\n" \
+              "Second line\n\n0b5e4f8a-1234-5678-9abc-def012345678\n" \
+              "00:00:03.000 --> 00:00:04.000\nLast line\n"
+
+        # noinspection PyUnresolvedReferences
+        cues = list(SubtitleHelper._SubtitleHelper__convert_web_vtt_to_srt(raw))
+        self.assertEqual([
+            "\n\n1\n00:00:01,000 --> 00:00:02,500\nFirst & line\nSecond line",
+            "\n\n2\n00:00:03,000 --> 00:00:04,000\nLast line"
+        ], cues)
+
+    def test_ttml(self):
+        raw = '<tt><body><div>' \
+              '<p begin="00:00:01.000" end="00:00:02.500" style="s1">First<br />line</p>' \
+              '<p begin="00:00:03.000" end="00:00:04.000">Second &amp; line</p>' \
+              '</div></body></tt>'
+
+        # noinspection PyUnresolvedReferences
+        srt = "".join(SubtitleHelper._SubtitleHelper__convert_ttml_to_srt(raw))
+        self.assertEqual("\n1\n00:00:01,000 --> 00:00:02,500\nFirst\nline\n"
+                         "\n2\n00:00:03,000 --> 00:00:04,000\nSecond & line\n", srt)
+
+    def test_sami(self):
+        raw = '<sami><body><sync start="1000"><p class="x">First</p></sync>\n' \
+              '<sync start="2500"><p class="x">&nbsp;</p></sync>\n' \
+              '<sync start="3000"><p class="x">Second</p></sync>\n' \
+              '<sync start="4000"><p class="x">&nbsp;</p></sync>\n</body></sami>'
+
+        # noinspection PyUnresolvedReferences
+        srt = "".join(SubtitleHelper._SubtitleHelper__convert_sami_to_srt(raw))
+        self.assertEqual("\n1\n00:00:01,000 --> 00:00:02,500\nFirst\n"
+                         "\n2\n00:00:03,000 --> 00:00:04,000\nSecond\n", srt)
+
+    def test_sami_without_quotes(self):
+        raw = '<sami><body><sync start=1000>\n<p class=x>First\n<sync start=2500>\n' \
+              '<p class=x>&nbsp;\n</body></sami>'
+
+        # noinspection PyUnresolvedReferences
+        srt = "".join(SubtitleHelper._SubtitleHelper__convert_sami_to_srt(raw))
+        self.assertEqual("\n1\n00:00:01,000 --> 00:00:02,500\nFirst\n", srt)
+
+    def test_json(self):
+        raw = '[{"startMillis":1000,"endMillis":2500,"text":"A \\"quote\\"","posX":0.5}]'
+
+        # noinspection PyUnresolvedReferences
+        srt = "".join(SubtitleHelper._SubtitleHelper__convert_json_subtitle_to_srt(raw))
+        self.assertEqual('\n1\n00:00:01,000 --> 00:00:02,500\nA "quote"\n', srt)
+
+    @unittest.skipUnless(os.environ.get("RETRO_BENCHMARK"), "Set RETRO_BENCHMARK=1 to run benchmarks")
+    def test_benchmark(self):
+        count = 20000
+        webvtt = ["WEBVTT", ""]
+        ttml = ['<tt><body><div>']
+        sami = ['<sami><body>']
+        for i in range(count):
+            start = "%02d:%02d:%02d.%03d" % (i // 1800, i // 30 % 60, i * 2 % 60, i % 1000)
+            end = "%02d:%02d:%02d.%03d" % (i // 1800, i // 30 % 60, i * 2 % 60 + 1, i % 1000)
+            webvtt.append("%s\n%s --> %s\nLine %s of the subtitle\nAnd a second line\n" %
+                          (i + 1, start, end, i))
+            ttml.append('<p begin="%s" end="%s" style="s1">Line %s<br/>And a second line</p>' %
+                        (start, end, i))
+            sami.append('<sync start="%d"><p class="x">Line %s of the subtitle</p></sync>\n'
+                        '<sync start="%d"><p class="x">&nbsp;</p></sync>\n' % (i * 2000, i, i * 2000 + 1500))
+        ttml.append('</div></body></tt>')
+        sami.append('</body></sami>')
+
+        srt_file = os.path.join(Config.cacheDir, "benchmark.srt")
+
+        def convert(sub_format, raw):
+            converter = getattr(SubtitleHelper, "_SubtitleHelper__convert_{}_to_srt".format(sub_format))
+            with io.open(srt_file, 'w', encoding="utf-8") as fp:
+                for cue in converter(raw):
+                    fp.write(cue)
+
+        print_timings("Converting {} cues".format(count), [
+            (sub_format, lambda f=sub_format, r=raw: convert(f, r),
+             lambda: "{} bytes".format(os.path.getsize(srt_file)))
+            for sub_format, raw in (("web_vtt", "\n".join(webvtt)), ("ttml", "".join(ttml)),
+                                    ("sami", "".join(sami)))
+        ], iterations=1)
+
+    def test_hls_segment_urls(self):
+        raw = "#EXTM3U\n#EXT-X-TARGETDURATION:60\n#EXTINF:60.0,\nsegment-0.vtt\n" \
+              "#EXTINF:60.0,\n/subs/segment-1.vtt?token=1\n" \
+              "#EXTINF:60.0,\nhttps://cdn.example.com/segment-2.vtt\n" \
+              "#EXTINF:60.0,\n../segment-3.vtt\n" \
+              "#EXTINF:60.0,\n//cdn.example.com/segment-4.vtt\n#EXT-X-ENDLIST\n"
+
+        # noinspection PyUnresolvedReferences
+        urls = SubtitleHelper._SubtitleHelper__get_segment_urls(
+            raw, "https://example.com/subs/index.m3u8?token=1")
+        self.assertEqual([
+            "https://example.com/subs/segment-0.vtt",
+            "https://example.com/subs/segment-1.vtt?token=1",
+            "https://cdn.example.com/segment-2.vtt",
+            "https://example.com/segment-3.vtt",
+            "https://cdn.example.com/segment-4.vtt"
+        ], urls)
+
+    def test_hls_segments(self):
+        segments = [
+            "WEBVTT\nX-TIMESTAMP-MAP=MPEGTS:900000,LOCAL:00:00:00.000\n\n"
+            "1\n00:00:01.000 --> 00:00:02.000 align:middle\nFirst &amp; line\n\n"
+            "00:00:59.000 --> 00:01:01.000\nAcross the boundary\n",
+            # A failed segment
+            "",
+            # The same timeline, but with a different mapping and Windows line endings
+            b"WEBVTT\r\nX-TIMESTAMP-MAP=LOCAL:00:01:00.000,MPEGTS:6300000\r\n\r\n"
+            b"00:00:59.000 --> 00:01:01.000\r\nAcross the boundary\r\n\r\n"
+            b"NOTE a comment\r\n\r\n"
+            b"00:01:03.000 --> 00:01:04.000\r\nSecond segment\r\n",
+            # A segment with timestamps relative to the segment start
+            "WEBVTT\nX-TIMESTAMP-MAP=MPEGTS:11700000,LOCAL:00:00:00.000\n\n"
+            "00:05.000 --> 00:06.000\nLast line\nSecond line\n"
+        ]
+
+        # noinspection PyUnresolvedReferences
+        cues = list(SubtitleHelper._SubtitleHelper__merge_web_vtt_segments(segments))
+        self.assertEqual([
+            "\n1\n00:00:01,000 --> 00:00:02,000\nFirst & line\n",
+            "\n2\n00:00:59,000 --> 00:01:01,000\nAcross the boundary\n",
+            "\n3\n00:01:03,000 --> 00:01:04,000\nSecond segment\n",
+            "\n4\n00:02:05,000 --> 00:02:06,000\nLast line\nSecond line\n"
+        ], cues)
@@ -0,0 +1,141 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import base64
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from resources.lib.authentication.tokencache import TokenCache
+from resources.lib.logger import Logger
+
+
+class TestTokenCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        Logger.create_logger(None, str(cls), min_log_level=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        Logger.instance().close_log()
+
+    def setUp(self):
+        self.cache_folder = tempfile.mkdtemp(prefix="retro_test_")
+        self.path = os.path.join(self.cache_folder, TokenCache.FILE_NAME)
+        self.cache = TokenCache(self.path, refresh_margin=60)
+        self.fetches = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_folder)
+
+    def test_cached(self):
+        fetch = self.__get_fetch(3600)
+        self.assertEqual("token-1", self.cache.get_token("realm", "user", fetch))
+        self.assertEqual("token-1", self.cache.get_token("realm", "user", fetch))
+        self.assertEqual(1, self.fetches)
+
+    def test_keyed_by_realm_and_identity(self):
+        fetch = self.__get_fetch(3600)
+        self.assertEqual("token-1", self.cache.get_token("realm", "user", fetch))
+        self.assertEqual("token-2", self.cache.get_token("realm", "other", fetch))
+        self.assertEqual("token-3", self.cache.get_token("other", "user", fetch))
+        self.assertEqual("token-4", self.cache.get_token("realm", None, fetch))
+        self.assertEqual("token-1", self.cache.get_token("realm", "user", fetch))
+
+    def test_refresh_early(self):
+        fetch = self.__get_fetch(30)
+        self.assertEqual("token-1", self.cache.get_token("realm", "user", fetch))
+        # It expires within the refresh margin, so it is refreshed.
+        self.assertEqual("token-2", self.cache.get_token("realm", "user", fetch))
+
+    def test_refresh_failure_uses_current(self):
+        self.cache.get_token("realm", "user", self.__get_fetch(30))
+
+        def fail():
+            raise IOError("No connection")
+        self.assertEqual("token-1", self.cache.get_token("realm", "user", fail))
+        self.assertEqual("token-1", self.cache.get_token("realm", "user", lambda: (None, None)))
+
+    def test_expired(self):
+        self.cache.get_token("realm", "user", self.__get_fetch(-1))
+        self.assertEqual("token-2", self.cache.get_token("realm", "user", self.__get_fetch(3600)))
+
+    def test_lifetime(self):
+        fetch = self.__get_fetch(None)
+        self.assertEqual("token-1", self.cache.get_token("realm", "user", fetch))
+        self.assertEqual("token-2", self.cache.get_token("realm", "user", fetch))
+        self.assertEqual("token-3", self.cache.get_token("realm", "user", fetch, lifetime=3600))
+        self.assertEqual("token-3", self.cache.get_token("realm", "user", fetch, lifetime=3600))
+
+    def test_persisted(self):
+        self.cache.get_token("realm", "secret-user", self.__get_fetch(3600))
+        self.assertNotIn("secret-user", open(self.path).read())
+
+        cache = TokenCache(self.path)
+        self.assertEqual("token-1", cache.get_token("realm", "secret-user", self.__get_fetch(3600)))
+        self.assertEqual(1, self.fetches)
+
+    def test_invalidate(self):
+        fetch = self.__get_fetch(3600)
+        self.cache.get_token("realm", "user", fetch)
+        self.cache.get_token("realm", "other", fetch)
+        self.cache.get_token("other", "user", fetch)
+
+        self.cache.invalidate("realm", "user")
+        self.assertEqual("token-4", self.cache.get_token("realm", "user", fetch))
+        self.assertEqual("token-2", self.cache.get_token("realm", "other", fetch))
+
+        self.cache.invalidate("realm")
+        self.assertEqual("token-5", self.cache.get_token("realm", "other", fetch))
+        self.assertEqual("token-3", TokenCache(self.path).get_token("other", "user", fetch))
+
+    def test_single_fetch_for_threads(self):
+        def slow_fetch():
+            time.sleep(0.1)
+            return self.__get_fetch(3600)()
+
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(self.cache.get_token("realm", "user", slow_fetch)))
+            for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(["token-1"] * 5, results)
+        self.assertEqual(1, self.fetches)
+
+    def test_corrupt_file(self):
+        with open(self.path, "w") as fp:
+            fp.write("{not json")
+        self.assertEqual("token-1", TokenCache(self.path).get_token(
+            "realm", "user", self.__get_fetch(3600)))
+
+    def test_get_expiry(self):
+        self.assertIsNone(TokenCache.get_expiry(None))
+        self.assertEqual(1600000000, TokenCache.get_expiry(1600000000))
+        self.assertEqual(1600000000, TokenCache.get_expiry(1600000000000))
+        self.assertEqual(1600000000, TokenCache.get_expiry("1600000000"))
+        self.assertEqual(1600000000, TokenCache.get_expiry("2020-09-13T12:26:40Z"))
+        self.assertEqual(1600000000, TokenCache.get_expiry("2020-09-13T12:26:40.123Z"))
+        self.assertEqual(1600000000, TokenCache.get_expiry("2020-09-13T14:26:40+02:00"))
+        self.assertIsNone(TokenCache.get_expiry("tomorrow"))
+
+    def test_get_jwt_expiry(self):
+        payload = base64.urlsafe_b64encode(
+            json.dumps({"sub": "user", "exp": 1600000000}).encode()).decode().rstrip("=")
+        self.assertEqual(1600000000, TokenCache.get_jwt_expiry("header.{}.signature".format(payload)))
+        self.assertIsNone(TokenCache.get_jwt_expiry("not-a-jwt"))
+        self.assertIsNone(TokenCache.get_jwt_expiry("a.b.c"))
+        self.assertIsNone(TokenCache.get_jwt_expiry(None))
+
+    def __get_fetch(self, valid_for):
+        def fetch():
+            self.fetches += 1
+            expires = None if valid_for is None else time.time() + valid_for
+            return "token-{}".format(self.fetches), expires
+        return fetch
@@ -6,6 +6,8 @@ from future.utils import PY2
 
 import unittest
 import os
+import glob
+import hashlib
 import json
 import tempfile
 import shutil
@@ -20,6 +22,7 @@ else:
 
 from resources.lib.backtothefuture import basestring
 from resources.lib.urihandler import UriHandler
+from resources.lib.proxyinfo import ProxyInfo
 from resources.lib.logger import Logger
 
 
@@ -216,6 +219,23 @@ class TestUriHandler(unittest.TestCase):
         self.assertIsNotNone(UriHandler.instance().cacheStore)
         self.assertEqual(expected_path, UriHandler.instance().cacheStore.cachePath)
 
+    def test_session_reuse(self):
+        UriHandler.create_uri_handler(cache_dir=self.output_folder, pool_maxsize=4)
+
+        # noinspection PyUnresolvedReferences
+        session = UriHandler.instance()._RequestsHandler__session
+        adapter = UriHandler.instance().cacheAdapter
+        self.assertIs(adapter, session.get_adapter("https://httpbin.org/get"))
+        self.assertIs(adapter, session.get_adapter("http://httpbin.org/get"))
+        self.assertEqual(4, adapter._pool_maxsize)
+
+        # the cache options are set per request and not per adapter
+        adapter.set_request_options(no_cache=True)
+        self.assertTrue(adapter.no_cache)
+        adapter.set_request_options(force_cache_duration=10)
+        self.assertFalse(adapter.no_cache)
+        self.assertEqual(10, adapter.force_cache_duration)
+
     def test_cache(self):
         url = "https://httpbin.org/cache/30"
         UriHandler.create_uri_handler(cache_dir=self.output_folder)
@@ -223,7 +243,7 @@ class TestUriHandler(unittest.TestCase):
         data = UriHandler.open(url)
         self.assertEqual(200, UriHandler.instance().status.code)
         data_object_1 = json.loads(data)
-        self.assertEqual(2, len(os.listdir(UriHandler.instance().cacheStore.cachePath)))
+        self.assertEqual(1, UriHandler.instance().cacheStore.get_entry_count())
 
         data = UriHandler.open(url)
         self.assertEqual(200, UriHandler.instance().status.code)
@@ -253,7 +273,7 @@ class TestUriHandler(unittest.TestCase):
         self.assertEqual(data_object["headers"]["Host"], 'httpbin.org')
 
         self.assertEqual(0, UriHandler.instance().cacheStore.cacheHits)
-        self.assertEqual(0, len(os.listdir(UriHandler.instance().cacheStore.cachePath)))
+        self.assertEqual(0, UriHandler.instance().cacheStore.get_entry_count())
 
     def test_cache_no_cache_store(self):
         url = "https://httpbin.org/cache/30"
@@ -274,7 +294,7 @@ class TestUriHandler(unittest.TestCase):
 
         data = UriHandler.open(url)
         data_object_1 = json.loads(data)
-        self.assertEqual(2, len(os.listdir(UriHandler.instance().cacheStore.cachePath)))
+        self.assertEqual(1, UriHandler.instance().cacheStore.get_entry_count())
         self.assertEqual(200, UriHandler.instance().status.code)
         self.assertEqual(0, UriHandler.instance().cacheStore.cacheHits)
 
@@ -290,7 +310,7 @@ class TestUriHandler(unittest.TestCase):
 
         data = UriHandler.open(url)
         data_object_1 = json.loads(data)
-        self.assertEqual(2, len(os.listdir(UriHandler.instance().cacheStore.cachePath)))
+        self.assertEqual(1, UriHandler.instance().cacheStore.get_entry_count())
         self.assertEqual(200, UriHandler.instance().status.code)
 
         data = UriHandler.open(url)
@@ -307,7 +327,7 @@ class TestUriHandler(unittest.TestCase):
 
         data = UriHandler.open(url)
         data_object_1 = json.loads(data)
-        self.assertEqual(2, len(os.listdir(UriHandler.instance().cacheStore.cachePath)))
+        self.assertEqual(1, UriHandler.instance().cacheStore.get_entry_count())
         self.assertEqual(200, UriHandler.instance().status.code)
 
         data = UriHandler.open(url)
@@ -321,6 +341,43 @@ class TestUriHandler(unittest.TestCase):
         UriHandler.open(url)
         self.assertEqual(1, UriHandler.instance().cacheStore.cacheHits)
 
+    def test_cache_stale_while_revalidate(self):
+        cache_control = quote("max-age=1, stale-while-revalidate=60")
+        url = "https://httpbin.org/response-headers?Cache-Control={0}".format(cache_control)
+        UriHandler.create_uri_handler(cache_dir=self.output_folder)
+
+        data = UriHandler.open(url)
+        data_object_1 = json.loads(data)
+        self.assertEqual(0, UriHandler.instance().cacheStore.cacheHits)
+        key = hashlib.md5(url.encode()).hexdigest()
+        stored_at = UriHandler.instance().cacheStore.get_meta(key)["stored_at"]
+
+        # The stale response is returned immediately and refreshed in the background
+        time.sleep(1.5)
+        data = UriHandler.open(url)
+        data_object_2 = json.loads(data)
+        self.assertEqual(1, UriHandler.instance().cacheStore.cacheHits)
+        self.assertEqual(data_object_1, data_object_2)
+
+        UriHandler.instance().cacheAdapter.wait_for_revalidations()
+        self.assertGreater(UriHandler.instance().cacheStore.get_meta(key)["stored_at"], stored_at)
+
+    def test_cache_stale_if_error(self):
+        url = "https://httpbin.org/cache/1"
+        UriHandler.create_uri_handler(cache_dir=self.output_folder)
+
+        data = UriHandler.open(url)
+        data_object_1 = json.loads(data)
+
+        # An unreachable proxy makes the request fail, so the stale cache is used.
+        time.sleep(1.5)
+        data = UriHandler.open(url, proxy=ProxyInfo("127.0.0.1", 9))
+        data_object_2 = json.loads(data)
+        self.assertEqual(1, UriHandler.instance().cacheStore.cacheHits)
+        # only the first request was a miss
+        self.assertEqual(1, UriHandler.instance().cacheStore.cacheMisses)
+        self.assertEqual(data_object_1, data_object_2)
+
     def test_utf_8(self):
         url = "https://httpbin.org/encoding/utf8"
         UriHandler.create_uri_handler()
@@ -446,6 +503,39 @@ class TestUriHandler(unittest.TestCase):
         cookie = UriHandler.get_cookie(cookie_name, cookie_domain)
         self.assertIsNotNone(cookie, msg="Cookie was not persisted on disk")
 
+    def test_cookie_persist_deferred(self):
+        cookie_jar_file = os.path.join(self.output_folder, "cookies.txt")
+        UriHandler.create_uri_handler(cookie_jar=cookie_jar_file)
+        cookie_jar = UriHandler.instance().cookieJar
+        self.assertFalse(cookie_jar.changed)
+
+        UriHandler.set_cookie(name="cookie_test", domain="httpbin.org", value="test data")
+        self.assertTrue(cookie_jar.changed)
+
+        # not written until flushed
+        self.assertFalse(cookie_jar.save_if_due())
+        with open(cookie_jar_file) as fp:
+            self.assertNotIn("cookie_test", fp.read())
+
+        self.assertTrue(cookie_jar.flush())
+        self.assertFalse(cookie_jar.changed)
+        self.assertEqual([cookie_jar_file], glob.glob("{0}*".format(cookie_jar_file)))
+        with open(cookie_jar_file) as fp:
+            self.assertIn("cookie_test", fp.read())
+
+        # setting the same cookie again is not a change
+        UriHandler.set_cookie(name="cookie_test", domain="httpbin.org", value="test data")
+        self.assertFalse(cookie_jar.changed)
+        self.assertFalse(cookie_jar.flush())
+
+    def test_cookie_persist_interval(self):
+        cookie_jar_file = os.path.join(self.output_folder, "cookies.txt")
+        UriHandler.create_uri_handler(cookie_jar=cookie_jar_file, cookie_save_interval=0)
+
+        UriHandler.set_cookie(name="cookie_test", domain="httpbin.org", value="test data")
+        self.assertTrue(UriHandler.instance().cookieJar.save_if_due())
+        self.assertFalse(UriHandler.instance().cookieJar.changed)
+
     def test_clear_cookies(self):
         UriHandler.create_uri_handler()
         UriHandler.set_cookie(name="ipsum", domain="domain.com")
@@ -485,6 +575,39 @@ class TestUriHandler(unittest.TestCase):
         self.assertEqual("", data)
         self.assertEqual(404, UriHandler.instance().status.code)
 
+    def test_open_many(self):
+        UriHandler.create_uri_handler()
+
+        urls = ["https://httpbin.org/get?page={}".format(i) for i in range(6)]
+        data = UriHandler.open_many(urls, max_workers=3)
+        self.assertEqual(len(urls), len(data))
+        for i, page_data in enumerate(data):
+            self.assertEqual(str(i), json.loads(page_data)["args"]["page"])
+        self.assertEqual(200, UriHandler.instance().status.code)
+
+    def test_open_many_cache(self):
+        UriHandler.create_uri_handler(cache_dir=self.output_folder)
+
+        urls = ["https://httpbin.org/cache/60?page={}".format(i) for i in range(4)]
+        first = UriHandler.open_many(urls)
+        second = UriHandler.open_many(urls)
+        self.assertEqual(first, second)
+        self.assertEqual(len(urls), UriHandler.instance().cacheStore.get_entry_count())
+
+    def test_open_many_error(self):
+        UriHandler.create_uri_handler()
+
+        urls = ["https://httpbin.org/get", "https://httpbin.org/status/404", "https://httpbin.org/get"]
+        data = UriHandler.open_many(urls)
+        self.assertTrue(data[0])
+        self.assertEqual("", data[1])
+        self.assertTrue(data[2])
+        self.assertEqual(404, UriHandler.instance().status.code)
+
+    def test_open_many_empty(self):
+        UriHandler.create_uri_handler()
+        self.assertEqual([], UriHandler.open_many([]))
+
     def test_gif(self):
         UriHandler.create_uri_handler()
         gif = UriHandler.open("https://httpbin.org/image/png")
@@ -0,0 +1,180 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import base64
+import os
+import time
+import unittest
+
+import pyaes
+import pyscrypt
+
+from resources.lib.logger import Logger
+from tests.benchmark import print_timings
+
+
+class TestVault(unittest.TestCase):
+    key = b"0123456789abcdefghijklmnopqrstuv"
+
+    @classmethod
+    def setUpClass(cls):
+        Logger.create_logger(None, str(cls), min_log_level=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        Logger.instance().close_log()
+
+    def setUp(self):
+        from resources.lib.vault import Vault
+
+        # Skip the constructor, as that asks for the PIN.
+        self.vault = Vault.__new__(Vault)
+
+    def test_encrypt_and_decrypt(self):
+        # noinspection PyUnresolvedReferences
+        encrypted = self.vault._Vault__encrypt("setting=value", self.key)
+        # noinspection PyUnresolvedReferences
+        self.assertEqual("setting=value", self.vault._Vault__decrypt(encrypted, self.key))
+
+    def test_compatible_with_pyaes(self):
+        # noinspection PyUnresolvedReferences
+        encrypted = self.vault._Vault__encrypt("setting=value", self.key)
+        decrypted = pyaes.AESModeOfOperationCTR(self.key).decrypt(base64.b64decode(encrypted))
+        self.assertEqual(b"setting=value", decrypted)
+
+        encrypted = base64.b64encode(pyaes.AESModeOfOperationCTR(self.key).encrypt(b"setting=value"))
+        # noinspection PyUnresolvedReferences
+        self.assertEqual("setting=value", self.vault._Vault__decrypt(encrypted.decode(), self.key))
+
+    def test_kdf_parameters(self):
+        from resources.lib.vault import Vault
+
+        # noinspection PyUnresolvedReferences
+        data = Vault._Vault__add_kdf_parameters("ZGF0YQ==", (14, 8, 1))
+        self.assertEqual("$scrypt$ln=14,r=8,p=1$ZGF0YQ==", data)
+        # noinspection PyUnresolvedReferences
+        self.assertEqual(((14, 8, 1), "ZGF0YQ=="), Vault._Vault__split_kdf_parameters(data))
+
+    def test_legacy_kdf_parameters(self):
+        from resources.lib.vault import Vault
+
+        # noinspection PyUnresolvedReferences
+        self.assertEqual("ZGF0YQ==", Vault._Vault__add_kdf_parameters("ZGF0YQ==", (7, 1, 1)))
+        # noinspection PyUnresolvedReferences
+        self.assertEqual(((7, 1, 1), "ZGF0YQ=="), Vault._Vault__split_kdf_parameters("ZGF0YQ=="))
+
+    def test_pbk_compatible_with_pyscrypt(self):
+        from resources.lib.addonsettings import AddonSettings
+
+        salt = AddonSettings.get_client_id()
+        expected = pyscrypt.hash(password=b"1234", salt=salt.encode(), N=2 ** 7, r=1, p=1, dkLen=32)
+        # noinspection PyUnresolvedReferences
+        self.assertEqual(expected, self.vault._Vault__get_pbk("1234", (7, 1, 1)))
+
+    def test_lock_expired_key(self):
+        from resources.lib.vault import Vault
+        from resources.lib.addonsettings import AddonSettings, KODI
+
+        try:
+            Vault._Vault__Key = self.key
+            Vault._Vault__KeyTime = time.time() - 3600
+            # no duration set, so the key lives as long as the interpreter
+            Vault.lock(expired_only=True)
+            self.assertEqual(self.key, Vault._Vault__Key)
+
+            AddonSettings.set_setting("vault_key_cache", "5", store=KODI)
+            Vault._Vault__KeyTime = time.time()
+            Vault.lock(expired_only=True)
+            self.assertEqual(self.key, Vault._Vault__Key)
+
+            Vault._Vault__KeyTime = time.time() - 301
+            Vault.lock(expired_only=True)
+            self.assertIsNone(Vault._Vault__Key)
+
+            Vault._Vault__Key = self.key
+            Vault._Vault__KeyTime = time.time()
+            Vault.lock()
+            self.assertIsNone(Vault._Vault__Key)
+        finally:
+            AddonSettings.set_setting("vault_key_cache", "0", store=KODI)
+            Vault._Vault__Key = None
+
+    def test_legacy_key_is_not_rewritten(self):
+        from resources.lib import vault
+        from resources.lib.addonsettings import AddonSettings, LOCAL
+
+        # noinspection PyUnresolvedReferences
+        pin_key = self.vault._Vault__get_pbk("1234", (7, 1, 1))
+        # noinspection PyUnresolvedReferences
+        encrypted_key = self.vault._Vault__encrypt("application_key=" + self.key.decode(), pin_key)
+        show_key_board = vault.XbmcWrapper.show_key_board
+        try:
+            AddonSettings.set_setting("application_key", encrypted_key, store=LOCAL)
+            vault.XbmcWrapper.show_key_board = staticmethod(lambda *args, **kwargs: "1234")
+
+            # noinspection PyUnresolvedReferences
+            self.assertEqual(self.key, self.vault._Vault__get_application_key())
+            self.assertEqual(encrypted_key, AddonSettings.get_setting("application_key", store=LOCAL))
+        finally:
+            vault.XbmcWrapper.show_key_board = show_key_board
+            AddonSettings.set_setting("application_key", "", store=LOCAL)
+
+    def test_native_cipher(self):
+        from resources.lib import vault
+
+        class NativeAES(object):
+            MODE_CTR = 6
+            calls = []
+
+            @staticmethod
+            def new(key, mode, nonce=None, initial_value=None):
+                NativeAES.calls.append((mode, nonce, initial_value))
+                return pyaes.AESModeOfOperationCTR(key, counter=pyaes.Counter(initial_value))
+
+        native_aes = vault.AES
+        try:
+            vault.AES = NativeAES
+            # noinspection PyUnresolvedReferences
+            encrypted = self.vault._Vault__encrypt("setting=value", self.key)
+        finally:
+            vault.AES = native_aes
+
+        self.assertEqual([(6, b"", 1)], NativeAES.calls)
+        decrypted = pyaes.AESModeOfOperationCTR(self.key).decrypt(base64.b64decode(encrypted))
+        self.assertEqual(b"setting=value", decrypted)
+
+    def test_native_cipher_with_other_signature(self):
+        from resources.lib import vault
+
+        class PyCryptoAES(object):
+            MODE_CTR = 6
+
+            @staticmethod
+            def new(key, mode, counter=None):
+                raise AssertionError("Should not be called with a counter")
+
+        native_aes = vault.AES
+        try:
+            vault.AES = PyCryptoAES
+            # noinspection PyUnresolvedReferences
+            cipher = vault.Vault._Vault__get_cipher(self.key)
+        finally:
+            vault.AES = native_aes
+        self.assertIsInstance(cipher, pyaes.AESModeOfOperationCTR)
+
+    @unittest.skipUnless(os.environ.get("RETRO_BENCHMARK"), "Set RETRO_BENCHMARK=1 to run benchmarks")
+    def test_benchmark(self):
+        # noinspection PyUnresolvedReferences
+        get_pbk = self.vault._Vault__get_pbk
+        print_timings("Vault key derivation", [
+            ("scrypt ln=7 r=1 p=1", lambda: get_pbk("1234", (7, 1, 1))),
+            ("scrypt ln=14 r=8 p=1", lambda: get_pbk("1234", (14, 8, 1))),
+            ("pyscrypt ln=7 r=1 p=1",
+             lambda: pyscrypt.hash(password=b"1234", salt=b"salt", N=2 ** 7, r=1, p=1, dkLen=32))
+        ], iterations=1)
+
+        data = "setting=" + "x" * 1024
+        # noinspection PyUnresolvedReferences
+        encrypt, decrypt = self.vault._Vault__encrypt, self.vault._Vault__decrypt
+        print_timings("Vault encryption", [
+            ("AES 1KB round trip", lambda: decrypt(encrypt(data, self.key), self.key))
+        ], iterations=100)
@@ -0,0 +1,105 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import shutil
+import tempfile
+import time
+import unittest
+
+from resources.lib.logger import Logger
+
+
+class _Channel(object):
+    def __init__(self):
+        """ A channel that resolves items by adding a stream. """
+
+        self.resolved = []
+
+    def process_video_item(self, item):
+        self.resolved.append(item)
+        item.add_stream("https://example.com/next.m3u8", 0)
+        item.complete = True
+        return item
+
+
+class _ParameterParser(object):
+    def __init__(self, pickler):
+        """ The part of the ActionParser that the prefetching uses. """
+
+        self.pickler = pickler
+
+
+class TestVideoAction(unittest.TestCase):
+    store_guid = "ABCDEF0123456789"
+    url = "https://example.com/current.m3u8"
+
+    @classmethod
+    def setUpClass(cls):
+        Logger.create_logger(None, str(cls), min_log_level=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        Logger.instance().close_log()
+
+    def setUp(self):
+        from resources.lib.actions.videoaction import VideoAction
+        from resources.lib.mediaitem import MediaItem
+        from resources.lib.pickler import Pickler
+
+        self.store_path = tempfile.mkdtemp(prefix="retro_test_")
+        self.pickler = Pickler(self.store_path)
+        self.channel = _Channel()
+        self.next_item = MediaItem("Next", "https://example.com/next")
+        self.store_id = "{}--{}".format(self.store_guid, self.next_item.guid)
+
+        # Skip the constructor, as that needs a complete ActionParser.
+        self.action = VideoAction.__new__(VideoAction)
+        self.action.parameter_parser = _ParameterParser(self.pickler)
+        self.action._VideoAction__channel = self.channel
+
+        # Scale the times down, so an item plays longer than the time to live in a few seconds.
+        self.times = VideoAction._VideoAction__resolved_item_ttl, VideoAction._VideoAction__prefetch_time_remaining
+        VideoAction._VideoAction__resolved_item_ttl = 3
+        VideoAction._VideoAction__prefetch_time_remaining = 1
+
+    def tearDown(self):
+        from resources.lib.actions.videoaction import VideoAction
+        import xbmc
+
+        VideoAction._VideoAction__resolved_item_ttl, VideoAction._VideoAction__prefetch_time_remaining = self.times
+        xbmc.Player().stop()
+        shutil.rmtree(self.store_path)
+
+    def test_prefetch_before_end_of_item(self):
+        kodi_player = self.__play(total_time=4)
+        start = time.time()
+        self.action._VideoAction__prefetch(self.next_item, self.store_guid, kodi_player, self.url)
+
+        # It waited for the end of the item, which is longer than the time to live.
+        self.assertGreaterEqual(time.time() - start, 2)
+        self.assertEqual([self.next_item], self.channel.resolved)
+
+        # When the next item starts, the prefetched item is still valid.
+        while kodi_player.getTime() < 4:
+            time.sleep(0.1)
+        kodi_player.stop()
+        result = self.pickler.de_pickle_resolved_media_item(self.store_id)
+        self.assertIsNotNone(result)
+        self.assertTrue(result.has_streams())
+
+    def test_no_prefetch_if_playback_stopped(self):
+        kodi_player = self.__play(total_time=60)
+        kodi_player.stop()
+        self.action._VideoAction__prefetch(self.next_item, self.store_guid, kodi_player, self.url)
+
+        self.assertEqual([], self.channel.resolved)
+        self.assertIsNone(self.pickler.de_pickle_resolved_media_item(self.store_id))
+
+    def __play(self, total_time):
+        from resources.lib.player import Player
+        from sakee.internalplayer import KodiInteralPlayer
+
+        kodi_player = Player(subs=[])
+        KodiInteralPlayer.instance().play(self.url)
+        KodiInteralPlayer.instance().total_time = total_time
+        kodi_player.waitForPlayBack(url=self.url, time_out=5)
+        return kodi_player